@@ -0,0 +1,400 @@
+# admin.py
+import os
+from collections import Counter
+from datetime import timedelta
+
+import streamlit as st
+import plotly.express as px
+import pandas as pd
+
+import events
+import metrics
+from db import SessionLocal, GithubOutbox, TOTAL_KEY, last_bucket, load_rollups
+from export import MIMETYPES, signed_query
+from resources import (get_figure_cache, get_live_feed, get_response_cube, get_spool_replayer,
+                       get_wordcloud_cache, github_writer_error, wake_github_writer)
+from schema import SECTIONS, QUESTIONS, BY_KEY, YESNO, MULTISELECT, CATEGORICAL, FREETEXT
+from theme import PALETTE
+
+
+def has_pending_outbox():
+    session = SessionLocal()
+    try:
+        return session.query(GithubOutbox.id).filter(GithubOutbox.sent_at.is_(None)).first() is not None
+    finally:
+        session.close()
+
+
+# Domande con opzioni chiuse: filtri, incroci e andamento nel tempo
+CLOSED_QUESTIONS = [q for q in QUESTIONS if q.kind != FREETEXT]
+
+
+def sidebar_filters():
+    """Filtri della sidebar: {chiave: [opzioni]} solo per le domande filtrate."""
+    st.sidebar.header("Filtri")
+    filters = {}
+    for q in CLOSED_QUESTIONS:
+        chosen = st.sidebar.multiselect(q.title, list(q.options), key=f"filter-{q.key}")
+        if chosen:
+            filters[q.key] = chosen
+    return filters
+
+
+def sidebar_crosstab():
+    """Coppia di domande da incrociare, oppure None."""
+    st.sidebar.header("Incrocio")
+    keys = [q.key for q in CLOSED_QUESTIONS]
+    fmt = lambda key: BY_KEY[key].title
+    rows = st.sidebar.selectbox("Righe", keys, index=None, format_func=fmt, key="crosstab-rows")
+    cols = st.sidebar.selectbox("Colonne", keys, index=None, format_func=fmt, key="crosstab-cols")
+    if rows and cols and rows != cols:
+        return rows, cols
+    return None
+
+
+def sidebar_export(app_url, event):
+    """Download delle risposte grezze dell'evento (una riga per risposta, impacts "a;b;c")."""
+    st.sidebar.header("Export")
+    token = st.secrets.get("export_token")
+    if not token:
+        # Senza token server.py rifiuta /export: niente ripiego con download_button,
+        # che terrebbe l'intero file in memoria per servirlo
+        st.sidebar.caption("Export disponibile solo con server.py ed export_token nei secrets.")
+        return
+    for fmt in MIMETYPES:
+        # Servita da server.py: il file arriva in streaming, blocco per blocco.
+        # Link firmato a scadenza, il token resta nei secrets
+        st.sidebar.link_button(f"Scarica {fmt.upper()}",
+                               f"{app_url.rstrip('/')}/export/{fmt}?{signed_query(token, fmt, event)}")
+
+
+# ----------------------------------------------------------------
+# Grafici per tipo di domanda (consumano un QuestionCounts)
+# ----------------------------------------------------------------
+def plotly_chart(fig, **kwargs):
+    # st.plotly_chart serializza la figura (to_dict + JSON) a ogni chiamata
+    with metrics.span("plotly.chart"):
+        st.plotly_chart(fig, **kwargs)
+
+
+# Ogni render_* accetta il payload già calcolato (figura o PNG) e ritorna
+# quello usato: la modalità live lo riusa finché i conteggi non cambiano.
+def render_yesno(section, result, fig=None):
+    # Sì/No come donut, nell'ordine dello schema ("Sì" sempre primo)
+    fig = fig or get_figure_cache().figure(result)
+    st.subheader(result.question.title)
+    # Centriamo la torta con st.columns
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col2:
+        plotly_chart(
+            fig,
+            use_container_width=False,
+            width=400,
+            height=400,
+            key=f"donut-{section.dashboard_title}-{result.question.key}"
+        )
+    return fig
+
+
+def render_wordcloud(section, result, png=None):
+    # Multiselect (opzioni) e testo libero (termini dall'indice) come word cloud
+    st.subheader(result.question.title)
+    final = True
+    if png is None:
+        # Stesse frequenze → PNG già in cache; altrimenti anteprima subito
+        # e immagine finale preparata in background per il prossimo rerun
+        png, final = get_wordcloud_cache().render(result.counts, preview=True)
+    st.image(png, use_container_width=True)
+    if not final:
+        st.caption("Anteprima: l'immagine in alta risoluzione è in preparazione.")
+        return None   # da riprendere dalla cache al prossimo giro
+    return png
+
+
+def render_categorical(section, result, fig=None):
+    # Categoriche come bar chart verticale con etichette a capo
+    fig = fig or get_figure_cache().figure(result)
+    st.subheader(result.question.title)
+    plotly_chart(
+        fig,
+        use_container_width=True,
+        key=f"bar-{section.dashboard_title}-{result.question.key}"
+    )
+    return fig
+
+
+RENDERERS = {
+    YESNO: render_yesno,
+    MULTISELECT: render_wordcloud,
+    FREETEXT: render_wordcloud,
+    CATEGORICAL: render_categorical,
+}
+
+
+# ----------------------------------------------------------------
+# Andamento nel tempo (dai rollup per minuto/ora)
+# ----------------------------------------------------------------
+TIMELINE_WINDOWS = {
+    "Ultima ora":    ("minute", timedelta(hours=1)),
+    "Ultime 6 ore":  ("minute", timedelta(hours=6)),
+    "Ultime 24 ore": ("hour", timedelta(hours=24)),
+    "Tutto":         ("hour", None),
+}
+BUCKET_FREQ = {"minute": "min", "hour": "h"}
+
+
+def load_timeline(granularity, span, event):
+    """(bucket index, base cumulativa, DataFrame dei rollup) dell'evento o None se vuoto."""
+    session = SessionLocal()
+    try:
+        end = last_bucket(session, granularity, event)
+        if end is None:
+            return None
+        since = end - span if span else None
+        base, rows = load_rollups(session, granularity, since, event)
+    finally:
+        session.close()
+    df = pd.DataFrame(rows, columns=["bucket", "question", "option", "count"])
+    start = since or df["bucket"].min()
+    return pd.date_range(start, end, freq=BUCKET_FREQ[granularity]), base, df
+
+
+def timeline_figures(granularity, span, key, event):
+    """(figura arrivi, figura deriva o None), oppure None se non ci sono rollup."""
+    timeline = load_timeline(granularity, span, event)
+    if timeline is None:
+        return None
+    index, base, df = timeline
+
+    # 1) Arrivi per minuto/ora, zero dove non è arrivato nulla
+    arrivals = (
+        df[df["question"] == TOTAL_KEY].set_index("bucket")["count"]
+        .reindex(index, fill_value=0)
+    )
+    arrivals_fig = px.bar(x=arrivals.index, y=arrivals.values, color_discrete_sequence=[PALETTE[4]])
+    arrivals_fig.update_layout(
+        xaxis_title=None,
+        yaxis_title="Risposte per " + ("minuto" if granularity == "minute" else "ora"),
+        margin=dict(t=20, l=20, r=20, b=20),
+        height=300
+    )
+
+    # 2) Quote cumulate delle opzioni nel tempo (deriva delle risposte)
+    q = BY_KEY[key]
+    sub = df[df["question"] == q.key]
+    if sub.empty:
+        return arrivals_fig, None
+    per_bucket = (
+        sub.pivot_table(index="bucket", columns="option", values="count", aggfunc="sum")
+        .reindex(index, fill_value=0).fillna(0)
+    )
+    options = [o for o in q.options if o in per_bucket.columns]
+    options += [o for o in per_bucket.columns if o not in options]
+    q_base = base.get(q.key, Counter())
+    cumulative = per_bucket[options].cumsum() + pd.Series({o: q_base.get(o, 0) for o in options})
+    if q.kind == MULTISELECT:
+        # Multiselect: quota sui rispondenti, non sulle scelte
+        denominator = arrivals.cumsum() + base.get(TOTAL_KEY, Counter()).get("", 0)
+    else:
+        denominator = cumulative.sum(axis=1)
+    shares = cumulative.div(denominator.where(denominator > 0), axis=0) * 100
+
+    drift_fig = px.line(shares, color_discrete_sequence=PALETTE)
+    drift_fig.update_layout(
+        xaxis_title=None,
+        yaxis_title="% cumulata",
+        legend_title=None,
+        margin=dict(t=20, l=20, r=20, b=20),
+        height=400
+    )
+    return arrivals_fig, drift_fig
+
+
+def render_timeline(event):
+    st.header("Andamento delle risposte")
+    window = st.radio("Finestra", list(TIMELINE_WINDOWS), horizontal=True, key="timeline-window")
+    key = st.selectbox("Domanda", [q.key for q in CLOSED_QUESTIONS],
+                       format_func=lambda key: BY_KEY[key].title, key="timeline-question")
+
+    # Figure ricalcolate solo se sono cambiate le risposte o i controlli
+    snapshot = get_live_feed(event).poll()
+    signature = (event, snapshot.watermark, snapshot.version, window, key)
+    cached = st.session_state.get("drawn-timeline")
+    if cached and cached[0] == signature:
+        figures = cached[1]
+    else:
+        figures = timeline_figures(*TIMELINE_WINDOWS[window], key, event)
+        st.session_state["drawn-timeline"] = (signature, figures)
+
+    if figures is None:
+        st.info("Nessun dato temporale (python db.py rebuild-rollups per le risposte già presenti).")
+        return
+    arrivals_fig, drift_fig = figures
+    plotly_chart(arrivals_fig, use_container_width=True, key="timeline-arrivals")
+    if drift_fig is None:
+        st.info(f"Nessuna risposta nella finestra per '{BY_KEY[key].title}'.")
+    else:
+        plotly_chart(drift_fig, use_container_width=True, key="timeline-drift")
+
+
+# ----------------------------------------------------------------
+# Modalità live: frammenti che si rieseguono da soli ogni `interval` secondi
+# ----------------------------------------------------------------
+LIVE_INTERVAL = int(os.environ.get("ADMIN_LIVE_INTERVAL", "5"))
+
+
+def live_settings():
+    """Intervallo di aggiornamento in secondi, oppure None se la modalità live è spenta.
+
+    ?admin=1&live=10 la accende già all'apertura (10 s).
+    """
+    param = st.query_params.get("live")
+    st.sidebar.header("Aggiornamento")
+    live = st.sidebar.toggle("Automatico", value=param is not None, key="live")
+    interval = st.sidebar.number_input(
+        "Intervallo (secondi)", min_value=1, max_value=300,
+        value=int(param) if param and param.isdigit() else LIVE_INTERVAL,
+        disabled=not live, key="live-interval"
+    )
+    return interval if live else None
+
+
+def current_counts(filters, event):
+    """SurveyCounts dallo snapshot condiviso; con filtri dal cubo, una volta per watermark."""
+    snapshot = get_live_feed(event).poll()
+    if not filters:
+        return snapshot.counts
+    signature = (event, snapshot.watermark, snapshot.version, tuple((k, tuple(v)) for k, v in filters.items()))
+    cached = st.session_state.get("filtered-counts")
+    if cached and cached[0] == signature:
+        return cached[1]
+    cube = get_response_cube(event)
+    cube.refresh()
+    counts = cube.aggregate(**filters)
+    st.session_state["filtered-counts"] = (signature, counts)
+    return counts
+
+
+def wait_for_first_response(event):
+    if get_live_feed(event).poll().counts.total:
+        st.rerun()
+
+
+def render_status(filters, event):
+    snapshot = get_live_feed(event).poll()
+    total = snapshot.counts.total
+    st.caption(
+        f"{total} risposte — ultima: {snapshot.last_timestamp:%d/%m/%Y %H:%M} UTC"
+        if snapshot.last_timestamp else f"{total} risposte"
+    )
+    if filters:
+        st.caption(f"Filtro attivo: {current_counts(filters, event).total} risposte su {total}")
+
+
+def render_question(section, q, filters, event):
+    """Grafico di una domanda; figura/PNG ricostruiti solo se i conteggi cambiano."""
+    result = current_counts(filters, event)[q.key]
+    if not result:
+        st.info(f"Nessuna risposta per '{q.title}'.")
+    else:
+        state_key = f"drawn-{q.key}"
+        signature = tuple(result.items())
+        cached = st.session_state.get(state_key)
+        payload = cached[1] if cached and cached[0] == signature else None
+        payload = RENDERERS[q.kind](section, result, payload)
+        st.session_state[state_key] = (signature, payload)
+    st.write("---")
+
+
+# ----------------------------------------------------------------
+# Metriche di processo (METRICS=1)
+# ----------------------------------------------------------------
+def sidebar_metrics():
+    if not metrics.ENABLED:
+        return False
+    st.sidebar.header("Diagnostica")
+    return st.sidebar.toggle("Metriche", key="metrics")
+
+
+def render_metrics():
+    snap = metrics.REGISTRY.snapshot()
+    st.header("Metriche")
+    error = github_writer_error()
+    if error:
+        st.warning(f"Worker GitHub non disponibile ({error}): le risposte restano in outbox")
+    ms = lambda s: round(s * 1000, 1)
+    st.dataframe(pd.DataFrame(
+        [{"stadio": name, "n": h["count"], "p50 ms": ms(h["p50"]), "p95 ms": ms(h["p95"]),
+          "p99 ms": ms(h["p99"]), "max ms": ms(h["max"]), "totale s": round(h["sum"], 2)}
+         for name, h in snap["histograms"].items()]
+    ), hide_index=True, use_container_width=True)
+    if snap["counters"]:
+        st.dataframe(pd.DataFrame(
+            [{"contatore": name, "valore": n} for name, n in snap["counters"].items()]
+        ), hide_index=True)
+    st.download_button("Scarica (Prometheus)", metrics.REGISTRY.to_prometheus(),
+                       file_name="metrics.prom", mime="text/plain", on_click="ignore")
+
+
+# ----------------------------------------------------------------
+# Admin Dashboard
+# ----------------------------------------------------------------
+def render(app_url, event=events.DEFAULT_EVENT):
+    st.title("EU AML Package")
+    qr_page = app_url if event == events.DEFAULT_EVENT else f"{app_url}?event={event}"
+    st.markdown(f"[Torna alla QR page]({qr_page})")
+    if event != events.DEFAULT_EVENT:
+        st.caption(f"Evento: {event}")
+    st.write("---")
+
+    # Risposte rimaste in coda (es. dopo un riavvio): ripartono spool e worker GitHub
+    get_spool_replayer()
+    if has_pending_outbox():
+        wake_github_writer()
+        if github_writer_error():
+            st.sidebar.warning("Invio a GitHub non riuscito: le risposte restano in coda")
+
+    feed = get_live_feed(event)
+    if st.sidebar.button("Ricarica risposte"):
+        feed.invalidate()
+    interval = live_settings()
+    show_metrics = sidebar_metrics()
+
+    # Tutte le domande in un round-trip (contatori), condiviso tra le sessioni
+    if not feed.poll().counts.total:
+        if interval:
+            # Anche da vuota la pagina resta in ascolto: si riapre alla prima risposta
+            st.fragment(run_every=interval)(wait_for_first_response)(event)
+        st.info("Ancora nessuna risposta.")
+        st.stop()
+
+    filters  = sidebar_filters()
+    crosstab = sidebar_crosstab()
+    sidebar_export(app_url, event)
+
+    # In modalità live ogni blocco è un frammento autonomo: a ogni intervallo
+    # si riesegue solo lui e ridisegna solo se i suoi conteggi sono cambiati
+    live = (lambda fn: st.fragment(run_every=interval)(fn)) if interval else (lambda fn: fn)
+
+    live(render_status)(filters, event)
+
+    # Incroci dal cubo colonnare: solo se richiesti dalla sidebar
+    if crosstab:
+        cube = get_response_cube(event)
+        cube.refresh()
+        rows, cols = crosstab
+        st.subheader("Incrocio tra domande")
+        st.dataframe(cube.crosstab(rows, cols, **filters), use_container_width=True)
+        st.write("---")
+
+    live(render_timeline)(event)
+    st.write("---")
+
+    for section in SECTIONS:
+        st.header(section.dashboard_title)
+        for q in section.questions:
+            live(render_question)(section, q, filters, event)
+
+    if show_metrics:
+        st.write("---")
+        live(render_metrics)()
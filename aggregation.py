@@ -0,0 +1,102 @@
+# aggregation.py
+# Un solo motore di aggregazione per tutte le domande dello schema.
+# Qualunque sia la sorgente (contatori, una query SQL, righe in memoria) si
+# ottiene un SurveyCounts tipizzato, che è ciò che usano i grafici in admin.py.
+# Costo O(N) (o O(opzioni) dai contatori), non O(N·domande).
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict
+
+from schema import QUESTIONS, BY_KEY, Question, MULTISELECT, FREETEXT
+from db import SessionLocal, TOTAL_KEY, load_counts, aggregate_counts, load_terms, filtered_terms
+from events import DEFAULT_EVENT
+from textnorm import tokenizer_for
+
+
+@dataclass(frozen=True)
+class QuestionCounts:
+    question: Question
+    counts: Dict[str, int] = field(default_factory=dict)
+
+    def items(self):
+        """(opzione, n) nell'ordine dello schema; le opzioni non più previste in coda."""
+        known = [(opt, self.counts[opt]) for opt in self.question.options if self.counts.get(opt)]
+        extra = sorted(
+            ((opt, n) for opt, n in self.counts.items() if n and opt not in self.question.options),
+            key=lambda kv: (-kv[1], kv[0]),
+        )
+        return known + extra
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def __bool__(self):
+        return self.total > 0
+
+
+@dataclass(frozen=True)
+class SurveyCounts:
+    total: int
+    questions: Dict[str, QuestionCounts]
+
+    def __getitem__(self, key):
+        return self.questions[key]
+
+    def __iter__(self):
+        return iter(self.questions.values())
+
+
+def from_counters(raw, total=None):
+    """SurveyCounts da {question: Counter} (load_counts / aggregate_counts)."""
+    if total is None:
+        total = raw.get(TOTAL_KEY, Counter()).get("", 0)
+    return SurveyCounts(
+        total=total,
+        questions={q.key: QuestionCounts(q, dict(raw.get(q.key, {}))) for q in QUESTIONS},
+    )
+
+
+def count_rows(rows):
+    """Un solo passaggio sulle righe (dict) per tutte le domande."""
+    raw = {q.key: Counter() for q in QUESTIONS}
+    multi  = [q.key for q in QUESTIONS if q.kind == MULTISELECT]
+    texts  = [(q.key, tokenizer_for(q)) for q in QUESTIONS if q.kind == FREETEXT]
+    single = [q.key for q in QUESTIONS if q.kind not in (MULTISELECT, FREETEXT)]
+    n = 0
+    for row in rows:
+        n += 1
+        for key in single:
+            value = row.get(key)
+            if value:
+                raw[key][value] += 1
+        for key in multi:
+            raw[key].update(row.get(key) or ())
+        for key, tokenizer in texts:
+            raw[key].update(tokenizer.terms(row.get(key)))
+    return from_counters(raw, total=n)
+
+
+def aggregate(session=None, event=DEFAULT_EVENT, **filters):
+    """Conteggi di tutte le domande dell'evento con un round-trip.
+
+    Senza filtri legge i contatori (O(opzioni)) e l'indice dei termini; con
+    filtri (es. budget="Sì") fa un'unica query UNION ALL su responses e conta
+    i termini dei testi liberi filtrati da response_terms.
+    """
+    own = session is None
+    session = session or SessionLocal()
+    try:
+        for key in filters:
+            if key not in BY_KEY or BY_KEY[key].kind in (MULTISELECT, FREETEXT):
+                raise ValueError(f"Filtro non supportato: {key}")
+        if filters:
+            raw = aggregate_counts(session, with_total=True, event=event, **filters)
+            raw.update(filtered_terms(session, event, **filters))
+        else:
+            raw = load_counts(session, event)
+            raw.update(load_terms(session, event))
+        return from_counters(raw)
+    finally:
+        if own:
+            session.close()
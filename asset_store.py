@@ -0,0 +1,83 @@
+# asset_store.py
+# QR code e loghi come data URI pronti, calcolati una volta e serviti dalla memoria.
+#
+#   python asset_store.py https://mia-app.streamlit.app   # pre-genera il QR in .cache/assets
+import base64
+import hashlib
+import io
+import os
+import sys
+import threading
+
+
+def _data_uri(png):
+    return "data:image/png;base64," + base64.b64encode(png).decode()
+
+
+def qr_png(url):
+    import qrcode
+
+    buf = io.BytesIO()
+    qrcode.make(url).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class AssetStore:
+    """Data URI in memoria.
+
+    - QR: chiave = URL (con copia su disco in cache_dir, se indicata)
+    - loghi: chiave = path, rigenerati solo se cambiano mtime o dimensione
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self._qr    = {}
+        self._logos = {}
+        self._lock  = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def qr_data_uri(self, url):
+        uri = self._qr.get(url)
+        if uri is None:
+            png = None
+            path = None
+            if self.cache_dir:
+                path = os.path.join(self.cache_dir, f"qr-{hashlib.sha1(url.encode()).hexdigest()}.png")
+                if os.path.exists(path):
+                    with open(path, "rb") as f:
+                        png = f.read()
+            if png is None:
+                png = qr_png(url)
+                if path:
+                    with open(path, "wb") as f:
+                        f.write(png)
+            uri = _data_uri(png)
+            with self._lock:
+                self._qr[url] = uri
+        return uri
+
+    def logo_data_uri(self, path):
+        """Data URI del logo, oppure None se il file non esiste."""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        signature = (st.st_mtime_ns, st.st_size)
+        cached = self._logos.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        with open(path, "rb") as f:
+            uri = _data_uri(f.read())
+        with self._lock:
+            self._logos[path] = (signature, uri)
+        return uri
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Uso: python asset_store.py <app_url>", file=sys.stderr)
+        sys.exit(2)
+    store = AssetStore(os.environ.get("ASSET_CACHE_DIR", ".cache/assets"))
+    store.qr_data_uri(f"{sys.argv[1]}?survey=1")
+    print(f"QR generato in {store.cache_dir}")
@@ -0,0 +1,13 @@
+# bench: benchmark offline (SQLite temporaneo + fake_github, niente rete)
+import os
+import tempfile
+
+
+def use_temp_db(folder=None, name="bench.db"):
+    """Punta SQLITE_FILENAME a un DB nuovo in `folder` (o in una cartella temporanea).
+
+    Va chiamata prima di importare db: il motore si crea all'import.
+    """
+    path = os.path.join(folder or tempfile.mkdtemp(), name)
+    os.environ["SQLITE_FILENAME"] = path
+    return path
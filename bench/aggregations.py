@@ -0,0 +1,74 @@
+# bench/aggregations.py
+# Conteggi della dashboard: Counter in Python su righe ORM vs GROUP BY in SQL vs contatori.
+#
+#   python -m bench.aggregations --sizes 10000 100000 1000000
+import argparse
+import time
+from collections import Counter
+
+from bench import use_temp_db
+
+
+def python_path(session, Response):
+    # Il percorso originale: tutte le righe ORM, poi un Counter per domanda
+    rows = session.query(Response).order_by(Response.timestamp).all()
+    responses = [
+        {k: getattr(r, k) for k in ["gap_analysis", "board_inform", "budget", "adeguamento_specifico",
+                                     "impacts", "bm_yes_no", "bm_nominee"]}
+        for r in rows
+    ]
+    counts = {}
+    for key in ["gap_analysis", "board_inform", "budget", "adeguamento_specifico", "bm_yes_no"]:
+        counts[key] = Counter(r.get(key) for r in responses if r.get(key) is not None)
+    counts["impacts"] = Counter(choice for r in responses for choice in r.get("impacts") or [])
+    counts["bm_nominee"] = Counter(r.get("bm_nominee") for r in responses if r.get("bm_nominee"))
+    return counts
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark aggregazioni della dashboard")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--python-max", type=int, default=1_000_000,
+                        help="oltre questa dimensione salta il percorso Python (lento)")
+    args = parser.parse_args()
+
+    use_temp_db()
+    from db import init_db, SessionLocal, Response, aggregate_counts, load_counts
+    from bench.synth import populate_db
+
+    init_db()
+    print(f"{'risposte':>9} {'python s':>9} {'sql s':>8} {'contatori s':>12}")
+    current = 0
+    for size in sorted(args.sizes):
+        # Il DB cresce fino alla dimensione successiva (seed diverso per ogni blocco)
+        populate_db(size - current, seed=size, offset=current)
+        current = size
+
+        session = SessionLocal()
+        try:
+            t_sql, sql = timed(lambda: aggregate_counts(session), args.repeat)
+            t_cnt, cnt = timed(lambda: load_counts(session), args.repeat)
+            if size <= args.python_max:
+                t_py, py = timed(lambda: python_path(session, Response), 1)
+                assert {k: +v for k, v in py.items()} == {k: +v for k, v in sql.items()}
+                py_col = f"{t_py:9.3f}"
+            else:
+                py_col = f"{'-':>9}"
+            assert all(cnt.get(k, Counter()) == v for k, v in sql.items())
+        finally:
+            session.close()
+        print(f"{size:9d} {py_col} {t_sql:8.4f} {t_cnt:12.5f}")
+
+
+if __name__ == "__main__":
+    main()
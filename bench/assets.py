@@ -0,0 +1,57 @@
+# bench/assets.py
+# Costo per rerun di QR + loghi: rigenerati a ogni esecuzione vs AssetStore in memoria.
+#
+#   python -m bench.assets --reruns 200
+import argparse
+import base64
+import io
+import os
+import tempfile
+import time
+
+ROOT  = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOGOS = [os.path.join(ROOT, "assets", "immagine.png"), os.path.join(ROOT, "assets", "acorà logo.png")]
+URL   = "https://survey.example.org/?survey=1"
+
+
+def before():
+    # Il percorso originale: rilegge i loghi e rigenera il QR a ogni rerun
+    import qrcode
+
+    for asset in LOGOS:
+        with open(asset, "rb") as f:
+            base64.b64encode(f.read()).decode()
+    buf = io.BytesIO()
+    qrcode.make(URL).save(buf, format="PNG")
+    base64.b64encode(buf.getvalue()).decode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark QR e loghi per rerun")
+    parser.add_argument("--reruns", type=int, default=200)
+    args = parser.parse_args()
+
+    from asset_store import AssetStore
+
+    store = AssetStore(tempfile.mkdtemp())
+
+    def after():
+        for asset in LOGOS:
+            store.logo_data_uri(asset)
+        store.qr_data_uri(URL)
+
+    start = time.perf_counter()
+    after()
+    warmup = time.perf_counter() - start
+
+    print(f"{'percorso':<12} {'ms/rerun':>10}")
+    for name, fn in [("prima", before), ("AssetStore", after)]:
+        start = time.perf_counter()
+        for _ in range(args.reruns):
+            fn()
+        print(f"{name:<12} {(time.perf_counter() - start) / args.reruns * 1000:10.3f}")
+    print(f"(primo build dell'AssetStore: {warmup * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# bench/cube.py
+# Filtri incrociati: lista di dict (ResponseCache) vs cubo colonnare NumPy.
+#
+#   python -m bench.cube --size 1000000
+import argparse
+import time
+from collections import Counter
+
+from bench import use_temp_db
+
+
+def dicts_path(rows):
+    # Ri-filtrare la lista di dict a ogni rerun: "impatti tra chi ha informato il CdA"
+    impacts = Counter()
+    for r in rows:
+        if r["board_inform"] == "Sì":
+            impacts.update(r["impacts"] or ())
+    nominee_by_gap = Counter((r["bm_nominee"], r["gap_analysis"]) for r in rows
+                             if r["bm_nominee"] and r["gap_analysis"])
+    return impacts, nominee_by_gap
+
+
+def cube_path(cube):
+    impacts = cube.counts("impacts", board_inform="Sì")
+    table = cube.crosstab("bm_nominee", "gap_analysis")
+    return impacts, table
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cubo colonnare delle risposte")
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--append", type=int, default=1_000, help="righe aggiunte dopo il primo caricamento")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    use_temp_db()
+    from db import init_db, SessionLocal
+    from bench.synth import populate_db
+    from cube import ResponseCube
+    from bench.response_cache import ResponseCache
+
+    init_db()
+    populate_db(args.size, seed=1)
+
+    cube = ResponseCube(SessionLocal)
+    t_build, _ = timed(cube.refresh, 1)
+    rows = ResponseCache(SessionLocal, max_rows=args.size + args.append).load()
+
+    populate_db(args.append, seed=2, offset=args.size)
+    t_append, added = timed(cube.refresh, 1)
+    assert added == args.append
+    rows += ResponseCache(SessionLocal, max_rows=args.size + args.append).load()[len(rows):]
+
+    t_dicts, (imp_d, tab_d) = timed(lambda: dicts_path(rows), 1)
+    t_cube,  (imp_c, tab_c) = timed(lambda: cube_path(cube), args.repeat)
+    assert imp_d == imp_c
+    assert all(tab_c.loc[nominee, gap] == n for (nominee, gap), n in tab_d.items())
+
+    t_agg, _ = timed(lambda: cube.aggregate(board_inform="Sì", budget="No"), args.repeat)
+
+    mem = sum(col.nbytes for col in cube._cols.values()) / 2**20
+    print(f"risposte:                 {len(cube)}")
+    print(f"costruzione cubo (s):     {t_build:.2f}")
+    print(f"append {args.append} righe (s):  {t_append:.4f}")
+    print(f"lista di dict (s):        {t_dicts:.3f}")
+    print(f"cubo NumPy (s):           {t_cube:.4f}  ({t_dicts / t_cube:.0f}x)")
+    print(f"aggregate con 2 filtri:   {t_agg:.4f}")
+    print(f"memoria colonne (MiB):    {mem:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# bench/db_writes.py
+# Scrittori concorrenti su SQLite: una sessione+commit per invio vs DBWriter (group commit).
+# Misura il caso di molti thread che scrivono insieme: nell'app gli invii del
+# survey vanno nello spool e l'unico a scrivere nel DB è il replayer, che
+# manda già un blocco per commit (per quel percorso vedi bench/spool.py).
+#
+#   python -m bench.db_writes --submitters 64 --per-submitter 50
+import argparse
+import statistics
+import threading
+import time
+
+from bench import use_temp_db
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else 0.0
+
+
+def run(name, submit, submitters, per_submitter):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    barrier = threading.Barrier(submitters)
+
+    def worker(i):
+        barrier.wait()
+        for j in range(per_submitter):
+            start = time.perf_counter()
+            try:
+                submit(i, j)
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(submitters)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    locked = sum("locked" in str(e) for e in errors)
+    print(f"{name:<10} {len(latencies) / elapsed:10.1f} {statistics.median(latencies) * 1000:8.1f} "
+          f"{percentile(latencies, 99) * 1000:8.1f} {len(errors):7d} {locked:7d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scritture concorrenti su SQLite")
+    parser.add_argument("--submitters", type=int, default=64)
+    parser.add_argument("--per-submitter", type=int, default=50)
+    args = parser.parse_args()
+
+    use_temp_db()
+    from db import init_db, SessionLocal, Response, GithubOutbox
+    from db_writer import DBWriter
+
+    init_db()
+
+    def make(i, j):
+        path = f"responses/bench-{i}-{j}-{time.perf_counter_ns()}.json"
+        return [Response(gap_analysis="Sì", impacts=["AML Governance", "Outsourcing"],
+                         bm_yes_no="No", source_path=path),
+                GithubOutbox(path=path, payload="{}")]
+
+    def direct(i, j):
+        session = SessionLocal()
+        try:
+            session.add_all(make(i, j))
+            session.commit()
+        finally:
+            session.close()
+
+    writer = DBWriter(SessionLocal).start()
+
+    print(f"{'modo':<10} {'insert/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'errori':>7} {'locked':>7}")
+    run("sessione", direct, args.submitters, args.per_submitter)
+    run("DBWriter", lambda i, j: writer.write(*make(i, j)), args.submitters, args.per_submitter)
+
+
+if __name__ == "__main__":
+    main()
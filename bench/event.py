@@ -0,0 +1,263 @@
+# bench/event.py
+# Prova generale dell'evento: centinaia di persone inquadrano il QR nello stesso
+# minuto mentre il proiettore tiene aperta la dashboard ?admin=1.
+#
+# L'app intera gira in AppTest (headless): ogni rispondente è una sessione che
+# apre il form, lo compila e invia; ogni spettatore riesegue la dashboard.
+# GitHub è un FakeRepo in memoria con latenza e 409 configurabili.
+#
+#   python -m bench.event --respondents 300 --window 60 --viewers 3
+#   python -m bench.event --respondents 500 --concurrency 100 --latency 0.3 --conflict-rate 0.2
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench import use_temp_db
+from bench.db_writes import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP  = os.path.join(ROOT, "streamlit_app.py")
+
+
+SECRETS = {"github_token": "bench", "repo_name": "bench/bench", "app_url": "http://localhost:8501"}
+
+
+def share_app_test_globals():
+    """Rende AppTest usabile da più thread insieme.
+
+    AppTest.run installa un Runtime finto, sostituisce st.secrets e attiva
+    global.appTest solo per la durata del run, poi ripristina: con più
+    sessioni in parallelo una che finisce toglie runtime, secrets e stato
+    dei widget a quelle ancora in corso. Qui secrets e appTest valgono per
+    tutto il processo (le sessioni non passano at.secrets) e, tra un run e
+    l'altro, resta valido l'ultimo Runtime finto installato.
+    """
+    import streamlit as st
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.secrets import Secrets
+    from streamlit.testing.v1.util import patch_config_options
+
+    last = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            last["runtime"] = cls._instance
+        if "runtime" not in last:
+            raise RuntimeError("Runtime hasn't been created!")
+        return last["runtime"]
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or "runtime" in last)
+
+    secrets = Secrets()
+    secrets._secrets = dict(SECRETS)
+    st.secrets = secrets
+    return patch_config_options({"global.appTest": True})
+
+
+def new_session(mode=None):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=300)
+    if mode:
+        at.query_params[mode] = "1"
+    return at
+
+
+def errors_of(at):
+    return [str(e.value) for e in at.exception] + [str(e.value) for e in at.error]
+
+
+# ----------------------------------------------------------------
+# 1) Rispondenti e spettatori
+# ----------------------------------------------------------------
+def respondent(record):
+    """Apre il form, lo compila, invia; ritorna (latenza invio s, errore o None)."""
+    from schema import BY_KEY, MULTISELECT, FREETEXT
+
+    at = new_session("survey")
+    at.run()
+    if errors_of(at):
+        return None, f"apertura form: {errors_of(at)[0]}"
+    for key, value in record.items():
+        if key not in BY_KEY or not value:
+            continue
+        if BY_KEY[key].kind == MULTISELECT:
+            at.multiselect(key=key).set_value(value)
+        elif BY_KEY[key].kind == FREETEXT:
+            at.text_area(key=key).set_value(value)
+        else:
+            at.radio(key=key).set_value(value)
+    at.button[0].click()
+    start = time.perf_counter()
+    at.run()
+    latency = time.perf_counter() - start
+    if errors_of(at):
+        return latency, errors_of(at)[0]
+    if not any("registrate" in str(s.value) for s in at.success):
+        return latency, "nessuna conferma di invio"
+    return latency, None
+
+
+def viewer(stop, interval, renders, failures, lock):
+    """Dashboard aperta sul proiettore: un rerun ogni `interval` secondi."""
+    at = new_session("admin")
+    while not stop.is_set():
+        start = time.perf_counter()
+        at.run()
+        elapsed = time.perf_counter() - start
+        with lock:
+            renders.append(elapsed)
+            failures.extend(errors_of(at))
+        stop.wait(interval)
+
+
+# ----------------------------------------------------------------
+# 2) Errori di lock SQLite, visti dal motore SQLAlchemy
+# ----------------------------------------------------------------
+class LockErrors:
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        self._lock = threading.Lock()
+        event.listen(engine, "handle_error", self._on_error)
+
+    def _on_error(self, context):
+        if "locked" in str(context.original_exception).lower():
+            with self._lock:
+                self.count += 1
+
+
+def wait_for_github(session_factory, timeout):
+    """Attende che l'outbox si svuoti; ritorna le righe ancora in coda."""
+    from db import GithubOutbox
+    from resources import wake_github_writer
+
+    deadline = time.monotonic() + timeout
+    while True:
+        session = session_factory()
+        try:
+            pending = session.query(GithubOutbox).filter(GithubOutbox.sent_at.is_(None)).count()
+        finally:
+            session.close()
+        if not pending or time.monotonic() > deadline:
+            return pending
+        wake_github_writer()
+        time.sleep(0.5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test end-to-end: rispondenti + dashboard + GitHub finto")
+    parser.add_argument("--respondents", type=int, default=300)
+    parser.add_argument("--window", type=float, default=60.0, help="secondi in cui arrivano tutti i rispondenti")
+    parser.add_argument("--concurrency", type=int, default=50, help="sessioni del form aperte insieme (max)")
+    parser.add_argument("--viewers", type=int, default=2, help="dashboard ?admin=1 aperte")
+    parser.add_argument("--refresh", type=float, default=2.0, help="secondi tra un rerun e l'altro della dashboard")
+    parser.add_argument("--latency", type=float, default=0.2, help="secondi per chiamata API GitHub finta")
+    parser.add_argument("--conflict-rate", type=float, default=0.1, help="probabilità di 409 per scrittura")
+    parser.add_argument("--drain-timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="salva il report anche in JSON")
+    args = parser.parse_args()
+
+    # DB, spool e cache in una cartella temporanea; va fatto prima di importare db
+    tmp = tempfile.mkdtemp(prefix="bench-event-")
+    use_temp_db(tmp, "event.db")
+    os.environ["SPOOL_DIR"] = os.path.join(tmp, "spool")
+    os.environ["WORDCLOUD_CACHE_DIR"] = os.path.join(tmp, "wordcloud")
+    os.environ["ASSET_CACHE_DIR"] = os.path.join(tmp, "assets")
+    os.chdir(ROOT)
+
+    import github
+    from bench.synth import synth_records
+    from db import engine, init_db, SessionLocal, Response
+    from fake_github import FakeGithub, FakeRepo
+
+    init_db()
+    share_app_test_globals().__enter__()   # per tutta la vita del processo
+    repo = FakeRepo(latency=args.latency, conflict_rate=args.conflict_rate, seed=args.seed)
+    github.Github = FakeGithub.bound(repo)
+    locks = LockErrors(engine)
+
+    records = [record for _, record in synth_records(args.respondents, seed=args.seed)]
+    rng = random.Random(args.seed)
+    arrivals = sorted(rng.uniform(0, args.window) for _ in records)
+
+    # Spettatori
+    stop, lock = threading.Event(), threading.Lock()
+    renders, view_failures = [], []
+    viewers = [threading.Thread(target=viewer, args=(stop, args.refresh, renders, view_failures, lock), daemon=True)
+               for _ in range(args.viewers)]
+    for t in viewers:
+        t.start()
+
+    # Rispondenti: ognuno parte al suo istante di arrivo
+    start = time.perf_counter()
+
+    def arrive(i):
+        delay = arrivals[i] - (time.perf_counter() - start)
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            return respondent(records[i])
+        except Exception as e:
+            return None, repr(e)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(arrive, range(len(records))))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for t in viewers:
+        t.join()
+
+    pending = wait_for_github(SessionLocal, args.drain_timeout)
+    session = SessionLocal()
+    try:
+        stored = session.query(Response).count()
+    finally:
+        session.close()
+
+    latencies = [lat for lat, err in results if lat is not None and err is None]
+    failures  = [err for _, err in results if err]
+    report = {
+        "respondents": len(records),
+        "elapsed_s": round(elapsed, 2),
+        "submit_ms": {f"p{p}": round(percentile(latencies, p) * 1000, 1) for p in (50, 90, 99)}
+                     | {"max": round(max(latencies, default=0) * 1000, 1)},
+        "failed_submissions": len(failures),
+        "failure_samples": sorted(set(failures))[:5],
+        "dashboard_renders": len(renders),
+        "dashboard_ms": {f"p{p}": round(percentile(renders, p) * 1000, 1) for p in (50, 90, 99)},
+        "dashboard_errors": len(view_failures),
+        "sqlite_lock_errors": locks.count,
+        "rows_in_db": stored,
+        "github": {"commits": repo.commits, "files": len(repo.files), "api_calls": repo.api_calls,
+                   "conflicts_409": repo.conflicts, "outbox_pending": pending},
+    }
+
+    print(f"rispondenti:        {report['respondents']} in {report['elapsed_s']} s")
+    print(f"invio (ms):         p50 {report['submit_ms']['p50']}  p90 {report['submit_ms']['p90']}  "
+          f"p99 {report['submit_ms']['p99']}  max {report['submit_ms']['max']}")
+    print(f"invii falliti:      {report['failed_submissions']}"
+          + (f"  es. {report['failure_samples']}" if failures else ""))
+    print(f"dashboard (ms):     p50 {report['dashboard_ms']['p50']}  p90 {report['dashboard_ms']['p90']}  "
+          f"p99 {report['dashboard_ms']['p99']}  ({report['dashboard_renders']} render, "
+          f"{report['dashboard_errors']} errori)")
+    print(f"lock SQLite:        {report['sqlite_lock_errors']}")
+    print(f"righe nel DB:       {report['rows_in_db']}")
+    print(f"GitHub finto:       {repo.commits} commit, {len(repo.files)} file, {repo.api_calls} chiamate, "
+          f"{repo.conflicts} 409, {pending} ancora in outbox")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
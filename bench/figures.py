@@ -0,0 +1,150 @@
+# bench/figures.py
+# Figure della dashboard: plotly.express + pandas a ogni rerun vs cache di figure.
+#
+#   python -m bench.figures --size 10000 --reruns 20
+import argparse
+import os
+import textwrap
+import time
+
+from bench import use_temp_db
+
+
+def express_yesno(items):
+    # Il percorso originale: DataFrame + px.pie + colori per etichetta
+    import pandas as pd
+    import plotly.express as px
+    from figure_cache import YESNO_FILL, YESNO_BORDER
+
+    df = pd.DataFrame({"Risposta": [i[0] for i in items], "Conteggio": [i[1] for i in items]})
+    fig = px.pie(df, names="Risposta", values="Conteggio", hole=0.5, color="Risposta",
+                 color_discrete_map=YESNO_FILL)
+    fig.update_traces(marker=dict(line=dict(color=[YESNO_BORDER[l] for l in df["Risposta"]], width=4)),
+                      textinfo="label+percent", textposition="inside",
+                      textfont=dict(size=24, color="white"))
+    fig.update_layout(margin=dict(t=20, l=20, r=20, b=20), showlegend=False)
+    return fig
+
+
+def express_categorical(items):
+    import pandas as pd
+    import plotly.express as px
+    from figure_cache import CATEGORICAL_FILL, CATEGORICAL_BORDER
+
+    df = pd.DataFrame({"Opzione": [i[0] for i in items], "Conteggio": [i[1] for i in items]})
+    df["Percentuale"] = df["Conteggio"] / df["Conteggio"].sum() * 100
+    fig = px.bar(df, x="Opzione", y="Conteggio", custom_data=["Percentuale"])
+    fig.update_traces(
+        marker=dict(color=[CATEGORICAL_FILL[o] for o in df["Opzione"]],
+                    line=dict(color=[CATEGORICAL_BORDER[o] for o in df["Opzione"]], width=4)),
+        texttemplate="%{y}<br>%{customdata[0]:.1f}%", textposition="inside",
+        insidetextanchor="middle", textfont=dict(size=30, color="white"))
+    fig.update_yaxes(tickformat=".0f", showgrid=False)
+    fig.update_xaxes(ticktext=["<br>".join(textwrap.wrap(o, width=15)) for o in df["Opzione"]],
+                     tickvals=df["Opzione"], tickfont=dict(size=18), automargin=True)
+    fig.update_layout(xaxis_title=None, yaxis_title=None, margin=dict(t=20, b=300, l=50, r=20), height=600)
+    return fig
+
+
+def emit(fig):
+    # Quello che fa st.plotly_chart con una figura: to_dict + JSON per il browser
+    import plotly.io
+    return plotly.io.to_json(fig.to_dict(), validate=False)
+
+
+def per_call(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def micro(repeat):
+    from aggregation import QuestionCounts
+    from figure_cache import FigureCache, yesno_figure, categorical_figure
+    from schema import BY_KEY
+
+    yes = QuestionCounts(BY_KEY["gap_analysis"], {"Sì": 120, "No": 80})
+    cat = QuestionCounts(BY_KEY["bm_nominee"], {o: 10 * (i + 1) for i, o in enumerate(BY_KEY["bm_nominee"].options)})
+    cache = FigureCache()
+    print(f"{'figura':<12} {'px+pandas':>10} {'go diretto':>11} {'cache hit':>10} {'emit':>8}   (ms)")
+    for name, result, express, direct in [("donut", yes, express_yesno, yesno_figure),
+                                          ("barre", cat, express_categorical, categorical_figure)]:
+        items = result.items()
+        cache.figure(result)
+        print(f"{name:<12} "
+              f"{per_call(lambda: express(items), repeat):10.2f} "
+              f"{per_call(lambda: direct(items), repeat):11.2f} "
+              f"{per_call(lambda: cache.figure(result), repeat):10.4f} "
+              f"{per_call(lambda: emit(cache.figure(result)), repeat):8.2f}")
+
+
+def dashboard(size, reruns):
+    from streamlit.testing.v1 import AppTest
+    from bench.synth import populate_db
+    from db import init_db, SessionLocal, Response
+    import resources
+
+    init_db()
+    populate_db(size, seed=1)
+
+    def fresh_app():
+        at = AppTest.from_file(os.path.join(os.path.dirname(__file__), "..", "streamlit_app.py"),
+                               default_timeout=120)
+        at.secrets["github_token"] = "x"
+        at.secrets["repo_name"] = "a/b"
+        at.secrets["app_url"] = "http://localhost"
+        at.query_params["admin"] = "1"
+        return at
+
+    def add_response(value):
+        session = SessionLocal()
+        try:
+            session.add(Response(gap_analysis=value))
+            session.commit()
+        finally:
+            session.close()
+        resources.get_live_feed().invalidate()
+
+    print(f"\n{'cache':<8} {'invariato ms':>13} {'cambiato ms':>12}")
+    for cache_size in [0, 256]:
+        os.environ["FIGURE_CACHE_SIZE"] = str(cache_size)
+        resources.get_figure_cache.clear()
+        at = fresh_app()
+        at.run()
+        at.run()   # word cloud finale in cache
+
+        unchanged = []
+        for _ in range(reruns):
+            start = time.perf_counter()
+            at.run()
+            unchanged.append(time.perf_counter() - start)
+
+        changed = []
+        for i in range(reruns):
+            # Stato di sessione nuovo: conta solo la cache di processo
+            add_response("Sì" if i % 2 else "No")
+            at = fresh_app()
+            start = time.perf_counter()
+            at.run()
+            changed.append(time.perf_counter() - start)
+        assert not at.exception, at.exception
+
+        med = lambda xs: sorted(xs)[len(xs) // 2] * 1000
+        print(f"{cache_size or 'off':<8} {med(unchanged):13.1f} {med(changed):12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark figure della dashboard")
+    parser.add_argument("--size", type=int, default=10_000)
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    use_temp_db()
+    micro(args.repeat)
+    dashboard(args.size, args.reruns)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# bench/github_batch.py
+# Un commit per risposta (create_file) vs un commit per blocco (Git trees API).
+#
+#   python -m bench.github_batch --responses 500 --latency 0.02 --conflict-rate 0.05
+import argparse
+import json
+import time
+from uuid import uuid4
+
+from bench import use_temp_db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scrittura risposte su GitHub (fake)")
+    parser.add_argument("--responses", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.02, help="secondi per chiamata API finta")
+    parser.add_argument("--conflict-rate", type=float, default=0.05)
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+
+    use_temp_db()
+    from db import init_db, SessionLocal, GithubOutbox
+    from fake_github import FakeRepo
+    from github_writer import GithubWriter, BatchGithubWriter, enqueue
+
+    init_db()
+    payload = json.dumps({"impacts": ["AML Governance"]}, ensure_ascii=False, indent=2)
+
+    writers = [
+        ("per-file", lambda repo: GithubWriter(repo, batch_size=args.batch_size, backoff=0.01)),
+        ("batch",    lambda repo: BatchGithubWriter(repo, batch_size=args.batch_size, backoff=0.01)),
+    ]
+    print(f"{'writer':<10} {'sec':>8} {'risp/s':>9} {'commit':>7} {'commit/s':>9} {'API/risp':>9}")
+    for name, make in writers:
+        session = SessionLocal()
+        session.query(GithubOutbox).delete()
+        for _ in range(args.responses):
+            enqueue(session, f"responses/{uuid4()}.json", payload)
+        session.commit()
+        session.close()
+
+        repo = FakeRepo(latency=args.latency, conflict_rate=args.conflict_rate)
+        writer = make(repo)
+        start = time.perf_counter()
+        while writer.pending_count():
+            writer.drain_once()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<10} {elapsed:8.2f} {args.responses / elapsed:9.1f} {repo.commits:7d} "
+              f"{repo.commits / elapsed:9.2f} {repo.api_calls / args.responses:9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# bench/response_cache.py
+# Riferimento per i benchmark: le risposte decodificate in una lista di dict
+# (il vecchio load_responses), contro cui si misurano cubo e aggregazioni SQL.
+import threading
+
+import metrics
+from db import SessionLocal, Response
+from events import DEFAULT_EVENT
+from schema import QUESTION_KEYS
+
+# Colonne decodificate per ogni risposta (stesso formato del vecchio load_responses)
+FIELDS = QUESTION_KEYS
+
+
+class ResponseCache:
+    """Risposte decodificate in memoria di processo, aggiornate per delta.
+
+    Tiene l'id più alto già letto (watermark): ogni refresh legge solo le righe
+    con id > watermark. Oltre max_rows le righe più vecchie vengono scartate.
+    Contiene solo le risposte di `event`.
+    """
+
+    def __init__(self, session_factory=SessionLocal, max_rows=200_000, event=DEFAULT_EVENT):
+        self.session_factory = session_factory
+        self.event     = event
+        self.max_rows  = max_rows
+        self.watermark = 0
+        self.truncated = False
+        self._rows = []
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Legge le righe nuove e le aggiunge; ritorna la lista delle nuove."""
+        with self._lock, metrics.span("responses.load"):
+            session = self.session_factory()
+            try:
+                cols = [Response.id, Response.timestamp] + [getattr(Response, f) for f in FIELDS]
+                rows = (
+                    session.query(*cols)
+                    .filter(Response.event == self.event, Response.id > self.watermark)
+                    .order_by(Response.id)
+                    .all()
+                )
+            finally:
+                session.close()
+
+            new = [
+                dict(zip(["id", "timestamp"] + FIELDS, row))
+                for row in rows
+            ]
+            metrics.incr("responses.rows_scanned", len(new))
+            if new:
+                self._rows.extend(new)
+                self.watermark = new[-1]["id"]
+                overflow = len(self._rows) - self.max_rows
+                if overflow > 0:
+                    del self._rows[:overflow]
+                    self.truncated = True
+            return new
+
+    def load(self):
+        """Refresh incrementale + snapshot delle risposte in cache."""
+        self.refresh()
+        with self._lock:
+            return list(self._rows)
+
+    def invalidate(self):
+        """Svuota la cache: il prossimo refresh rilegge tutta la tabella."""
+        with self._lock:
+            self._rows = []
+            self.watermark = 0
+            self.truncated = False
+
+    def __len__(self):
+        return len(self._rows)
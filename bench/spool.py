@@ -0,0 +1,82 @@
+# bench/spool.py
+# Spool locale: append concorrenti con fsync raggruppati, poi replay verso SQLite
+# e GitHub finto (BatchGithubWriter + FakeRepo).
+#
+#   python -m bench.spool --submitters 64 --per-submitter 50
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from bench import use_temp_db
+from bench.db_writes import percentile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark spool + replay")
+    parser.add_argument("--submitters", type=int, default=64)
+    parser.add_argument("--per-submitter", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02, help="secondi per chiamata API finta")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    use_temp_db(tmp)
+    from db import init_db, SessionLocal, Response
+    from db_writer import DBWriter
+    from fake_github import FakeRepo
+    from github_writer import BatchGithubWriter
+    from spool import Spool, SpoolReplayer
+
+    init_db()
+    spool = Spool(os.path.join(tmp, "spool"), max_segment_bytes=256 * 1024)
+    payload = json.dumps({"gap_analysis": "Sì", "impacts": ["AML Governance", "Outsourcing"]},
+                         ensure_ascii=False, indent=2)
+
+    # 1) Append concorrenti
+    latencies, lock = [], threading.Lock()
+
+    def worker(i):
+        for j in range(args.per_submitter):
+            start = time.perf_counter()
+            spool.append({"path": f"responses/bench-{i}-{j}.json",
+                          "ts": datetime.utcnow().isoformat(), "payload": payload})
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.submitters)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    n = len(latencies)
+    print(f"append:  {n / elapsed:9.1f} risposte/s  p50 {percentile(latencies, 50) * 1000:6.2f} ms  "
+          f"p99 {percentile(latencies, 99) * 1000:6.2f} ms  segmenti {len(spool.segments())}")
+
+    # 2) Replay verso SQLite (due volte: la seconda non deve inserire nulla)
+    replayer = SpoolReplayer(spool, DBWriter(SessionLocal).start(), SessionLocal)
+    start = time.perf_counter()
+    inserted = replayer.replay_once()
+    elapsed = time.perf_counter() - start
+    session = SessionLocal()
+    rows = session.query(Response).count()
+    session.close()
+    print(f"replay:  {inserted / elapsed:9.1f} risposte/s  inserite {inserted}  righe in DB {rows}  "
+          f"rilancio {replayer.replay_once()}")
+
+    # 3) Outbox verso GitHub finto
+    repo = FakeRepo(latency=args.latency)
+    writer = BatchGithubWriter(repo, SessionLocal)
+    start = time.perf_counter()
+    while writer.pending_count():
+        writer.drain_once()
+    elapsed = time.perf_counter() - start
+    print(f"github:  {n / elapsed:9.1f} risposte/s  commit {repo.commits}  file {len(repo.files)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# bench/startup.py
+# Tempo di import e di primo render per modalità (landing / survey / admin).
+# Ogni modalità gira in un processo nuovo, così gli import sono "a freddo".
+#
+#   python -m bench.startup
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT  = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = {"landing": None, "survey": "survey", "admin": "admin"}
+HEAVY = ["plotly", "wordcloud", "pandas", "qrcode", "github", "matplotlib"]
+
+CHILD = r"""
+import importlib, json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t_streamlit = time.perf_counter() - t0
+baseline = set(sys.modules)
+
+t0 = time.perf_counter()
+importlib.import_module({module!r})
+t_import = time.perf_counter() - t0
+
+at = AppTest.from_file("streamlit_app.py", default_timeout=300)
+at.secrets["github_token"] = "bench"
+at.secrets["repo_name"] = "bench/bench"
+at.secrets["app_url"] = "http://localhost:8501"
+if {param!r}:
+    at.query_params[{param!r}] = "1"
+t0 = time.perf_counter()
+at.run()
+t_first = time.perf_counter() - t0
+t0 = time.perf_counter()
+at.run()
+t_rerun = time.perf_counter() - t0
+
+heavy = sorted({{m.split(".")[0] for m in set(sys.modules) - baseline}} & set({heavy!r}))
+print(json.dumps({{"streamlit_s": t_streamlit, "import_s": t_import, "first_render_s": t_first,
+                  "rerun_s": t_rerun, "heavy": heavy, "errors": [str(e.value) for e in at.exception]}}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark avvio per modalità")
+    parser.parse_args()
+
+    env = dict(os.environ, SQLITE_FILENAME=os.path.join(tempfile.mkdtemp(), "bench.db"))
+    print(f"{'modo':<8} {'import s':>9} {'1° render s':>12} {'rerun s':>8}  moduli pesanti")
+    for mode, param in MODES.items():
+        code = CHILD.format(module=mode, param=param, heavy=HEAVY)
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                             capture_output=True, text=True, check=True)
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{mode:<8} {r['import_s']:9.3f} {r['first_render_s']:12.3f} {r['rerun_s']:8.3f}  "
+              f"{', '.join(r['heavy']) or '-'}" + (f"  ERRORI: {r['errors']}" if r["errors"] else ""))
+
+
+if __name__ == "__main__":
+    main()
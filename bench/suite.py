@@ -0,0 +1,212 @@
+# bench/suite.py
+# Suite per stadio al crescere dei dati: ogni stadio caldo misurato da solo
+# a 1k / 100k / 1M risposte sintetiche, risultati in JSON confrontabili.
+#
+#   python -m bench.suite                                  # 1k, 100k, 1M
+#   python -m bench.suite --sizes 1000 100000 --out prima.json
+#   python -m bench.suite --sizes 1000 100000 --compare prima.json
+#
+# Ogni taglia gira in un processo nuovo con il suo SQLite temporaneo
+# (db.py sceglie il file all'import) e la memoria di picco è per taglia.
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from bench import use_temp_db
+
+ROOT   = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIZES  = [1_000, 100_000, 1_000_000]
+STAGES = ["synth_json", "migrate", "load_responses", "aggregate_counter",
+          "aggregate_counters_table", "tokenize_text", "term_index", "wordcloud", "figures",
+          "export_csv", "export_parquet"]
+
+
+# ----------------------------------------------------------------
+# 1) Stadi: ognuno riceve il contesto della taglia e ritorna un dict
+#    di extra (righe, byte, ...) da salvare accanto al tempo
+# ----------------------------------------------------------------
+def stage_synth_json(ctx):
+    from bench.synth import write_json_files
+    return {"files": len(write_json_files(ctx["folder"], ctx["size"], seed=ctx["seed"]))}
+
+
+def stage_migrate(ctx):
+    from migrate import LocalSource, migrate
+    # Un avviso per file saltato: fuori dal terminale (e dal tempo misurato)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+        imported, skipped = migrate(LocalSource(ctx["folder"]))
+    return {"imported": imported, "skipped": skipped}
+
+
+def stage_load_responses(ctx):
+    # Quello che era load_responses(): tutte le risposte decodificate in dict
+    from bench.response_cache import ResponseCache
+    ctx["rows"] = ResponseCache(max_rows=ctx["size"]).load()
+    return {"rows": len(ctx["rows"])}
+
+
+def stage_aggregate_counter(ctx):
+    # Un Counter per domanda, in un solo passaggio sulle righe
+    from aggregation import count_rows
+    ctx["counts"] = count_rows(ctx["rows"])
+    return {"total": ctx["counts"].total}
+
+
+def stage_aggregate_counters_table(ctx):
+    # Percorso della dashboard: tabella option_counts, una query
+    from aggregation import aggregate
+    return {"total": aggregate().total}
+
+
+def stage_tokenize_text(ctx):
+    # Quello che l'indice evita: ritokenizzare tutte le note (tokenizer nuovo, cache vuota)
+    from collections import Counter
+    from schema import BY_KEY
+    from textnorm import Tokenizer
+    tokenizer = Tokenizer(phrases=BY_KEY["bm_notes"].phrases)
+    terms = Counter()
+    for row in ctx["rows"]:
+        terms.update(tokenizer.terms(row.get("bm_notes")))
+    return {"terms": len(terms)}
+
+
+def stage_term_index(ctx):
+    # Percorso della dashboard: termini più frequenti da term_counts
+    from db import SessionLocal, load_terms
+    session = SessionLocal()
+    try:
+        return {"terms": len(load_terms(session)["bm_notes"])}
+    finally:
+        session.close()
+
+
+def stage_wordcloud(ctx):
+    from wordcloud_cache import WORDCLOUD_PARAMS, render_png
+    return {"bytes": len(render_png(dict(ctx["counts"]["impacts"].counts), WORDCLOUD_PARAMS))}
+
+
+def stage_figures(ctx):
+    from figure_cache import BUILDERS
+    figures = [BUILDERS[result.question.kind](result.items())
+               for result in ctx["counts"] if result.question.kind in BUILDERS]
+    return {"figures": len(figures)}
+
+
+def _stage_export(ctx, fmt):
+    from export import export, iter_db
+    out = os.path.join(ctx["tmp"], f"export.{fmt}")
+    rows = export(iter_db(), out)
+    return {"rows": rows, "bytes": os.path.getsize(out)}
+
+
+def stage_export_csv(ctx):
+    return _stage_export(ctx, "csv")
+
+
+def stage_export_parquet(ctx):
+    return _stage_export(ctx, "parquet")
+
+
+# ----------------------------------------------------------------
+# 2) Processo figlio: una taglia, stadi in ordine (ognuno usa i precedenti)
+# ----------------------------------------------------------------
+def run_size(size, stages, seed, repeat):
+    # Gli stadi che modificano lo stato (file, DB) girano una volta sola
+    once = {"synth_json", "migrate"}
+    tmp = tempfile.mkdtemp(prefix=f"bench-{size}-")
+    use_temp_db(tmp)
+    from db import init_db
+    init_db()
+
+    ctx = {"size": size, "seed": seed, "tmp": tmp, "folder": os.path.join(tmp, "responses")}
+    results = []
+    for name in STAGES:
+        if name not in stages:
+            continue
+        fn = globals()[f"stage_{name}"]
+        times = []
+        for _ in range(1 if name in once else repeat):
+            start = time.perf_counter()
+            extra = fn(ctx)
+            times.append(time.perf_counter() - start)
+        results.append({"size": size, "stage": name, "seconds": min(times),
+                        "runs": len(times), **extra})
+        print(f"  {size:>9} {name:<26} {min(times):9.3f}s", file=sys.stderr)
+    shutil.rmtree(tmp, ignore_errors=True)
+    peak_mib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"size": size, "peak_rss_mib": round(peak_mib, 1), "stages": results}
+
+
+# ----------------------------------------------------------------
+# 3) Confronto tra due file di risultati
+# ----------------------------------------------------------------
+def compare(old, new):
+    before = {(r["size"], r["stage"]): r["seconds"] for run in old["runs"] for r in run["stages"]}
+    print(f"\n{'taglia':>9} {'stadio':<26} {'prima s':>9} {'dopo s':>9} {'rapporto':>9}")
+    for run in new["runs"]:
+        for r in run["stages"]:
+            prev = before.get((r["size"], r["stage"]))
+            if prev is None:
+                continue
+            print(f"{r['size']:>9} {r['stage']:<26} {prev:9.3f} {r['seconds']:9.3f} "
+                  f"{r['seconds'] / prev if prev else float('nan'):9.2f}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per stadio al crescere delle risposte")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3, help="ripetizioni degli stadi in sola lettura (min)")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="file di risultati precedente da confrontare")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_size(args.child, set(args.stages), args.seed, args.repeat)))
+        return
+
+    report = {
+        "meta": {"created": datetime.now().isoformat(timespec="seconds"), "commit": git_commit(),
+                 "python": platform.python_version(), "machine": platform.machine(),
+                 "seed": args.seed, "repeat": args.repeat},
+        "runs": [],
+    }
+    for size in args.sizes:
+        print(f"taglia {size}", file=sys.stderr)
+        out = subprocess.run(
+            [sys.executable, "-m", "bench.suite", "--child", str(size), "--seed", str(args.seed),
+             "--repeat", str(args.repeat), "--stages", *args.stages],
+            cwd=ROOT, stdout=subprocess.PIPE, text=True, check=True,
+        )
+        report["runs"].append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Risultati in {args.out}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
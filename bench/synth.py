@@ -0,0 +1,90 @@
+# bench/synth.py
+# Generatore deterministico (seed) di risposte sintetiche con le opzioni del survey.
+import json
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from schema import BY_KEY, QUESTION_KEYS, YES_NO_OPTIONS, YESNO, keys_of_kind
+
+YES_NO_KEYS = keys_of_kind(YESNO)
+YES_NO = list(YES_NO_OPTIONS)
+NOMINEES = list(BY_KEY["bm_nominee"].options)
+IMPACTS = list(BY_KEY["impacts"].options)
+MAX_IMPACTS = BY_KEY["impacts"].max_selections
+# Note libere con le varianti tipiche (maiuscole, spazi, accenti con apostrofo)
+NOTES = [
+    "Di Stefano srl", "DI STEFANO SRL ", "Nomina dell'AML Board Member entro fine anno",
+    "Il Consiglio di Amministrazione valuterà a breve", "Budget non ancora approvato",
+    "Attivita' di gap analysis in corso", "Serve supporto sulla titolarità effettiva",
+]
+
+
+def synth_record(rng):
+    """Una risposta: qualche domanda saltata, impatti con pesi non uniformi (max 3)."""
+    record = {key: (None if rng.random() < 0.05 else rng.choice(YES_NO)) for key in YES_NO_KEYS}
+    record["bm_nominee"] = None if rng.random() < 0.05 else rng.choice(NOMINEES)
+    k = rng.randint(0, MAX_IMPACTS)
+    impacts = []
+    while len(impacts) < k:
+        choice = rng.choices(IMPACTS, weights=range(len(IMPACTS), 0, -1))[0]
+        if choice not in impacts:
+            impacts.append(choice)
+    record["impacts"] = impacts
+    record["bm_notes"] = rng.choice(NOTES) if rng.random() < 0.3 else None
+    return record
+
+
+def synth_records(n, seed=0, start=datetime(2025, 5, 20, 9, 0), rate=50.0):
+    """n risposte con timestamp crescenti (in media `rate` al secondo)."""
+    rng = random.Random(seed)
+    ts = start
+    for i in range(n):
+        ts += timedelta(seconds=rng.expovariate(rate))
+        record = synth_record(rng)
+        record["timestamp"] = ts
+        yield i, record
+
+
+def populate_db(n, seed=0, offset=0, session_factory=None, batch_size=10000, event=None):
+    """Inserisce n risposte sintetiche (bulk insert, contatori e trigger inclusi)."""
+    import events
+    from db import SessionLocal
+    from migrate import insert_batch
+
+    event = event or events.DEFAULT_EVENT
+
+    session = (session_factory or SessionLocal)()
+    try:
+        batch = []
+        for i, record in synth_records(n, seed):
+            record["event"] = event
+            record["source_path"] = f"{events.folder(event)}/synth-{seed}-{offset + i}.json"
+            batch.append(record)
+            if len(batch) >= batch_size:
+                insert_batch(session, batch)
+                batch = []
+        if batch:
+            insert_batch(session, batch)
+    finally:
+        session.close()
+
+
+def write_json_files(folder, n, seed=0):
+    """n file responses/*.json come li scrive il form (nome con timestamp + uuid).
+
+    Le risposte senza bm_yes_no / bm_nominee restano: migrate.py le salta,
+    come farebbe con i file veri incompleti. Ritorna la lista dei path.
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(f"files-{seed}")
+    paths = []
+    for _, record in synth_records(n, seed):
+        ts = record.pop("timestamp").strftime("%Y-%m-%dT%H-%M-%SZ")
+        name = f"{ts}-{uuid.UUID(int=rng.getrandbits(128), version=4)}.json"
+        path = os.path.join(folder, name)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({key: record.get(key) for key in QUESTION_KEYS}, f, ensure_ascii=False, indent=2)
+        paths.append(path)
+    return paths
@@ -0,0 +1,315 @@
+# cube.py
+# Cubo colonnare in memoria delle risposte per filtri incrociati istantanei.
+#
+# - domande Sì/No e categoriche: codici interi piccoli (0 = nessuna risposta,
+#   poi le opzioni dello schema nell'ordine dello schema)
+# - multiselect (impacts): bitmask per risposta, un bit per opzione
+# - testo libero: termini normalizzati (textnorm) come coppie (riga, codice
+#   termine), il vocabolario cresce con le risposte
+#
+# Filtri e group-by sono operazioni NumPy vettoriali sugli array: nessun dict
+# per riga. Le righe nuove si aggiungono per delta (id > watermark).
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, text
+
+import metrics
+from aggregation import from_counters
+from db import SessionLocal, Response
+from events import DEFAULT_EVENT
+from schema import BY_KEY, YESNO, CATEGORICAL, MULTISELECT, FREETEXT, keys_of_kind
+from textnorm import tokenizer_for
+
+
+def _code_dtype(n):
+    return np.uint8 if n <= 0xFF else np.uint16
+
+
+def _mask_dtype(n):
+    for dtype in (np.uint16, np.uint32, np.uint64):
+        if n <= np.iinfo(dtype).bits:
+            return dtype
+    raise ValueError("Troppe opzioni per una bitmask (max 64)")
+
+
+class ResponseCube:
+    """Colonne NumPy con capacità che raddoppia: append per delta in O(righe nuove).
+
+    Valori non previsti dallo schema (es. opzioni di vecchie versioni del form)
+    vengono aggiunti in coda alle categorie, senza perdere righe.
+    Il cubo contiene solo le risposte di `event`.
+    """
+
+    def __init__(self, session_factory=SessionLocal, chunk_size=50_000, event=DEFAULT_EVENT):
+        self.session_factory = session_factory
+        self.event = event
+        self.chunk_size = chunk_size
+        self.single = keys_of_kind(YESNO, CATEGORICAL)
+        self.multi  = keys_of_kind(MULTISELECT)
+        self.text   = keys_of_kind(FREETEXT)
+        # Etichette per codice/bit; per le single il codice 0 è "nessuna risposta"
+        self.labels = {k: [None] + list(BY_KEY[k].options) for k in self.single}
+        self.labels.update({k: list(BY_KEY[k].options) for k in self.multi})
+        self.labels.update({k: [] for k in self.text})
+        self._index = {k: {v: i for i, v in enumerate(labels)} for k, labels in self.labels.items()}
+        self._cols = {k: np.zeros(0, _code_dtype(len(self.labels[k]))) for k in self.single}
+        self._cols.update({k: np.zeros(0, _mask_dtype(len(self.labels[k]))) for k in self.multi})
+        # Testo libero: coppie (riga, codice termine) in due array paralleli
+        self._postings = {k: (np.zeros(0, np.int32), np.zeros(0, np.int32)) for k in self.text}
+        self._npostings = {k: 0 for k in self.text}
+        self._ids = np.zeros(0, np.int64)
+        self._n = 0
+        self.watermark = 0
+        self._lock = threading.Lock()
+        # Un refresh alla volta: lettura del watermark e append nella stessa sezione,
+        # altrimenti due sessioni leggerebbero e aggiungerebbero le stesse righe
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self):
+        return self._n
+
+    # --- caricamento -------------------------------------------------
+    def _code(self, key, value):
+        code = self._index[key].get(value)
+        if code is None:
+            code = len(self.labels[key])
+            self.labels[key].append(value)
+            self._index[key][value] = code
+        return code
+
+    def _reserve(self, extra):
+        need = self._n + extra
+        cap = len(self._ids)
+        if need <= cap:
+            return
+        cap = max(need, 2 * cap, 1024)
+        for key, col in self._cols.items():
+            grown = np.zeros(cap, col.dtype)
+            grown[:self._n] = col[:self._n]
+            self._cols[key] = grown
+        grown = np.zeros(cap, np.int64)
+        grown[:self._n] = self._ids[:self._n]
+        self._ids = grown
+
+    def _fit_dtype(self, key):
+        # Nuove categorie/bit oltre la capacità del dtype: si allarga la colonna
+        n = len(self.labels[key])
+        dtype = _mask_dtype(n) if key in self.multi else _code_dtype(n)
+        if np.dtype(dtype).itemsize > self._cols[key].dtype.itemsize:
+            self._cols[key] = self._cols[key].astype(dtype)
+
+    def _encode(self, key, values):
+        """Codici della colonna: factorize una volta, poi lookup vettoriale."""
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+        lookup = np.array([self._code(key, v) if v else 0 for v in uniques] + [0], np.int64)
+        return lookup[codes]   # codes == -1 (None) → ultimo elemento, cioè 0
+
+    def _encode_multi(self, key, positions, choices, n):
+        """Bitmask da coppie (posizione riga, opzione)."""
+        masks = np.zeros(n, np.uint64)
+        if choices:
+            codes, uniques = pd.factorize(pd.Series(choices, dtype=object))
+            bits = np.array([1 << self._code(key, v) for v in uniques], np.uint64)
+            np.bitwise_or.at(masks, np.asarray(positions, np.int64), bits[codes])
+        return masks
+
+    def _append_postings(self, key, positions, terms, start):
+        """Aggiunge le coppie (riga, termine) del blocco che parte dalla riga start."""
+        if not terms:
+            return
+        codes, uniques = pd.factorize(pd.Series(terms, dtype=object))
+        lookup = np.array([self._code(key, t) for t in uniques], np.int32)
+        rows, term_codes = self._postings[key]
+        used, extra = self._npostings[key], len(terms)
+        if used + extra > len(rows):
+            cap = max(used + extra, 2 * len(rows), 1024)
+            rows = np.resize(rows, cap)
+            term_codes = np.resize(term_codes, cap)
+        rows[used:used + extra] = np.asarray(positions, np.int32) + start
+        term_codes[used:used + extra] = lookup[codes]
+        self._postings[key] = (rows, term_codes)
+        self._npostings[key] = used + extra
+
+    def _append_columns(self, ids, singles, multis, texts=None):
+        n = len(ids)
+        if not n:
+            return 0
+        with self._lock:
+            self._reserve(n)
+            start, end = self._n, self._n + n
+            for key in self.single:
+                codes = self._encode(key, singles[key])
+                self._fit_dtype(key)
+                self._cols[key][start:end] = codes
+            for key in self.multi:
+                masks = self._encode_multi(key, *multis[key], n)
+                self._fit_dtype(key)
+                self._cols[key][start:end] = masks
+            for key, (positions, terms) in (texts or {}).items():
+                self._append_postings(key, positions, terms, start)
+            self._ids[start:end] = ids
+            self._n = end
+            self.watermark = max(self.watermark, int(self._ids[end - 1]))
+        return n
+
+    @staticmethod
+    def _pairs(lists):
+        positions, choices = [], []
+        for i, items in enumerate(lists):
+            for choice in items or ():
+                positions.append(i)
+                choices.append(choice)
+        return positions, choices
+
+    def _text_pairs(self, key, values):
+        # Termini distinti per risposta, dal tokenizer (con cache) della domanda
+        tokenizer = tokenizer_for(BY_KEY[key])
+        return self._pairs(tokenizer.terms(value) for value in values)
+
+    def append(self, rows):
+        """Aggiunge righe (dict con id + chiavi dello schema); ritorna quante."""
+        rows = list(rows)
+        return self._append_columns(
+            [r["id"] for r in rows],
+            {key: [r.get(key) for r in rows] for key in self.single},
+            {key: self._pairs(r.get(key) for r in rows) for key in self.multi},
+            {key: self._text_pairs(key, [r.get(key) for r in rows]) for key in self.text},
+        )
+
+    @metrics.timed("cube.refresh")
+    def refresh(self):
+        """Legge dal DB le righe con id > watermark; ritorna quante ne ha aggiunte.
+
+        Query Core a blocchi (niente oggetti ORM né dict per riga); le liste
+        della multiselect arrivano già come coppie (id, opzione) da json_each.
+        """
+        with self._refresh_lock:
+            cols = [Response.id] + [getattr(Response, k) for k in self.single + self.text]
+            stmt = (select(*cols).where(Response.event == self.event, Response.id > self.watermark)
+                    .order_by(Response.id))
+            session = self.session_factory()
+            added = 0
+            try:
+                conn = session.connection()
+                result = conn.execution_options(yield_per=self.chunk_size).execute(stmt)
+                for chunk in result.partitions():
+                    columns = list(zip(*chunk))
+                    ids = np.asarray(columns[0], np.int64)
+                    multis = {}
+                    for key in self.multi:
+                        pairs = conn.execute(text(
+                            f"SELECT r.id, j.value FROM responses AS r, json_each(r.{key}) AS j "
+                            f"WHERE json_valid(r.{key}) AND r.event = :event AND r.id BETWEEN :lo AND :hi"
+                        ), {"event": self.event, "lo": int(ids[0]), "hi": int(ids[-1])}).all()
+                        pair_ids, choices = zip(*pairs) if pairs else ((), ())
+                        multis[key] = (np.searchsorted(ids, np.asarray(pair_ids, np.int64)), list(choices))
+                    singles = dict(zip(self.single, columns[1:1 + len(self.single)]))
+                    texts = {key: self._text_pairs(key, values)
+                             for key, values in zip(self.text, columns[1 + len(self.single):])}
+                    added += self._append_columns(ids, singles, multis, texts)
+            finally:
+                session.close()
+        metrics.incr("cube.rows_scanned", added)
+        return added
+
+    # --- interrogazioni ----------------------------------------------
+    def _snapshot(self):
+        # Viste sulle prime n righe: gli append successivi scrivono oltre n
+        with self._lock:
+            n = self._n
+            cols = {k: col[:n] for k, col in self._cols.items()}
+            cols.update({k: (rows[:self._npostings[k]], codes[:self._npostings[k]])
+                         for k, (rows, codes) in self._postings.items()})
+            return n, cols, {k: list(v) for k, v in self.labels.items()}
+
+    def _select(self, key, values, cols, labels):
+        if isinstance(values, str):
+            values = [values]
+        index = {v: i for i, v in enumerate(labels[key])}
+        codes = [index[v] for v in values if v in index]
+        if key in self.multi:
+            sel = 0
+            for code in codes:
+                sel |= 1 << code
+            return (cols[key] & cols[key].dtype.type(sel)) != 0
+        return np.isin(cols[key], codes)
+
+    def mask(self, _snapshot=None, **filters):
+        """Maschera booleana delle righe che passano tutti i filtri.
+
+        filters: chiave → opzione o lista di opzioni (OR nella stessa domanda,
+        AND tra domande diverse). Per la multiselect basta una delle opzioni.
+        """
+        n, cols, labels = _snapshot or self._snapshot()
+        sel = np.ones(n, bool)
+        for key, values in filters.items():
+            if key not in cols or key in self.text:
+                raise ValueError(f"Filtro non supportato: {key}")
+            if values:
+                sel &= self._select(key, values, cols, labels)
+        return sel
+
+    def _count_vector(self, key, sel, cols, labels):
+        """Conteggi per opzione (senza "nessuna risposta") sulle righe sel."""
+        if key in self.text:
+            rows, codes = cols[key]
+            return np.bincount(codes[sel[rows]], minlength=len(labels[key]))
+        col = cols[key][sel]
+        if key in self.multi:
+            return np.array([np.count_nonzero(col & col.dtype.type(1 << b)) for b in range(len(labels[key]))],
+                            np.int64)
+        return np.bincount(col, minlength=len(labels[key]))[1:]
+
+    def _options(self, key, labels):
+        return labels[key] if key in self.multi or key in self.text else labels[key][1:]
+
+    def counts(self, key, **filters):
+        snap = self._snapshot()
+        _, cols, labels = snap
+        vec = self._count_vector(key, self.mask(_snapshot=snap, **filters), cols, labels)
+        return Counter({opt: int(n) for opt, n in zip(self._options(key, labels), vec) if n})
+
+    def aggregate(self, **filters):
+        """SurveyCounts (come aggregation.aggregate) sulle sole righe filtrate."""
+        snap = self._snapshot()
+        _, cols, labels = snap
+        sel = self.mask(_snapshot=snap, **filters)
+        raw = {}
+        for key in self.single + self.multi + self.text:
+            vec = self._count_vector(key, sel, cols, labels)
+            raw[key] = Counter({opt: int(n) for opt, n in zip(self._options(key, labels), vec) if n})
+        return from_counters(raw, total=int(np.count_nonzero(sel)))
+
+    def crosstab(self, row_key, col_key, **filters):
+        """Tabella righe × colonne (DataFrame) dei conteggi, es. bm_nominee per gap_analysis."""
+        if row_key in self.text or col_key in self.text:
+            raise ValueError("Incrocio non supportato per le domande a testo libero")
+        snap = self._snapshot()
+        _, cols, labels = snap
+        sel = self.mask(_snapshot=snap, **filters)
+        row_opts = self._options(row_key, labels)
+        col_opts = self._options(col_key, labels)
+
+        if row_key not in self.multi and col_key not in self.multi:
+            # Due colonne di codici: un solo bincount sul codice combinato
+            width = len(labels[col_key])
+            combined = cols[row_key][sel].astype(np.int64) * width + cols[col_key][sel]
+            table = np.bincount(combined, minlength=len(labels[row_key]) * width)
+            table = table.reshape(len(labels[row_key]), width)[1:, 1:]
+        elif col_key in self.multi:
+            # Un bit alla volta della multiselect, conteggio vettoriale dell'altra domanda
+            table = np.zeros((len(row_opts), len(col_opts)), np.int64)
+            for b in range(len(col_opts)):
+                bit = (cols[col_key] & cols[col_key].dtype.type(1 << b)) != 0
+                table[:, b] = self._count_vector(row_key, sel & bit, cols, labels)
+        else:
+            table = np.zeros((len(row_opts), len(col_opts)), np.int64)
+            for b in range(len(row_opts)):
+                bit = (cols[row_key] & cols[row_key].dtype.type(1 << b)) != 0
+                table[b, :] = self._count_vector(col_key, sel & bit, cols, labels)
+
+        return pd.DataFrame(table, index=pd.Index(row_opts, name=row_key),
+                            columns=pd.Index(col_opts, name=col_key))
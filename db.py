@@ -1,25 +1,66 @@
 # db.py
+import hashlib
 import os
-from sqlalchemy import create_engine, Column, Integer, String, JSON, DateTime
+import sys
+import time
+from collections import Counter
+from sqlalchemy import create_engine, event, func, inspect, literal, select, text, union_all, Column, ForeignKey, Index, Integer, String, Text, JSON, DateTime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
 
+import metrics
+from events import DEFAULT_EVENT
+from schema import keys_of_kind, BY_KEY, YESNO, CATEGORICAL, MULTISELECT, FREETEXT
+from textnorm import tokenizer_for
+
 Base = declarative_base()
 
 DB_PATH    = os.environ.get("SQLITE_FILENAME", "responses.db")
 SQLITE_URL = f"sqlite:///{os.path.join(os.getcwd(), DB_PATH)}"
+# Secondi di attesa su un lock prima di "database is locked"
+BUSY_TIMEOUT = 30
 
 engine = create_engine(
     SQLITE_URL,
-    connect_args={"check_same_thread": False}
+    connect_args={"check_same_thread": False, "timeout": BUSY_TIMEOUT}
 )
+
+@event.listens_for(engine, "connect")
+def _sqlite_pragmas(dbapi_conn, conn_record):
+    # WAL: i lettori (dashboard) non bloccano lo scrittore e viceversa
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT * 1000}")
+    cur.close()
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+if metrics.ENABLED:
+    # Durata dei commit (flush + contatori + COMMIT) e lock incontrati
+    @event.listens_for(SessionLocal, "before_commit")
+    def _commit_started(session):
+        session.info["commit_started"] = time.perf_counter()
+
+    @event.listens_for(SessionLocal, "after_commit")
+    def _commit_done(session):
+        started = session.info.pop("commit_started", None)
+        if started is not None:
+            metrics.observe("sqlite.commit", time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _count_locks(context):
+        if "locked" in str(context.original_exception).lower():
+            metrics.incr("sqlite.locked")
+
 class Response(Base):
     __tablename__ = "responses"
     id                   = Column(Integer, primary_key=True, index=True)
-    timestamp            = Column(DateTime, default=datetime.utcnow)
+    # Evento (sessione del survey): ogni lettura della dashboard è filtrata su questo
+    event                = Column(String, nullable=False, default=DEFAULT_EVENT,
+                                  server_default=DEFAULT_EVENT, index=True)
+    timestamp            = Column(DateTime, default=datetime.utcnow, index=True)
     gap_analysis         = Column(String, nullable=True)
     board_inform         = Column(String, nullable=True)
     budget               = Column(String, nullable=True)
@@ -27,7 +68,621 @@ class Response(Base):
     impacts              = Column(JSON,   nullable=True)
     bm_yes_no            = Column(String, nullable=True)
     bm_nominee           = Column(String, nullable=True)
+    bm_notes             = Column(Text,   nullable=True)
+    # File di origine (responses/[<event>/]<ts>-<uuid>.json) e blob SHA git: import incrementali
+    source_path          = Column(String, nullable=True, unique=True, index=True)
+    source_sha           = Column(String, nullable=True, index=True)
+    # Indici composti per evento: ultimo id (live, cubo), finestre temporali e un
+    # GROUP BY per domanda che legge solo l'indice, senza toccare gli altri eventi
+    __table_args__ = (
+        Index("ix_responses_event_id", "event", "id"),
+        Index("ix_responses_event_timestamp", "event", "timestamp"),
+        *[Index(f"ix_responses_event_{key}", "event", key) for key in keys_of_kind(YESNO, CATEGORICAL)],
+    )
+
+
+def git_blob_sha(data):
+    """SHA del blob git (lo stesso riportato da GitHub per il file)."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+# ----------------------------------------------------------------
+# Contatori aggregati (question, option) → count
+# ----------------------------------------------------------------
+# Domande a risposta singola e a scelta multipla tenute nei contatori
+# Dallo schema del questionario: risposta singola vs lista di opzioni
+SINGLE_FIELDS = keys_of_kind(YESNO, CATEGORICAL)
+MULTI_FIELDS  = keys_of_kind(MULTISELECT)
+TOTAL_KEY     = "_total"
+
+class OptionCount(Base):
+    __tablename__ = "option_counts"
+    event    = Column(String, primary_key=True)
+    question = Column(String, primary_key=True)
+    option   = Column(String, primary_key=True)
+    count    = Column(Integer, nullable=False, default=0)
+
+
+class ChangeVersion(Base):
+    # Sale a ogni modifica dei contatori dell'evento, anche senza righe nuove
+    # (UPDATE di reconcile): la dashboard live lo confronta per sapere se rileggere
+    __tablename__ = "change_versions"
+    event   = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+def bump_version(conn, events):
+    """+1 alla versione di ciascun evento, nella transazione di chi scrive."""
+    if not events:
+        return
+    stmt = sqlite_insert(ChangeVersion.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["event"],
+        set_={"version": ChangeVersion.__table__.c.version + 1},
+    )
+    conn.execute(stmt, [{"event": ev, "version": 1} for ev in sorted(events)])
+
+
+def load_version(session, event=DEFAULT_EVENT):
+    """Versione corrente dei contatori dell'evento (0 se mai scritti)."""
+    return session.query(ChangeVersion.version).filter(ChangeVersion.event == event).scalar() or 0
+
+
+def response_deltas(resp):
+    """Incrementi (event, question, option) generati da una risposta (oggetto ORM o dict)."""
+    get = resp.get if isinstance(resp, dict) else lambda key: getattr(resp, key)
+    ev = get("event") or DEFAULT_EVENT
+    deltas = Counter({(ev, TOTAL_KEY, ""): 1})
+    for key in SINGLE_FIELDS:
+        value = get(key)
+        if value:
+            deltas[(ev, key, value)] += 1
+    for key in MULTI_FIELDS:
+        for choice in get(key) or []:
+            deltas[(ev, key, choice)] += 1
+    return deltas
+
+
+def bump_counters(conn, deltas):
+    """UPSERT degli incrementi sulla tabella option_counts."""
+    if not deltas:
+        return
+    stmt = sqlite_insert(OptionCount.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["event", "question", "option"],
+        set_={"count": OptionCount.__table__.c.count + stmt.excluded["count"]},
+    )
+    conn.execute(stmt, [
+        {"event": ev, "question": q, "option": o, "count": n}
+        for (ev, q, o), n in deltas.items()
+    ])
+    bump_version(conn, {ev for ev, _, _ in deltas})
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _update_counters(session, flush_context):
+    # Stessa transazione dell'INSERT: contatori e rollup non divergono mai dalle righe
+    deltas  = Counter()
+    rollups = Counter()
+    terms   = Counter()
+    new = [obj for obj in session.new if isinstance(obj, Response)]
+    for obj in new:
+        deltas.update(response_deltas(obj))
+        rollups.update(rollup_deltas(obj))
+        terms.update(term_deltas(obj))
+    bump_counters(session.connection(), deltas)
+    bump_rollups(session.connection(), rollups)
+    bump_terms(session.connection(), terms)
+    index_terms(session.connection(), [(obj.id, obj) for obj in new])
+
+
+def load_counts(session, event=DEFAULT_EVENT):
+    """Legge i contatori dell'evento: {question: Counter(option → count)}, O(opzioni)."""
+    counts = {}
+    for question, option, n in session.query(
+        OptionCount.question, OptionCount.option, OptionCount.count
+    ).filter(OptionCount.event == event):
+        if n > 0:
+            counts.setdefault(question, Counter())[option] = n
+    return counts
+
+
+def rebuild_counters(session):
+    """Ricostruisce option_counts dalle righe esistenti di responses."""
+    session.query(OptionCount).delete()
+    deltas = Counter({
+        (ev, TOTAL_KEY, ""): n
+        for ev, n in session.query(Response.event, func.count()).group_by(Response.event)
+    })
+    for key in SINGLE_FIELDS:
+        col = getattr(Response, key)
+        for ev, value, n in (session.query(Response.event, col, func.count())
+                             .filter(col.isnot(None), col != "").group_by(Response.event, col)):
+            deltas[(ev, key, value)] = n
+    for key in MULTI_FIELDS:
+        rows = session.execute(text(
+            f"SELECT responses.event, j.value, COUNT(*) FROM responses, json_each(responses.{key}) AS j "
+            f"WHERE json_valid(responses.{key}) GROUP BY responses.event, j.value"
+        ))
+        for ev, value, n in rows:
+            deltas[(ev, key, value)] = n
+    bump_counters(session.connection(), deltas)
+    session.commit()
+    return deltas
+
+
+# ----------------------------------------------------------------
+# Rollup temporali: gli stessi contatori per minuto e per ora
+# ----------------------------------------------------------------
+GRANULARITIES = ["minute", "hour"]
+
+
+class OptionRollup(Base):
+    __tablename__ = "option_rollups"
+    event       = Column(String, primary_key=True)
+    granularity = Column(String, primary_key=True)     # "minute" | "hour"
+    bucket      = Column(DateTime, primary_key=True)   # inizio del minuto/ora, UTC
+    question    = Column(String, primary_key=True)
+    option      = Column(String, primary_key=True)
+    count       = Column(Integer, nullable=False, default=0)
+
+
+def bucket_start(ts, granularity):
+    ts = ts.replace(second=0, microsecond=0)
+    return ts.replace(minute=0) if granularity == "hour" else ts
+
+
+def rollup_deltas(resp):
+    """Incrementi (event, granularity, bucket, question, option) di una risposta."""
+    get = resp.get if isinstance(resp, dict) else lambda key: getattr(resp, key)
+    ts = get("timestamp") or datetime.utcnow()
+    deltas = Counter()
+    for (ev, question, option), n in response_deltas(resp).items():
+        for granularity in GRANULARITIES:
+            deltas[(ev, granularity, bucket_start(ts, granularity), question, option)] += n
+    return deltas
+
+
+def bump_rollups(conn, deltas):
+    """UPSERT degli incrementi sulla tabella option_rollups."""
+    if not deltas:
+        return
+    stmt = sqlite_insert(OptionRollup.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["event", "granularity", "bucket", "question", "option"],
+        set_={"count": OptionRollup.__table__.c.count + stmt.excluded["count"]},
+    )
+    conn.execute(stmt, [
+        {"event": ev, "granularity": g, "bucket": b, "question": q, "option": o, "count": n}
+        for (ev, g, b, q, o), n in deltas.items()
+    ])
+
+
+def load_rollups(session, granularity, since=None, event=DEFAULT_EVENT):
+    """Serie per bucket dal rollup, più i totali cumulativi prima di `since`.
+
+    Ritorna (base, rows): base = {question: Counter} delle risposte arrivate
+    prima di `since` (contatori meno la finestra, stessa transazione);
+    rows = [(bucket, question, option, count)] ordinati per bucket.
+    Costo O(bucket della finestra × opzioni), indipendente dal numero di risposte.
+    """
+    query = session.query(
+        OptionRollup.bucket, OptionRollup.question, OptionRollup.option, OptionRollup.count
+    ).filter(OptionRollup.event == event, OptionRollup.granularity == granularity)
+    if since is not None:
+        query = query.filter(OptionRollup.bucket >= since)
+    rows = query.order_by(OptionRollup.bucket).all()
+    base = load_counts(session, event)
+    for _, question, option, n in rows:
+        base.setdefault(question, Counter())[option] -= n
+    return base, rows
+
+
+def last_bucket(session, granularity, event=DEFAULT_EVENT):
+    return session.query(func.max(OptionRollup.bucket)).filter(
+        OptionRollup.event == event, OptionRollup.granularity == granularity).scalar()
+
+
+def rebuild_rollups(session):
+    """Ricostruisce option_rollups dalle righe esistenti (per blocchi di id)."""
+    session.query(OptionRollup).delete()
+    last_id = 0
+    while True:
+        rows = (
+            session.query(Response).filter(Response.id > last_id)
+            .order_by(Response.id).limit(10_000).all()
+        )
+        if not rows:
+            break
+        rollups = Counter()
+        for row in rows:
+            rollups.update(rollup_deltas(row))
+        bump_rollups(session.connection(), rollups)
+        last_id = rows[-1].id
+        session.expunge_all()
+    session.commit()
+
+
+# ----------------------------------------------------------------
+# Indice dei termini delle domande a testo libero
+# ----------------------------------------------------------------
+# Il testo si tokenizza una volta, quando la risposta entra nel DB, e finisce in:
+#   response_terms  (response_id, question, term)  indice invertito per risposta:
+#                   le viste filtrate contano i termini con un JOIN su responses
+#   term_counts     (event, question, term) → count, per la word cloud senza filtri
+# count = risposte che contengono il termine.
+FREETEXT_FIELDS = keys_of_kind(FREETEXT)
+# Termini per domanda letti dalla dashboard (la word cloud ne mostra 100)
+TERM_LIMIT = int(os.environ.get("TERM_LIMIT", "500"))
+
+
+class TermCount(Base):
+    __tablename__ = "term_counts"
+    event    = Column(String, primary_key=True)
+    question = Column(String, primary_key=True)
+    term     = Column(String, primary_key=True)
+    count    = Column(Integer, nullable=False, default=0)
+    __table_args__ = (
+        Index("ix_term_counts_rank", "event", "question", "count"),
+    )
+
+
+class ResponseTerm(Base):
+    __tablename__ = "response_terms"
+    response_id = Column(Integer, ForeignKey("responses.id", ondelete="CASCADE"), primary_key=True)
+    question    = Column(String, primary_key=True)
+    term        = Column(String, primary_key=True)
+    __table_args__ = (
+        Index("ix_response_terms_term", "question", "term", "response_id"),
+    )
+
+
+# Le righe nuove le scrive Python (tokenizer); la cancellazione la segue SQLite
+TERM_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_response_terms_delete
+    AFTER DELETE ON responses
+    BEGIN
+        DELETE FROM response_terms WHERE response_id = OLD.id;
+    END
+    """,
+]
+
+
+def response_terms(resp):
+    """(question, term) distinti dei testi liberi di una risposta (oggetto ORM o dict)."""
+    get = resp.get if isinstance(resp, dict) else lambda key: getattr(resp, key)
+    return [(key, term) for key in FREETEXT_FIELDS for term in tokenizer_for(BY_KEY[key]).terms(get(key))]
+
+
+def term_deltas(resp):
+    """Incrementi (event, question, term) dei testi liberi di una risposta."""
+    get = resp.get if isinstance(resp, dict) else lambda key: getattr(resp, key)
+    ev = get("event") or DEFAULT_EVENT
+    return Counter((ev, key, term) for key, term in response_terms(resp))
+
+
+def index_terms(conn, items):
+    """Riscrive le righe di response_terms per [(response_id, risposta)]."""
+    if not FREETEXT_FIELDS or not items:
+        return
+    table = ResponseTerm.__table__
+    ids = [rid for rid, _ in items]
+    for i in range(0, len(ids), 500):
+        conn.execute(table.delete().where(table.c.response_id.in_(ids[i:i + 500])))
+    rows = [{"response_id": rid, "question": key, "term": term}
+            for rid, resp in items for key, term in response_terms(resp)]
+    if rows:
+        conn.execute(table.insert(), rows)
+
+
+def bump_terms(conn, deltas):
+    """UPSERT degli incrementi sull'indice dei termini."""
+    if not deltas:
+        return
+    stmt = sqlite_insert(TermCount.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["event", "question", "term"],
+        set_={"count": TermCount.__table__.c.count + stmt.excluded["count"]},
+    )
+    conn.execute(stmt, [
+        {"event": ev, "question": q, "term": t, "count": n}
+        for (ev, q, t), n in deltas.items()
+    ])
+    bump_version(conn, {ev for ev, _, _ in deltas})
+
+
+def load_terms(session, event=DEFAULT_EVENT, limit=TERM_LIMIT):
+    """I `limit` termini più frequenti per domanda: {question: Counter(term → count)}."""
+    counts = {}
+    for key in FREETEXT_FIELDS:
+        rows = (
+            session.query(TermCount.term, TermCount.count)
+            .filter(TermCount.event == event, TermCount.question == key, TermCount.count > 0)
+            .order_by(TermCount.count.desc()).limit(limit)
+        )
+        counts[key] = Counter(dict(rows))
+    return counts
+
+
+def filtered_terms(session, event=DEFAULT_EVENT, limit=TERM_LIMIT, **filters):
+    """Come load_terms ma solo sulle risposte filtrate, da response_terms (niente tokenizer).
+
+    Es. filtered_terms(session, budget="Sì") → termini delle note di chi ha stanziato budget.
+    """
+    counts = {}
+    for key in FREETEXT_FIELDS:
+        n = func.count().label("n")
+        query = (session.query(ResponseTerm.term, n)
+                 .join(Response, Response.id == ResponseTerm.response_id)
+                 .filter(Response.event == event, ResponseTerm.question == key))
+        for fkey, value in filters.items():
+            query = query.filter(getattr(Response, fkey) == value)
+        counts[key] = Counter(dict(query.group_by(ResponseTerm.term).order_by(n.desc()).limit(limit)))
+    return counts
+
+
+def rebuild_terms(session):
+    """Ricostruisce term_counts tokenizzando i testi già presenti (per blocchi di id)."""
+    session.query(TermCount).delete()
+    cols = [Response.id, Response.event] + [getattr(Response, key) for key in FREETEXT_FIELDS]
+    last_id = 0
+    while FREETEXT_FIELDS:
+        rows = session.query(*cols).filter(Response.id > last_id).order_by(Response.id).limit(10_000).all()
+        if not rows:
+            break
+        terms = Counter()
+        for row in rows:
+            terms.update(term_deltas(row._asdict()))
+        bump_terms(session.connection(), terms)
+        last_id = rows[-1].id
+    session.commit()
+
+
+def rebuild_response_terms(session):
+    """Ricostruisce response_terms tokenizzando i testi già presenti (per blocchi di id)."""
+    session.query(ResponseTerm).delete()
+    cols = [Response.id] + [getattr(Response, key) for key in FREETEXT_FIELDS]
+    last_id = 0
+    while FREETEXT_FIELDS:
+        rows = session.query(*cols).filter(Response.id > last_id).order_by(Response.id).limit(10_000).all()
+        if not rows:
+            break
+        index_terms(session.connection(), [(row.id, row._asdict()) for row in rows])
+        last_id = rows[-1].id
+    session.commit()
+
+
+# ----------------------------------------------------------------
+# Coda dei file da scrivere su GitHub (outbox)
+# ----------------------------------------------------------------
+class GithubOutbox(Base):
+    __tablename__ = "github_outbox"
+    id         = Column(Integer, primary_key=True)
+    path       = Column(String, unique=True, nullable=False)
+    payload    = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at    = Column(DateTime, nullable=True, index=True)
+    attempts   = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=True)
+
+
+# ----------------------------------------------------------------
+# File di origine scartati dall'import (JSON non valido, campi mancanti):
+# con lo stesso sha non si riscaricano né si risegnalano a ogni esecuzione
+# ----------------------------------------------------------------
+class SkippedFile(Base):
+    __tablename__ = "skipped_files"
+    path       = Column(String, primary_key=True)
+    sha        = Column(String, nullable=False)
+    skipped_at = Column(DateTime, default=datetime.utcnow)
+
+
+def record_skipped(session, items):
+    """Registra (o aggiorna lo sha di) file scartati: [(path, sha)]."""
+    if not items:
+        return
+    stmt = sqlite_insert(SkippedFile.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["path"],
+        set_={"sha": stmt.excluded["sha"], "skipped_at": stmt.excluded["skipped_at"]},
+    )
+    session.execute(stmt, [{"path": p, "sha": s, "skipped_at": datetime.utcnow()} for p, s in items])
+    session.commit()
+
+
+def skipped_files(session):
+    """{path: sha} dei file già scartati."""
+    return dict(session.query(SkippedFile.path, SkippedFile.sha))
+
+
+# ----------------------------------------------------------------
+# Tabella normalizzata degli impatti: una riga per (risposta, impatto)
+# ----------------------------------------------------------------
+class ResponseImpact(Base):
+    __tablename__ = "response_impacts"
+    response_id = Column(Integer, ForeignKey("responses.id", ondelete="CASCADE"), primary_key=True)
+    impact      = Column(String, primary_key=True)
+    __table_args__ = (
+        Index("ix_response_impacts_impact", "impact", "response_id"),
+    )
+
+
+# Trigger SQLite: response_impacts segue responses.impacts per qualsiasi INSERT
+# (ORM, bulk insert di migrate.py, SQL a mano), UPDATE e DELETE
+IMPACT_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_response_impacts_insert
+    AFTER INSERT ON responses WHEN json_valid(NEW.impacts)
+    BEGIN
+        INSERT OR IGNORE INTO response_impacts (response_id, impact)
+        SELECT NEW.id, value FROM json_each(NEW.impacts) WHERE type = 'text';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_response_impacts_update
+    AFTER UPDATE OF impacts ON responses
+    BEGIN
+        DELETE FROM response_impacts WHERE response_id = OLD.id;
+        INSERT OR IGNORE INTO response_impacts (response_id, impact)
+        SELECT NEW.id, value FROM json_each(NEW.impacts)
+        WHERE json_valid(NEW.impacts) AND type = 'text';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_response_impacts_delete
+    AFTER DELETE ON responses
+    BEGIN
+        DELETE FROM response_impacts WHERE response_id = OLD.id;
+    END
+    """,
+]
+
+
+def backfill_impacts(session):
+    """Popola response_impacts per le risposte già presenti; ritorna le righe aggiunte."""
+    result = session.execute(text(
+        "INSERT OR IGNORE INTO response_impacts (response_id, impact) "
+        "SELECT r.id, j.value FROM responses AS r, json_each(r.impacts) AS j "
+        "WHERE json_valid(r.impacts) AND j.type = 'text'"
+    ))
+    session.commit()
+    return result.rowcount
+
+
+# ----------------------------------------------------------------
+# Aggregazioni in SQL: tutte le domande con un solo round-trip
+# ----------------------------------------------------------------
+def _question_select(key, event, filters):
+    if key in MULTI_FIELDS:
+        # response_impacts normalizza solo impacts: un'altra multiselect
+        # verrebbe contata con le opzioni di impacts
+        if key != "impacts":
+            raise ValueError(f"Multiselect non normalizzata: {key}")
+        stmt = select(
+            literal(key).label("question"), ResponseImpact.impact.label("option"), func.count().label("n")
+        ).join(Response, Response.id == ResponseImpact.response_id).group_by(ResponseImpact.impact)
+    else:
+        col  = getattr(Response, key)
+        stmt = select(
+            literal(key).label("question"), col.label("option"), func.count().label("n")
+        ).where(col.isnot(None), col != "").group_by(col)
+    stmt = stmt.where(Response.event == event)
+    for fkey, value in filters.items():
+        stmt = stmt.where(getattr(Response, fkey) == value)
+    return stmt
+
+
+def _total_select(event, filters):
+    stmt = select(literal(TOTAL_KEY).label("question"), literal("").label("option"), func.count().label("n"))
+    stmt = stmt.select_from(Response).where(Response.event == event)
+    for fkey, value in filters.items():
+        stmt = stmt.where(getattr(Response, fkey) == value)
+    return stmt
+
+
+def aggregate_counts(session, keys=None, with_total=False, event=DEFAULT_EVENT, **filters):
+    """Conteggi {question: Counter(option → n)} dell'evento per tutte le `keys` in una query.
+
+    Un GROUP BY proiettato per domanda, uniti con UNION ALL: nessun oggetto ORM,
+    memoria O(opzioni). I filtri (es. budget="Sì") valgono per tutte le domande.
+    Con with_total=True c'è anche TOTAL_KEY (risposte che passano i filtri).
+    """
+    keys = keys or SINGLE_FIELDS + MULTI_FIELDS
+    selects = [_question_select(key, event, filters) for key in keys]
+    if with_total:
+        selects.append(_total_select(event, filters))
+    stmt = union_all(*selects)
+    counts = {key: Counter() for key in keys}
+    if with_total:
+        counts[TOTAL_KEY] = Counter()
+    for question, option, n in session.execute(stmt):
+        counts[question][option] = n
+    return counts
+
+
+# Tabelle derivate dalle risposte e come ricostruirle: si ricostruiscono se
+# sono del formato precedente (senza "event" nella chiave primaria), che viene
+# ricreato, o se sono nuove in un DB che ha già delle risposte (i trigger di
+# response_impacts coprono solo gli INSERT successivi)
+DERIVED_TABLES = {
+    OptionCount.__table__: rebuild_counters,
+    OptionRollup.__table__: rebuild_rollups,
+    TermCount.__table__: rebuild_terms,
+    ResponseTerm.__table__: rebuild_response_terms,
+    ResponseImpact.__table__: backfill_impacts,
+}
+
+
+def _upgrade_schema(created=()):
+    # create_all non modifica le tabelle esistenti: aggiunge colonne e indici nuovi
+    insp = inspect(engine)
+    stale = [t for t in DERIVED_TABLES
+             if "event" in t.c and "event" not in {c["name"] for c in insp.get_columns(t.name)}]
+    with engine.begin() as conn:
+        for table in stale:
+            table.drop(conn)
+            table.create(conn)
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name not in existing and table not in stale:
+                    default = f" DEFAULT '{col.server_default.arg}'" if col.server_default is not None else ""
+                    conn.execute(text(
+                        f"ALTER TABLE {table.name} ADD COLUMN {col.name} "
+                        f"{col.type.compile(engine.dialect)}{default}"
+                    ))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+        for ddl in IMPACT_TRIGGERS + TERM_TRIGGERS:
+            conn.execute(text(ddl))
+    if stale or created:
+        session = SessionLocal()
+        try:
+            for table in stale + list(created):
+                DERIVED_TABLES[table](session)
+        finally:
+            session.close()
 
 
 def init_db():
+    insp = inspect(engine)
+    created = ([t for t in DERIVED_TABLES if not insp.has_table(t.name)]
+               if insp.has_table(Response.__tablename__) else [])
     Base.metadata.create_all(bind=engine)
+    _upgrade_schema(created)
+
+
+def _run_command(command):
+    init_db()
+    session = SessionLocal()
+    try:
+        if command == "rebuild-counters":
+            deltas = rebuild_counters(session)
+            total = sum(n for (_, q, _), n in deltas.items() if q == TOTAL_KEY)
+            print(f"Contatori ricostruiti: {total} risposte, {len(deltas)} righe.")
+        elif command == "rebuild-rollups":
+            rebuild_rollups(session)
+            print(f"Rollup ricostruiti: {session.query(OptionRollup).count()} righe.")
+        elif command == "rebuild-terms":
+            rebuild_terms(session)
+            rebuild_response_terms(session)
+            print(f"Indice dei termini ricostruito: {session.query(TermCount).count()} termini, "
+                  f"{session.query(ResponseTerm).count()} righe per risposta.")
+        elif command == "backfill-impacts":
+            print(f"Impatti normalizzati: {backfill_impacts(session)} righe aggiunte.")
+    finally:
+        session.close()
+
+
+COMMANDS = ["rebuild-counters", "rebuild-rollups", "rebuild-terms", "backfill-impacts"]
+
+if __name__ == "__main__":
+    # python db.py rebuild-counters | rebuild-rollups | rebuild-terms | backfill-impacts
+    if len(sys.argv) == 2 and sys.argv[1] in COMMANDS:
+        _run_command(sys.argv[1])
+    else:
+        print(f"Uso: python db.py {{{'|'.join(COMMANDS)}}}", file=sys.stderr)
+        sys.exit(2)
@@ -0,0 +1,96 @@
+# db_writer.py
+# Scrittore unico per SQLite: un solo thread raggruppa le richieste in poche
+# transazioni (niente "database is locked" tra scrittori concorrenti).
+#
+# Nell'app l'unico chiamante è il replayer dello spool (spool.py): le sessioni
+# Streamlit non scrivono nel DB, accodano nello spool, e il replayer manda un
+# blocco di righe per submit. Il group commit serve solo se altri thread
+# scrivono in concorrenza (bench/db_writes.py misura quel caso).
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from db import SessionLocal
+
+
+class DBWriter:
+    """Thread scrittore con group commit.
+
+    submit(*objects) accoda oggetti ORM da salvare nella stessa transazione e
+    ritorna un Future che si completa al commit. Il thread prende la prima
+    richiesta, aspetta al massimo `linger` secondi che ne arrivino altre (fino
+    a `max_batch`) e le salva tutte con un solo commit.
+    """
+
+    def __init__(self, session_factory=SessionLocal, max_batch=256, linger=0.005):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.linger    = linger
+        self._queue  = queue.Queue()
+        self._thread = None
+        self._lock   = threading.Lock()
+
+    def submit(self, *objects):
+        future = Future()
+        self.start()
+        self._queue.put((objects, future))
+        return future
+
+    def write(self, *objects, timeout=30):
+        """Come submit, ma aspetta il commit (rilancia l'eventuale errore)."""
+        return self.submit(*objects).result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit(self, batch):
+        session = self.session_factory()
+        try:
+            for objects, _ in batch:
+                session.add_all(objects)
+            session.commit()
+            return True
+        except Exception:
+            session.rollback()
+            return False
+        finally:
+            session.close()
+
+    def _commit_one(self, objects, future):
+        session = self.session_factory()
+        try:
+            session.add_all(objects)
+            session.commit()
+            future.set_result(True)
+        except Exception as e:
+            session.rollback()
+            future.set_exception(e)
+        finally:
+            session.close()
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if self._commit(batch):
+                for _, future in batch:
+                    future.set_result(True)
+            else:
+                # Il gruppo è fallito: si riprova una richiesta alla volta per isolare quella rotta
+                for objects, future in batch:
+                    self._commit_one(objects, future)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+        return self
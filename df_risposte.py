@@ -1,37 +1,36 @@
+# df_risposte.py
+# Esporta le risposte in un unico file (xlsx, csv o parquet), a blocchi.
+#
+#   python df_risposte.py "C:\Users\...\risposte survey 29_05"    # cartella di JSON
+#   python df_risposte.py --from-db --out dataset_survey.parquet  # tabella responses
+import argparse
 import os
-import glob
-import json
-import pandas as pd
 
-# 1) Specifica il percorso alla cartella con i JSON
-folder_path = r"C:\Users\francescodistefano\Downloads\risposte survey 29_05"
+from export import export, iter_db, iter_json_dir
 
-# 2) Trova tutti i file con estensione .json
-json_files = glob.glob(os.path.join(folder_path, "*.json"))
 
-# 3) Lista dove accumuleremo i dizionari “appiattiti”
-rows = []
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export delle risposte del survey")
+    parser.add_argument("folder", nargs="?", default="responses",
+                        help="cartella con i file JSON (default: responses)")
+    parser.add_argument("--from-db", action="store_true", help="legge dalla tabella responses invece che dai JSON")
+    parser.add_argument("--out", help="file di output; l'estensione sceglie il formato")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=None, help="processi per il parsing dei JSON")
+    args = parser.parse_args(argv)
 
-for filepath in json_files:
-    with open(filepath, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    # 1) Sorgente: cartella di JSON oppure DB
+    if args.from_db:
+        chunks = iter_db(args.chunk_size)
+        output_path = args.out or "dataset_survey.xlsx"
+    else:
+        chunks = iter_json_dir(args.folder, args.chunk_size, args.workers)
+        output_path = args.out or os.path.join(args.folder, "dataset_survey.xlsx")
 
-    # Trasforma l’array "impacts" in un’unica stringa separata da ; 
-    if "impacts" in data and isinstance(data["impacts"], list):
-        data["impacts"] = ";".join(data["impacts"])
+    # 2) Scrittura a blocchi: impacts appiattito in "a;b;c" blocco per blocco
+    n = export(chunks, output_path)
+    print(f"Fatto: ho salvato {n} righe in '{output_path}'")
 
-    rows.append(data)
 
-# 4) Crea un DataFrame Pandas a partire dalla lista di dizionari
-df = pd.DataFrame(rows)
-
-# 5) (Opzionale) Riordina o rinomina le colonne se serve, ad esempio:
-# desired_order = ["gap_analysis", "board_inform", "budget", "adeguamento_specifico", "impacts", "bm_yes_no", "bm_nominee"]
-# df = df[desired_order]
-
-# 6) Scrivi su file Excel. Il file verrà creato nella stessa cartella di lavoro di esecuzione,
-#    ma puoi cambiare il path in output_path come preferisci.
-output_path = os.path.join(folder_path, "dataset_survey.xlsx")
-df.to_excel(output_path, index=False, engine="openpyxl")
-
-print(f"Fatto: ho salvato {len(df)} righe in '{output_path}'")
+if __name__ == "__main__":
+    main()
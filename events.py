@@ -0,0 +1,50 @@
+# events.py
+# Eventi (sessioni del survey) che condividono lo stesso deployment e lo stesso DB.
+#
+# L'evento arriva dall'URL (?event=<id>) e finisce nel path del file su GitHub:
+#   responses/<file>.json            → evento di default (layout storico)
+#   responses/<event>/<file>.json    → tutti gli altri eventi
+# Dal path si ricava sempre l'evento: migrate, reconcile e spool non hanno
+# bisogno d'altro.
+#
+# L'app accetta solo eventi noti: quello di default, quelli elencati in EVENTS
+# (id separati da virgola) e quelli che hanno già risposte in DB.
+import os
+import re
+
+DEFAULT_EVENT = "default"
+ROOT_FOLDER   = "responses"
+EVENT_RE      = re.compile(r"^[a-z0-9][a-z0-9-]{0,63}$")
+
+
+def is_valid(event):
+    return bool(event) and EVENT_RE.match(event) is not None
+
+
+def configured():
+    """Eventi dichiarati nella variabile d'ambiente EVENTS, più quello di default."""
+    ids = {e.strip() for e in os.environ.get("EVENTS", "").split(",")}
+    return {DEFAULT_EVENT} | {e for e in ids if is_valid(e)}
+
+
+def known(in_db=()):
+    """Eventi ammessi nell'URL: i configurati più quelli già presenti in DB (`in_db`)."""
+    return frozenset(configured() | {e for e in in_db if is_valid(e)})
+
+
+def folder(event):
+    """Cartella del repo in cui finiscono le risposte dell'evento."""
+    return ROOT_FOLDER if event == DEFAULT_EVENT else f"{ROOT_FOLDER}/{event}"
+
+
+def from_path(path):
+    """Evento di un file responses/...: la sottocartella, se c'è, altrimenti il default."""
+    parts = path.split("/")
+    if len(parts) == 3 and parts[0] == ROOT_FOLDER and is_valid(parts[1]):
+        return parts[1]
+    return DEFAULT_EVENT
+
+
+def url_params(event):
+    """Suffisso per gli URL dell'app (vuoto per l'evento di default)."""
+    return "" if event == DEFAULT_EVENT else f"&event={event}"
@@ -0,0 +1,286 @@
+# export.py
+# Export a blocchi delle risposte (CSV / Parquet / xlsx) senza caricare tutto in memoria.
+# La memoria di picco dipende da chunk_size, non dal numero di risposte.
+import csv
+import glob
+import hashlib
+import hmac
+import io
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+from urllib.parse import urlencode
+
+import events
+from db import SessionLocal, Response
+
+COLUMNS = ["event", "source_path", "timestamp", "gap_analysis", "board_inform", "budget",
+           "adeguamento_specifico", "impacts", "bm_yes_no", "bm_nominee", "bm_notes"]
+FORMATS = ["csv", "parquet", "xlsx"]
+PARSE_BATCH = 256   # file per task del process pool
+LINK_TTL = int(os.environ.get("EXPORT_LINK_TTL", "600"))   # validità dei link firmati, in secondi
+
+
+# ----------------------------------------------------------------
+# 1) Sorgenti: generatori di blocchi (liste di dict)
+# ----------------------------------------------------------------
+def _parse_file(filepath, folder):
+    name = os.path.basename(filepath)
+    with open(filepath, "r", encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError:
+            return None
+    if not isinstance(data, dict):
+        return None
+    try:
+        ts = datetime.strptime(name[:20], "%Y-%m-%dT%H-%M-%SZ")
+    except ValueError:
+        ts = None
+    row = {key: data.get(key) for key in COLUMNS}
+    # Path come nel repo: responses/<file>.json o responses/<event>/<file>.json
+    rel = os.path.relpath(filepath, folder).replace(os.sep, "/")
+    row["source_path"] = f"{events.ROOT_FOLDER}/{rel}"
+    row["event"] = events.from_path(row["source_path"])
+    row["timestamp"] = ts
+    return row
+
+
+def _parse_files(filepaths, folder):
+    # Gira nei processi del pool: deve restare una funzione top-level
+    return [_parse_file(path, folder) for path in filepaths]
+
+
+def iter_json_dir(folder, chunk_size=5000, workers=None):
+    """Blocchi di righe dai file *.json di una cartella (e delle sottocartelle
+    degli eventi), parsati in un process pool.
+
+    I task in volo sono limitati a circa un blocco più uno per worker: i
+    risultati non si accumulano se chi consuma è più lento dei parser.
+    """
+    files = sorted(glob.glob(os.path.join(folder, "*.json")) + glob.glob(os.path.join(folder, "*", "*.json")))
+    batches = (files[i:i + PARSE_BATCH] for i in range(0, len(files), PARSE_BATCH))
+    window = max(1, chunk_size // PARSE_BATCH) + (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque(pool.submit(_parse_files, batch, folder) for batch in islice(batches, window))
+        chunk = []
+        while pending:
+            rows = pending.popleft().result()
+            batch = next(batches, None)
+            if batch is not None:
+                pending.append(pool.submit(_parse_files, batch, folder))
+            for row in rows:
+                if row is None:
+                    continue
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+
+def iter_db(chunk_size=5000, session_factory=SessionLocal, event=None):
+    """Blocchi di righe dalla tabella responses, con cursore server-side (yield_per).
+
+    Con `event` solo le risposte di quell'evento, altrimenti tutte.
+    """
+    cols = [getattr(Response, c) for c in COLUMNS]
+    session = session_factory()
+    try:
+        query = session.query(*cols)
+        if event is not None:
+            query = query.filter(Response.event == event)
+        result = session.execute(
+            query.order_by(Response.id).statement,
+            execution_options={"stream_results": True, "yield_per": chunk_size},
+        )
+        for part in result.partitions():
+            yield [dict(zip(COLUMNS, row)) for row in part]
+    finally:
+        session.close()
+
+
+# ----------------------------------------------------------------
+# 2) Appiattimento per blocco: impacts → "a;b;c"
+# ----------------------------------------------------------------
+def flatten(chunk):
+    for row in chunk:
+        if isinstance(row.get("impacts"), list):
+            row["impacts"] = ";".join(row["impacts"])
+    return chunk
+
+
+# ----------------------------------------------------------------
+# 3) Writer: consumano i blocchi uno alla volta
+# ----------------------------------------------------------------
+def write_csv(chunks, out):
+    """`out` è un path o un file di testo già aperto."""
+    f = open(out, "w", encoding="utf-8", newline="") if isinstance(out, str) else out
+    try:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        n = 0
+        for chunk in chunks:
+            writer.writerows(flatten(chunk))
+            n += len(chunk)
+        return n
+    finally:
+        if isinstance(out, str):
+            f.close()
+
+
+def _arrow_schema():
+    import pyarrow as pa
+    return pa.schema([
+        (c, pa.timestamp("us") if c == "timestamp" else pa.string()) for c in COLUMNS
+    ])
+
+
+def write_parquet(chunks, out):
+    """Un row group per blocco."""
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema()
+    n = 0
+    with pq.ParquetWriter(out, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(_arrow_table(chunk, schema))
+            n += len(chunk)
+    return n
+
+
+def _arrow_table(chunk, schema):
+    import pyarrow as pa
+    flatten(chunk)
+    return pa.Table.from_pydict({c: [r.get(c) for r in chunk] for c in COLUMNS}, schema=schema)
+
+
+def write_xlsx(chunks, out):
+    """openpyxl in modalità write-only: le righe vanno su disco man mano."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("risposte")
+    ws.append(COLUMNS)
+    n = 0
+    for chunk in chunks:
+        for row in flatten(chunk):
+            ws.append([row.get(c) for c in COLUMNS])
+        n += len(chunk)
+    wb.save(out)
+    return n
+
+
+WRITERS = {"csv": write_csv, "parquet": write_parquet, "xlsx": write_xlsx}
+
+
+def export(chunks, out, fmt=None):
+    """Scrive i blocchi nel formato scelto (di default dall'estensione di `out`)."""
+    fmt = fmt or os.path.splitext(out)[1].lstrip(".").lower()
+    if fmt not in WRITERS:
+        raise ValueError(f"Formato non supportato: {fmt!r} (usa {', '.join(FORMATS)})")
+    return WRITERS[fmt](chunks, out)
+
+
+
+# ----------------------------------------------------------------
+# 4) Download in streaming: generatori di byte, un pezzo per blocco.
+#    Il client riceve il primo pezzo appena letto il primo blocco; in
+#    memoria c'è sempre un solo blocco (righe + byte già codificati).
+# ----------------------------------------------------------------
+MIMETYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def iter_csv_bytes(chunks):
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=COLUMNS)
+    writer.writeheader()
+    for chunk in chunks:
+        writer.writerows(flatten(chunk))
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    yield buf.getvalue().encode("utf-8")   # solo header se non ci sono righe
+
+
+class _Drain(io.RawIOBase):
+    """Sink solo-scrittura per ParquetWriter: take() consegna e svuota."""
+
+    def __init__(self):
+        self._parts = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._parts.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._pos
+
+    def take(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def iter_parquet_bytes(chunks):
+    """Un row group per blocco, scritto e consegnato subito; il footer alla fine."""
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema()
+    drain = _Drain()
+    with pq.ParquetWriter(drain, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(_arrow_table(chunk, schema))
+            yield drain.take()
+    yield drain.take()
+
+
+STREAMERS = {"csv": iter_csv_bytes, "parquet": iter_parquet_bytes}
+
+
+def stream(chunks, fmt):
+    """Generatore di byte del file nel formato scelto (csv o parquet)."""
+    if fmt not in STREAMERS:
+        raise ValueError(f"Formato non supportato per lo streaming: {fmt!r} (usa {', '.join(STREAMERS)})")
+    return STREAMERS[fmt](chunks)
+
+
+# ----------------------------------------------------------------
+# 5) Link firmati per la route di export (server.py): il token non va mai
+#    nell'URL, il link vale solo per formato + evento e scade dopo LINK_TTL.
+# ----------------------------------------------------------------
+def sign(token, fmt, event, expires):
+    message = f"{fmt}\n{event or ''}\n{expires}".encode("utf-8")
+    return hmac.new(token.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+def signed_query(token, fmt, event=None, ttl=LINK_TTL):
+    """Query string "exp=...&sig=..." (più l'evento) per /export/<fmt>."""
+    expires = int(time.time()) + ttl
+    params = {"event": event} if event is not None else {}
+    params.update(exp=expires, sig=sign(token, fmt, event, expires))
+    return urlencode(params)
+
+
+def check_signature(token, fmt, event, expires, sig):
+    """True se la firma è del token e il link non è scaduto."""
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    if expires < time.time() or not sig:
+        return False
+    return hmac.compare_digest(sig, sign(token, fmt, event, expires))
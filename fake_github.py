@@ -0,0 +1,214 @@
+# fake_github.py
+# Repo GitHub in memoria, per provare il worker offline senza rete né token.
+import base64
+import hashlib
+import itertools
+import random
+import threading
+import time
+
+from github import GithubException
+
+
+def _blob_sha(data):
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class FakeContentFile:
+    def __init__(self, path, content):
+        self.path = path
+        self.type = "blob"
+        self.decoded_content = content.encode("utf-8") if isinstance(content, str) else content
+        self.sha = _blob_sha(self.decoded_content)
+
+
+class FakeGitBlob:
+    def __init__(self, sha, data):
+        self.sha = sha
+        self.encoding = "base64"
+        self.content = base64.b64encode(data).decode()
+
+
+class FakeGitTree:
+    def __init__(self, sha, files):
+        self.sha = sha
+        self.files = files
+
+    @property
+    def tree(self):
+        # Come GitTree.tree con recursive=True: solo i blob, path completi
+        return [self.files[p] for p in sorted(self.files)]
+
+
+class FakeGitCommit:
+    def __init__(self, sha, tree, parents):
+        self.sha = sha
+        self.tree = tree
+        self.parents = parents
+
+
+class FakeGitObject:
+    def __init__(self, sha):
+        self.sha = sha
+
+
+class FakeGitRef:
+    def __init__(self, repo, sha):
+        self._repo = repo
+        self.object = FakeGitObject(sha)
+
+    def edit(self, sha, force=False):
+        self._repo._move_head(sha, force)
+        self.object = FakeGitObject(sha)
+
+
+class FakeRepo:
+    """Stand-in di github.Repository: contents API + Git data API (ref/tree/commit).
+
+    latency: secondi di attesa per ogni chiamata API
+    conflict_rate: probabilità che una scrittura sul branch risponda 409
+    """
+
+    default_branch = "main"
+
+    def __init__(self, latency=0.0, conflict_rate=0.0, seed=0):
+        self.latency = latency
+        self.conflict_rate = conflict_rate
+        self.commits = 0
+        self.api_calls = 0
+        self.conflicts = 0
+        self._rng  = random.Random(seed)
+        self._lock = threading.Lock()
+        self._ids  = itertools.count()
+        self._objects = {}
+        self._blobs = {}
+        root = self._new_commit(self._new_tree({}), [])
+        self.head = root.sha
+
+    # --- oggetti git -------------------------------------------------
+    def _sha(self):
+        return hashlib.sha1(str(next(self._ids)).encode()).hexdigest()
+
+    def _new_tree(self, files):
+        tree = FakeGitTree(self._sha(), files)
+        self._objects[tree.sha] = tree
+        return tree
+
+    def _new_commit(self, tree, parents):
+        commit = FakeGitCommit(self._sha(), tree, parents)
+        self._objects[commit.sha] = commit
+        return commit
+
+    def _new_file(self, path, content):
+        f = FakeContentFile(path, content)
+        self._blobs[f.sha] = f.decoded_content
+        return f
+
+    @property
+    def files(self):
+        return self._objects[self.head].tree.files
+
+    def _call(self):
+        with self._lock:
+            self.api_calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _maybe_conflict(self):
+        if self._rng.random() < self.conflict_rate:
+            self.conflicts += 1
+            raise GithubException(409, {"message": "is at a different sha"})
+
+    def _move_head(self, sha, force):
+        self._call()
+        with self._lock:
+            self._maybe_conflict()
+            commit = self._objects[sha]
+            if not force and self.head not in [p.sha for p in commit.parents]:
+                raise GithubException(422, {"message": "Update is not a fast forward"})
+            self.head = sha
+            self.commits += 1
+
+    # --- contents API ------------------------------------------------
+    def create_file(self, path, message, content, branch=None):
+        self._call()
+        with self._lock:
+            self._maybe_conflict()
+            if path in self.files:
+                raise GithubException(422, {"message": "\"sha\" wasn't supplied."})
+            files = dict(self.files)
+            files[path] = self._new_file(path, content)
+            commit = self._new_commit(self._new_tree(files), [self._objects[self.head]])
+            self.head = commit.sha
+            self.commits += 1
+        return {"content": files[path], "commit": commit}
+
+    def get_contents(self, path, ref=None):
+        self._call()
+        with self._lock:
+            files = self.files
+            if path in files:
+                return files[path]
+            prefix = path.rstrip("/") + "/"
+            listing = [f for p, f in sorted(files.items()) if p.startswith(prefix)]
+        if listing:
+            return listing
+        raise GithubException(404, {"message": "Not Found"})
+
+    # --- Git data API ------------------------------------------------
+    def get_git_ref(self, ref):
+        self._call()
+        with self._lock:
+            return FakeGitRef(self, self.head)
+
+    def get_git_commit(self, sha):
+        self._call()
+        with self._lock:
+            return self._objects[sha]
+
+    def get_git_tree(self, sha, recursive=False):
+        self._call()
+        with self._lock:
+            obj = self._objects[self.head if sha == self.default_branch else sha]
+            return obj.tree if isinstance(obj, FakeGitCommit) else obj
+
+    def get_git_blob(self, sha):
+        self._call()
+        with self._lock:
+            if sha in self._blobs:
+                return FakeGitBlob(sha, self._blobs[sha])
+        raise GithubException(404, {"message": "Not Found"})
+
+    def create_git_tree(self, tree, base_tree=None):
+        self._call()
+        with self._lock:
+            files = dict(base_tree.files) if base_tree is not None else {}
+            for element in tree:
+                item = element._identity
+                files[item["path"]] = self._new_file(item["path"], item["content"])
+            return self._new_tree(files)
+
+    def create_git_commit(self, message, tree, parents):
+        self._call()
+        with self._lock:
+            return self._new_commit(tree, list(parents))
+
+
+class FakeGithub:
+    """Stand-in di github.Github: ogni get_repo ritorna lo stesso FakeRepo.
+
+    Per far girare l'app intera contro il repo finto basta sostituire la
+    classe prima del primo invio: `github.Github = FakeGithub.bound(repo)`.
+    """
+
+    repo = None
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def get_repo(self, name):
+        return self.repo
+
+    @classmethod
+    def bound(cls, repo):
+        return type(cls.__name__, (cls,), {"repo": repo})
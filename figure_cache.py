@@ -0,0 +1,142 @@
+# figure_cache.py
+# Figure Plotly della dashboard (donut Sì/No, barre categoriche) costruite
+# direttamente dai conteggi, senza pandas né plotly.express, e tenute in una
+# cache LRU indicizzata da (domanda, conteggi ordinati, tema).
+# Stessi conteggi → stessa figura già pronta: nessuna ricostruzione al rerun.
+import textwrap
+import threading
+from collections import OrderedDict
+
+import plotly.graph_objects as go
+
+from schema import YESNO, CATEGORICAL
+from theme import PALETTE
+
+# Fill trasparente e bordo pieno per opzione
+YESNO_FILL = {
+    "Sì": "rgba(0, 184, 245, 0.7)",  # 30% opacity
+    "No": "rgba(30, 73, 226, 0.7)"
+}
+YESNO_BORDER = {
+    "Sì": PALETTE[4],
+    "No": PALETTE[1]
+}
+CATEGORICAL_FILL = {
+    "Amministratore Delegato":  "rgba(0, 184, 245, 0.7)",
+    "Altro membro esecutivo del Consiglio di Amministrazione": "rgba(114, 16, 234, 0.7)",
+    "Membro non esecutivo del Consiglio di Amministrazione (che diventa esecutivo a seguito della nomina)": "rgba(253, 52, 156, 0.7)",
+    "Non ancora definito": "rgba(0, 51, 141, 0.7)"
+}
+CATEGORICAL_BORDER = {
+    "Amministratore Delegato":  PALETTE[4],
+    "Altro membro esecutivo del Consiglio di Amministrazione": PALETTE[5],
+    "Membro non esecutivo del Consiglio di Amministrazione (che diventa esecutivo a seguito della nomina)": PALETTE[6],
+    "Non ancora definito": PALETTE[0]
+}
+DEFAULT_FILL = "rgba(0, 51, 141, 0.7)"
+
+# Tutto ciò che cambia l'aspetto delle figure: entra nella chiave della cache
+THEME = (tuple(PALETTE), tuple(YESNO_FILL.items()), tuple(CATEGORICAL_FILL.items()))
+
+
+def yesno_figure(items):
+    """Donut con fill trasparente e bordo pieno; items = [(opzione, n)]."""
+    labels = [opt for opt, _ in items]
+    fig = go.Figure(go.Pie(
+        labels=labels,
+        values=[n for _, n in items],
+        hole=0.5,
+        sort=False,
+        marker=dict(
+            colors=[YESNO_FILL.get(label, DEFAULT_FILL) for label in labels],
+            # bordo pieno, 4px
+            line=dict(color=[YESNO_BORDER.get(label, PALETTE[0]) for label in labels], width=4)
+        ),
+        textinfo="label+percent",
+        textposition="inside",
+        textfont=dict(size=24, color="white"),
+        hovertemplate="%{label}: %{value}<extra></extra>"
+    ))
+    fig.update_layout(
+        margin=dict(t=20, l=20, r=20, b=20),
+        showlegend=False
+    )
+    return fig
+
+
+def categorical_figure(items):
+    """Barre verticali con conteggio e percentuale, etichette a capo."""
+    labels = [opt for opt, _ in items]
+    counts = [n for _, n in items]
+    total = sum(counts) or 1
+    fig = go.Figure(go.Bar(
+        x=labels,
+        y=counts,
+        customdata=[[n / total * 100] for n in counts],
+        marker=dict(
+            color=[CATEGORICAL_FILL.get(opt, DEFAULT_FILL) for opt in labels],
+            line=dict(color=[CATEGORICAL_BORDER.get(opt, PALETTE[0]) for opt in labels], width=4)
+        ),
+        texttemplate="%{y}<br>%{customdata[0]:.1f}%",
+        textposition="inside",
+        insidetextanchor="middle",
+        textfont=dict(size=30, color="white"),
+        hovertemplate="%{x}: %{y}<extra></extra>"
+    ))
+    fig.update_yaxes(
+        tickformat=".0f",
+        showgrid=False
+    )
+    fig.update_xaxes(
+        ticktext=["<br>".join(textwrap.wrap(op, width=15)) for op in labels],
+        tickvals=labels,
+        tickfont=dict(size=18),
+        automargin=True
+    )
+    fig.update_layout(
+        xaxis_title=None,
+        yaxis_title=None,
+        margin=dict(t=20, b=300, l=50, r=20),
+        height=600
+    )
+    return fig
+
+
+BUILDERS = {
+    YESNO: yesno_figure,
+    CATEGORICAL: categorical_figure,
+}
+
+
+class FigureCache:
+    """LRU di figure pronte; max_items=0 disattiva la cache (utile nei benchmark)."""
+
+    def __init__(self, max_items=256):
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def figure(self, result):
+        """Figura per un QuestionCounts (domanda Sì/No o categorica)."""
+        question = result.question
+        items = tuple(result.items())
+        key = (question.key, question.kind, items, THEME)
+        with self._lock:
+            fig = self._figures.get(key)
+            if fig is not None:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                return fig
+            self.misses += 1
+        fig = BUILDERS[question.kind](items)
+        if self.max_items:
+            with self._lock:
+                self._figures[key] = fig
+                while len(self._figures) > self.max_items:
+                    self._figures.popitem(last=False)
+        return fig
+
+    def __len__(self):
+        return len(self._figures)
@@ -0,0 +1,201 @@
+# github_writer.py
+import threading
+import time
+from datetime import datetime
+
+from github import GithubException, InputGitTreeElement
+
+import metrics
+from db import SessionLocal, GithubOutbox
+
+COMMIT_MESSAGE = "Nuova risposta EU AML Package"
+
+
+@metrics.timed("github.create_file")
+def create_file_with_retry(repo, path, message, content, max_tries=3, backoff=0.5):
+    for attempt in range(1, max_tries+1):
+        try:
+            return repo.create_file(path, message, content)
+        except GithubException as e:
+            if e.status in (409, 422) and attempt < max_tries:
+                metrics.incr("github.retries")
+                time.sleep(backoff * attempt)
+                continue
+            else:
+                raise
+
+
+@metrics.timed("github.commit")
+def commit_files(repo, files, message=COMMIT_MESSAGE, branch=None, max_tries=5, backoff=0.5):
+    """Scrive più file con un solo tree + un solo commit + un update del ref.
+
+    `files` è una lista di (path, content). Se il ref si è mosso nel frattempo
+    (409/422, non fast-forward) si rilegge la testa del branch e si riprova.
+    """
+    branch = branch or repo.default_branch
+    elements = [InputGitTreeElement(path, "100644", "blob", content=content)
+                for path, content in files]
+    for attempt in range(1, max_tries+1):
+        ref    = repo.get_git_ref(f"heads/{branch}")
+        base   = repo.get_git_commit(ref.object.sha)
+        tree   = repo.create_git_tree(elements, base.tree)
+        commit = repo.create_git_commit(message, tree, [base])
+        try:
+            ref.edit(commit.sha)
+            return commit
+        except GithubException as e:
+            if e.status in (409, 422) and attempt < max_tries:
+                metrics.incr("github.retries")
+                time.sleep(backoff * attempt)
+                continue
+            else:
+                raise
+
+
+def enqueue(session, path, payload):
+    """Accoda un file per GitHub nella stessa transazione della risposta."""
+    session.add(GithubOutbox(path=path, payload=payload))
+
+
+def _already_on_github(repo, path):
+    # 422 su create_file = il file esiste già (es. invio precedente andato a buon fine)
+    try:
+        repo.get_contents(path)
+        return True
+    except GithubException:
+        return False
+
+
+class GithubWriter:
+    """Worker in background che svuota github_outbox verso il repo.
+
+    `repo` è qualsiasi oggetto con create_file(path, message, content)
+    (PyGithub Repository oppure fake_github.FakeRepo).
+    """
+
+    def __init__(self, repo, session_factory=SessionLocal, interval=2.0,
+                 batch_size=50, max_tries=3, backoff=0.5, window=0.0):
+        self.repo = repo
+        self.session_factory = session_factory
+        self.interval   = interval
+        self.window     = window
+        self.batch_size = batch_size
+        self.max_tries  = max_tries
+        self.backoff    = backoff
+        self._wake   = threading.Event()
+        self._stop   = threading.Event()
+        self._thread = None
+
+    def _pending(self, session):
+        return (
+            session.query(GithubOutbox)
+            .filter(GithubOutbox.sent_at.is_(None))
+            .order_by(GithubOutbox.attempts, GithubOutbox.id)
+            .limit(self.batch_size)
+            .all()
+        )
+
+    def drain_once(self):
+        """Invia un blocco di file pendenti; ritorna quanti sono stati scritti."""
+        session = self.session_factory()
+        written = 0
+        try:
+            pending = self._pending(session)
+            for item in pending:
+                item.attempts += 1
+                try:
+                    create_file_with_retry(self.repo, item.path, COMMIT_MESSAGE, item.payload,
+                                           max_tries=self.max_tries, backoff=self.backoff)
+                except GithubException as e:
+                    if e.status == 422 and _already_on_github(self.repo, item.path):
+                        item.sent_at = datetime.utcnow()
+                    else:
+                        item.last_error = f"{e.status}: {e.data}"
+                    session.commit()
+                    continue
+                item.sent_at = datetime.utcnow()
+                item.last_error = None
+                session.commit()
+                written += 1
+            return written
+        finally:
+            session.close()
+
+    def pending_count(self):
+        session = self.session_factory()
+        try:
+            return session.query(GithubOutbox).filter(GithubOutbox.sent_at.is_(None)).count()
+        finally:
+            session.close()
+
+    def wake(self):
+        """Segnala al worker che ci sono nuovi file da inviare."""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self.window:
+                # Finestra di raccolta: le risposte arrivate intanto finiscono nello stesso commit
+                self._stop.wait(self.window)
+            try:
+                # Continua finché la coda non è vuota, poi torna in attesa
+                while not self._stop.is_set() and self.drain_once() >= self.batch_size:
+                    pass
+            except Exception:
+                # Errori DB/rete transitori: si riprova al prossimo giro
+                time.sleep(self.interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="github-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+class BatchGithubWriter(GithubWriter):
+    """Come GithubWriter, ma ogni blocco di file pendenti diventa un solo commit.
+
+    Raccoglie le risposte per `window` secondi (al massimo `batch_size` file per
+    commit) e le scrive con commit_files: 5 chiamate API per commit invece di
+    una create_file per risposta, e molti meno conflitti sul branch.
+    """
+
+    def __init__(self, repo, session_factory=SessionLocal, interval=2.0,
+                 batch_size=200, max_tries=5, backoff=0.5, window=2.0):
+        super().__init__(repo, session_factory, interval=interval, batch_size=batch_size,
+                         max_tries=max_tries, backoff=backoff, window=window)
+
+    def drain_once(self):
+        session = self.session_factory()
+        try:
+            pending = self._pending(session)
+            if not pending:
+                return 0
+            for item in pending:
+                item.attempts += 1
+            try:
+                commit_files(self.repo, [(item.path, item.payload) for item in pending],
+                             message=f"Nuove risposte EU AML Package ({len(pending)})",
+                             max_tries=self.max_tries, backoff=self.backoff)
+            except GithubException as e:
+                for item in pending:
+                    item.last_error = f"{e.status}: {e.data}"
+                session.commit()
+                return 0
+            now = datetime.utcnow()
+            for item in pending:
+                item.sent_at = now
+                item.last_error = None
+            session.commit()
+            return len(pending)
+        finally:
+            session.close()
@@ -0,0 +1,58 @@
+# landing.py
+import streamlit as st
+
+import events
+
+
+# ----------------------------------------------------------------
+# QR Landing Page
+# ----------------------------------------------------------------
+def render(app_url, assets, event=events.DEFAULT_EVENT):
+    st.title("EU AML Package")
+    survey_url = f"{app_url}?survey=1{events.url_params(event)}"
+
+    # QR già pronto in memoria (generato una volta per URL)
+    qr_uri = assets.qr_data_uri(survey_url)
+
+    # Override CSS: container full-width, centratura QR & URL
+    st.markdown(
+        """
+        <style>
+          /* Solo qui: elimina il max-width di 700px */
+          [data-testid="stAppViewContainer"] [data-testid="stBlockContainer"] {
+            max-width: none !important;
+            width: 100% !important;
+          }
+          .qr-container {
+            text-align: center;
+            margin: 0 auto;
+            padding: 40px 0;
+          }
+          .qr-container img {
+            width: 700px;
+            max-width: 90vw;
+            height: auto;
+          }
+          .survey-url {
+            font-size: 48px;
+            white-space: nowrap;
+            margin-top: 20px;
+          }
+        </style>
+        """,
+        unsafe_allow_html=True
+    )
+
+    # Output QR + URL
+    st.markdown(
+        f"""
+        <div class="qr-container">
+          <img src="{qr_uri}" alt="QR code" />
+          <div class="survey-url">{survey_url}</div>
+          <div style="margin-top:10px;">
+            <a href="{survey_url}" target="_blank">Apri il form</a>
+          </div>
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
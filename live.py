@@ -0,0 +1,63 @@
+# live.py
+# Modalità live della dashboard: un solo poller per processo controlla se ci
+# sono righe con id > ultimo visto o se la versione dei contatori è salita
+# (UPDATE di reconcile), con due lookup su chiave primaria, e solo in quel caso
+# rilegge i contatori. Tutti i frammenti di tutte le sessioni condividono lo
+# stesso snapshot: da fermo nessun ricalcolo.
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+import metrics
+from aggregation import SurveyCounts, aggregate
+from db import SessionLocal, Response, load_version
+from events import DEFAULT_EVENT
+
+
+@dataclass(frozen=True)
+class LiveSnapshot:
+    watermark: int                  # id più alto visto
+    version: int                    # versione dei contatori (cambia anche con gli UPDATE)
+    last_timestamp: Optional[datetime]
+    counts: SurveyCounts
+
+
+class LiveFeed:
+    """Snapshot condiviso dell'evento, ricontrollato al più ogni `min_interval` secondi."""
+
+    def __init__(self, session_factory=SessionLocal, min_interval=1.0, event=DEFAULT_EVENT):
+        self.session_factory = session_factory
+        self.event = event
+        self.min_interval = min_interval
+        self._snapshot = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def poll(self):
+        with self._lock:
+            if self._snapshot is not None and time.monotonic() - self._checked < self.min_interval:
+                return self._snapshot
+            session = self.session_factory()
+            try:
+                last = (
+                    session.query(Response.id, Response.timestamp)
+                    .filter(Response.event == self.event)
+                    .order_by(Response.id.desc()).limit(1).first()
+                )
+                watermark, last_ts = last if last else (0, None)
+                version = load_version(session, self.event)
+                seen = (self._snapshot.watermark, self._snapshot.version) if self._snapshot else None
+                if (watermark, version) != seen:
+                    with metrics.span("live.aggregate"):
+                        self._snapshot = LiveSnapshot(watermark, version, last_ts, aggregate(session, self.event))
+            finally:
+                session.close()
+            self._checked = time.monotonic()
+            return self._snapshot
+
+    def invalidate(self):
+        """Il prossimo poll rilegge comunque i contatori."""
+        with self._lock:
+            self._snapshot = None
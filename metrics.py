@@ -0,0 +1,210 @@
+# metrics.py
+# Tempi e contatori dei punti caldi (commit SQLite, GitHub, caricamento risposte,
+# word cloud, figure Plotly) in istogrammi di processo.
+#
+# Si attiva con METRICS=1 (letto all'import). Da spento span() ritorna sempre
+# lo stesso context manager vuoto, incr/observe escono subito e timed() lascia
+# la funzione com'è: nessun costo misurabile sui percorsi caldi.
+#
+# METRICS_DUMP=metrics.prom (o .json) scrive periodicamente un file di dump,
+# in formato Prometheus text o JSON a seconda dell'estensione.
+import bisect
+import contextlib
+import functools
+import json
+import math
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("METRICS", "") not in ("", "0")
+PREFIX  = "survey_"
+# Limiti superiori dei bucket, in secondi (come i default di Prometheus, più 30s)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, math.inf)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Stima: limite superiore del bucket che contiene il quantile q."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Registry:
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value):
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.observe(value)
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    # --- esportazione ------------------------------------------------
+    def snapshot(self):
+        """Dict serializzabile: istogrammi (count/sum/max/p50/p95/p99 + bucket) e contatori."""
+        with self._lock:
+            return {
+                "histograms": {
+                    name: {"count": h.count, "sum": h.sum, "max": h.max,
+                           "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99),
+                           "buckets": [[("+Inf" if b == math.inf else b), n] for b, n in zip(h.buckets, h.counts)]}
+                    for name, h in sorted(self.histograms.items())
+                },
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        lines = []
+        snap = self.snapshot()
+        for name, h in snap["histograms"].items():
+            metric = _metric_name(name) + "_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, n in h["buckets"]:
+                cumulative += n
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"{metric}_sum {h['sum']}")
+            lines.append(f"{metric}_count {h['count']}")
+        for name, value in snap["counters"].items():
+            metric = _metric_name(name) + "_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Scrittura atomica del dump: .json → JSON, altrimenti Prometheus text."""
+        text = self.to_json() if path.endswith(".json") else self.to_prometheus()
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+
+def _metric_name(name):
+    return PREFIX + "".join(c if c.isalnum() else "_" for c in name)
+
+
+REGISTRY = Registry()
+
+
+# ----------------------------------------------------------------
+# API per il codice applicativo
+# ----------------------------------------------------------------
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        REGISTRY.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+_NOOP = contextlib.nullcontext()
+
+
+def span(name):
+    """Context manager che registra la durata del blocco nell'istogramma `name`."""
+    return _Span(name) if ENABLED else _NOOP
+
+
+def timed(name):
+    """Decoratore: come span() attorno a ogni chiamata; da spento non avvolge nulla."""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def incr(name, n=1):
+    if ENABLED:
+        REGISTRY.incr(name, n)
+
+
+def observe(name, value):
+    if ENABLED:
+        REGISTRY.observe(name, value)
+
+
+class Dumper:
+    """Thread che riscrive il file di dump ogni `interval` secondi."""
+
+    def __init__(self, path, interval=10.0, registry=REGISTRY):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.registry.dump(self.path)
+            except OSError:
+                pass
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="metrics-dump", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.registry.dump(self.path)
+
+
+def dump_from_env():
+    """Scrive il dump una volta, se METRICS e METRICS_DUMP sono impostate (script CLI)."""
+    path = os.environ.get("METRICS_DUMP")
+    if ENABLED and path:
+        REGISTRY.dump(path)
@@ -1,65 +1,281 @@
-from github import Github
-from db import SessionLocal, init_db, Response
+# migrate.py
+# Importa i file responses/*.json e responses/<evento>/*.json nella tabella responses.
+#
+#   python migrate.py --local responses            # cartella locale
+#   python migrate.py --github owner/repo          # token in GITHUB_TOKEN
+#
+# I file già importati (source_path) vengono saltati: rilanciarlo importa solo i nuovi.
+# Anche i file scartati (skipped_files) non si riscaricano finché il loro sha non cambia.
+# Le righe legacy senza source_path (DB precedenti all'import da GitHub) vengono
+# abbinate per contenuto ai file del repo: ricevono il loro path invece di
+# essere duplicate.
+import argparse
+import base64
 import json
+import os
 import sys
 import traceback
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
 
-# 1) Inizializza il database
-init_db()
+from sqlalchemy import insert, update
 
-# 2) Connetti a GitHub
-g = Github(g)
-repo = g.get_repo(r)
+import events
+import metrics
+from db import (SessionLocal, init_db, Response, response_deltas, bump_counters,
+                rollup_deltas, bump_rollups, term_deltas, bump_terms, index_terms, git_blob_sha,
+                record_skipped, skipped_files)
+from schema import QUESTION_KEYS
 
-# 3) Recupera la lista di file JSON
-files = repo.get_contents("responses")
+FOLDER = "responses"
+FIELDS = QUESTION_KEYS
+FETCH_WINDOW = 4   # fetch in volo per worker
 
-# 4) Apri la sessione DB
-session = SessionLocal()
-skipped = 0
 
-for f in files:
-    raw = repo.get_contents(f.path).decoded_content
+# ----------------------------------------------------------------
+# 1) Sorgenti: elencano (path, sha) e leggono il contenuto di un file
+# ----------------------------------------------------------------
+class LocalSource:
+    """Cartella locale, es. la responses/ del repo (più le sottocartelle degli eventi)."""
+
+    def __init__(self, folder, prefix=FOLDER):
+        self.folder = folder
+        self.prefix = prefix
+
+    def list(self):
+        items = []
+        for name in sorted(os.listdir(self.folder)):
+            full = os.path.join(self.folder, name)
+            if name.endswith(".json"):
+                with open(full, "rb") as f:
+                    items.append((f"{self.prefix}/{name}", git_blob_sha(f.read())))
+            elif os.path.isdir(full) and events.is_valid(name):
+                for sub in sorted(os.listdir(full)):
+                    if sub.endswith(".json"):
+                        with open(os.path.join(full, sub), "rb") as f:
+                            items.append((f"{self.prefix}/{name}/{sub}", git_blob_sha(f.read())))
+        return items
+
+    def fetch(self, path, sha):
+        # Il path relativo al prefisso è anche quello relativo alla cartella
+        with open(os.path.join(self.folder, *path[len(self.prefix) + 1:].split("/")), "rb") as f:
+            return f.read()
+
+
+class GithubSource:
+    """Cartella responses/ di un repo GitHub: un solo listing ricorsivo del tree."""
+
+    def __init__(self, repo, folder=FOLDER, branch=None):
+        self.repo = repo
+        self.folder = folder
+        self.branch = branch or repo.default_branch
+
+    def list(self):
+        tree = self.repo.get_git_tree(self.branch, recursive=True)
+        return [
+            (e.path, e.sha) for e in tree.tree
+            if e.type == "blob" and e.path.startswith(self.folder + "/") and e.path.endswith(".json")
+        ]
+
+    def fetch(self, path, sha):
+        return base64.b64decode(self.repo.get_git_blob(sha).content)
+
+
+def fetch_all(source, items, workers=16):
+    """(path, sha, contenuto) per ogni (path, sha) di `items`, nell'ordine.
+
+    Al più workers * FETCH_WINDOW fetch in volo: i contenuti non si accumulano
+    se chi consuma (parsing, INSERT) è più lento dei download.
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque((path, sha, pool.submit(source.fetch, path, sha))
+                        for path, sha in islice(items, workers * FETCH_WINDOW))
+        while pending:
+            path, sha, future = pending.popleft()
+            raw = future.result()
+            for path_next, sha_next in islice(items, 1):
+                pending.append((path_next, sha_next, pool.submit(source.fetch, path_next, sha_next)))
+            yield path, sha, raw
+
+
+# ----------------------------------------------------------------
+# 2) Parsing e validazione di un file
+# ----------------------------------------------------------------
+def _timestamp_from_path(path):
+    # responses/2025-05-16T08-34-59Z-<uuid>.json
+    try:
+        return datetime.strptime(path.rsplit("/", 1)[-1][:20], "%Y-%m-%dT%H-%M-%SZ")
+    except ValueError:
+        return None
+
+
+def parse_record(path, sha, raw):
+    """Riga pronta per l'INSERT, oppure None se il file va saltato."""
     try:
         r = json.loads(raw)
     except json.JSONDecodeError:
-        print(f"[!] File non valido JSON, skip: {f.path}", file=sys.stderr)
-        skipped += 1
-        continue
+        print(f"[!] File non valido JSON, skip: {path}", file=sys.stderr)
+        return None
+    if not isinstance(r, dict):
+        print(f"[!] Formato inatteso, skip: {path}", file=sys.stderr)
+        return None
 
-    # 5) Estrai e valida i campi essenziali
+    # Se mancano o sono None/empty → skip
     bm_yes_no  = r.get("bm_yes_no")
     bm_nominee = r.get("bm_nominee")
     impacts    = r.get("impacts")
-
-    # Se mancano o sono None/empty → skip
     if not bm_yes_no or not bm_nominee or impacts is None:
         print(
-            f"[!] Skipping {f.path}: "
+            f"[!] Skipping {path}: "
             f"bm_yes_no={bm_yes_no!r}, bm_nominee={bm_nominee!r}, impacts={impacts!r}",
             file=sys.stderr
         )
-        skipped += 1
-        continue
-
-    # 6) Prendi bm_notes (opzionale)
-    bm_notes = r.get("bm_notes")
-
-    # 7) Crea e aggiungi l’oggetto ORM
-    resp = Response(
-        bm_yes_no = bm_yes_no,
-        bm_nominee= bm_nominee,
-        bm_notes  = bm_notes,
-        impacts   = impacts
-    )
-    session.add(resp)
-
-# 8) Commit e gestione errori
-try:
+        return None
+
+    row = {key: r.get(key) for key in FIELDS}
+    row["timestamp"]   = _timestamp_from_path(path) or datetime.utcnow()
+    row["event"]       = events.from_path(path)
+    row["source_path"] = path
+    row["source_sha"]  = sha
+    return row
+
+
+# ----------------------------------------------------------------
+# 3) Righe legacy senza file di origine: abbinate ai file per contenuto
+# ----------------------------------------------------------------
+def content_key(get):
+    """Evento + risposte normalizzate (liste come tuple, vuoti come None)."""
+    values = [get("event") or events.DEFAULT_EVENT]
+    for key in FIELDS:
+        value = get(key)
+        values.append((tuple(value) or None) if isinstance(value, list) else (value or None))
+    return tuple(values)
+
+
+def unnamed_by_content(session, ids=None):
+    """{content_key: [id, ...]} delle righe senza source_path, le più vecchie prima."""
+    query = session.query(Response).filter(Response.source_path.is_(None))
+    if ids is not None:
+        query = query.filter(Response.id.in_(ids))
+    groups = {}
+    for resp in query.order_by(Response.id):
+        groups.setdefault(content_key(lambda key: getattr(resp, key)), []).append(resp.id)
+    return groups
+
+
+def take_match(unnamed, row):
+    """Id di una riga legacy con lo stesso contenuto di `row` (e la consuma), o None."""
+    ids = unnamed.get(content_key(row.get))
+    return ids.pop(0) if ids else None
+
+
+def adopt_rows(session, matches):
+    """Path e sha del file abbinato alle righe legacy: [(id, path, sha)]. Contatori invariati."""
+    if matches:
+        session.execute(update(Response), [
+            {"id": rid, "source_path": path, "source_sha": sha} for rid, path, sha in matches
+        ])
+        session.commit()
+        metrics.incr("migrate.adopted", len(matches))
+
+
+# ----------------------------------------------------------------
+# 4) Motore: fetch concorrente, INSERT a blocchi, contatori aggiornati
+# ----------------------------------------------------------------
+@metrics.timed("migrate.batch")
+def insert_batch(session, rows):
+    metrics.incr("migrate.rows_inserted", len(rows))
+    deltas  = Counter()
+    rollups = Counter()
+    terms   = Counter()
+    for row in rows:
+        deltas.update(response_deltas(row))
+        rollups.update(rollup_deltas(row))
+        terms.update(term_deltas(row))
+    # RETURNING nell'ordine delle righe: gli id servono all'indice dei termini per risposta
+    ids = session.scalars(insert(Response).returning(Response.id, sort_by_parameter_order=True), rows).all()
+    bump_counters(session.connection(), deltas)
+    bump_rollups(session.connection(), rollups)
+    bump_terms(session.connection(), terms)
+    index_terms(session.connection(), list(zip(ids, rows)))
     session.commit()
-    print(f"Migrazione completata, {skipped} file saltati.")
-except Exception as e:
-    print("Errore durante il commit:", e, file=sys.stderr)
-    traceback.print_exc()
-finally:
-    session.close()
+
+
+def migrate(source, session_factory=SessionLocal, workers=16, batch_size=500):
+    """Importa i file nuovi di `source`; ritorna (importati, saltati).
+
+    I file abbinati a righe legacy non contano tra gli importati.
+    """
+    init_db()
+    session = session_factory()
+    imported = skipped = adopted = 0
+    try:
+        known = {p for (p,) in session.query(Response.source_path).filter(Response.source_path.isnot(None))}
+        bad   = skipped_files(session)
+        todo  = [(path, sha) for path, sha in source.list() if path not in known and bad.get(path) != sha]
+        unnamed = unnamed_by_content(session)
+
+        batch, matches, rejected = [], [], []
+        for path, sha, raw in fetch_all(source, todo, workers):
+            row = parse_record(path, sha, raw)
+            if row is None:
+                skipped += 1
+                metrics.incr("migrate.skipped")
+                rejected.append((path, sha))
+                continue
+            rid = take_match(unnamed, row)
+            if rid is not None:
+                matches.append((rid, path, sha))
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                insert_batch(session, batch)
+                imported += len(batch)
+                batch = []
+        if batch:
+            insert_batch(session, batch)
+            imported += len(batch)
+        adopt_rows(session, matches)
+        adopted = len(matches)
+        record_skipped(session, rejected)
+        if adopted:
+            print(f"{adopted} risposte già in DB senza file di origine abbinate ai file per contenuto.")
+        return imported, skipped
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa responses/*.json nel DB")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--local",  metavar="DIR", help="cartella locale con i JSON")
+    src.add_argument("--github", metavar="OWNER/REPO", help="repo GitHub (token in GITHUB_TOKEN)")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    if args.local:
+        source = LocalSource(args.local)
+    else:
+        from github import Github
+        source = GithubSource(Github(os.environ["GITHUB_TOKEN"]).get_repo(args.github))
+
+    try:
+        imported, skipped = migrate(source, workers=args.workers, batch_size=args.batch_size)
+        print(f"Migrazione completata, {imported} risposte importate, {skipped} file saltati.")
+    except Exception as e:
+        print("Errore durante la migrazione:", e, file=sys.stderr)
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        metrics.dump_from_env()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+# reconcile.py
+# Riallinea GitHub (responses/ e responses/<evento>/), SQLite (responses) e una cartella locale opzionale.
+#
+#   python reconcile.py --github owner/repo --dry-run          # solo report
+#   python reconcile.py --github owner/repo --local responses  # ripara
+#
+# Righe legacy senza file di origine: prima si abbinano a un file di GitHub
+# (stesso blob sha del payload, poi stesso contenuto) e ne prendono il path;
+# quelle rimaste senza file si pubblicano solo con --name-unmatched.
+#
+# Il manifest è la tabella responses stessa: (source_path, source_sha, id).
+# GitHub si legge con un solo listing ricorsivo del tree, poi si scaricano solo
+# i blob nuovi o cambiati: 10 risposte nuove su 100k = ~10 fetch.
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from datetime import datetime
+from uuid import uuid4
+
+import events
+from db import (SessionLocal, init_db, Response, GithubOutbox, git_blob_sha,
+                response_deltas, bump_counters, rollup_deltas, bump_rollups, term_deltas, bump_terms,
+                index_terms, record_skipped, skipped_files)
+from migrate import (GithubSource, LocalSource, fetch_all, parse_record, insert_batch,
+                     unnamed_by_content, take_match, adopt_rows)
+from schema import QUESTION_KEYS
+
+# Stesso ordine delle chiavi del payload scritto dal survey
+PAYLOAD_FIELDS = QUESTION_KEYS
+
+
+def manifest(session):
+    """{source_path: (source_sha, id)} per le risposte con un file di origine."""
+    return {
+        path: (sha, rid)
+        for path, sha, rid in session.query(Response.source_path, Response.source_sha, Response.id)
+        .filter(Response.source_path.isnot(None))
+    }
+
+
+def payload_for(row):
+    return json.dumps({key: getattr(row, key) for key in PAYLOAD_FIELDS}, ensure_ascii=False, indent=2)
+
+
+# ----------------------------------------------------------------
+# 1) Piano: confronto dei listing (nessun contenuto scaricato)
+# ----------------------------------------------------------------
+def plan(github_items, db_manifest, unnamed_ids, pending_paths=(), local_items=None, skipped=None):
+    github  = dict(github_items)
+    pending = set(pending_paths)
+    skipped = skipped or {}
+    plan = {
+        "new_in_db":      sorted(p for p in github if p not in db_manifest and skipped.get(p) != github[p]),
+        "changed_in_db":  sorted(p for p in github if p in db_manifest and db_manifest[p][0] != github[p]),
+        "missing_on_github": sorted(p for p in db_manifest if p not in github and p not in pending),
+        "pending_outbox": sorted(p for p in pending if p not in github),
+        "unnamed_in_db":  sorted(unnamed_ids),
+    }
+    if local_items is not None:
+        local = dict(local_items)
+        plan["missing_local"] = sorted(p for p in github if p not in local)
+        plan["changed_local"] = sorted(p for p in github if p in local and local[p] != github[p])
+        plan["only_local"]    = sorted(p for p in local if p not in github)
+    return plan
+
+
+def report(plan):
+    labels = {
+        "new_in_db": "su GitHub, non in DB",
+        "changed_in_db": "cambiati su GitHub rispetto al DB",
+        "missing_on_github": "in DB, non su GitHub",
+        "pending_outbox": "già in coda per GitHub (github_outbox)",
+        "adopted": "in DB senza file di origine, abbinati a un file di GitHub",
+        "unnamed_in_db": "in DB senza file di origine né file uguale (pubblicati solo con --name-unmatched)",
+        "missing_local": "su GitHub, non in locale",
+        "changed_local": "diversi in locale",
+        "only_local": "solo in locale (non toccati)",
+    }
+    for key, label in labels.items():
+        if key in plan:
+            print(f"{len(plan[key]):7d}  {label}")
+            for path in sorted(plan[key])[:5]:
+                print(f"           {path}")
+
+
+# ----------------------------------------------------------------
+# 2) Riparazioni
+# ----------------------------------------------------------------
+def _update_changed(session, rows_by_path, parsed):
+    """Aggiorna le righe cambiate su GitHub, con i contatori corretti."""
+    deltas  = Counter()
+    rollups = Counter()
+    terms   = Counter()
+    changed = []
+    for row in parsed:
+        resp = rows_by_path[row["source_path"]]
+        changed.append(resp)
+        deltas.subtract(response_deltas(resp))
+        rollups.subtract(rollup_deltas(resp))
+        terms.subtract(term_deltas(resp))
+        for key, value in row.items():
+            setattr(resp, key, value)
+        deltas.update(response_deltas(row))
+        rollups.update(rollup_deltas(row))
+        terms.update(term_deltas(row))
+    session.flush()
+    bump_counters(session.connection(), Counter({k: n for k, n in deltas.items() if n}))
+    bump_rollups(session.connection(), Counter({k: n for k, n in rollups.items() if n}))
+    bump_terms(session.connection(), Counter({k: n for k, n in terms.items() if n}))
+    index_terms(session.connection(), [(resp.id, resp) for resp in changed])
+    session.commit()
+
+
+def _enqueue_missing(session, paths):
+    """Rimette in outbox le risposte presenti in DB ma assenti su GitHub."""
+    rows = session.query(Response).filter(Response.source_path.in_(paths)).all()
+    outbox = {o.path: o for o in session.query(GithubOutbox).filter(GithubOutbox.path.in_(paths))}
+    for row in rows:
+        item = outbox.get(row.source_path)
+        if item is None:
+            payload = payload_for(row)
+            session.add(GithubOutbox(path=row.source_path, payload=payload))
+            row.source_sha = git_blob_sha(payload)
+        elif item.sent_at is not None:
+            # Inviato ma poi sparito da GitHub: si rimanda
+            item.sent_at = None
+    session.commit()
+
+
+def _name_unnamed(session, ids):
+    """Dà un path responses/[<event>/]<ts>-<uuid>.json alle righe legacy e le mette in outbox."""
+    for row in session.query(Response).filter(Response.id.in_(ids)):
+        ts = (row.timestamp or datetime.utcnow()).strftime("%Y-%m-%dT%H-%M-%SZ")
+        row.source_path = f"{events.folder(row.event)}/{ts}-{uuid4()}.json"
+        payload = payload_for(row)
+        row.source_sha = git_blob_sha(payload)
+        session.add(GithubOutbox(path=row.source_path, payload=payload))
+    session.commit()
+
+
+def fetch_blobs(source, github, paths, workers=16, blobs=None):
+    """Contenuti dei file `paths` (quelli già in `blobs` non si riscaricano)."""
+    blobs = dict(blobs or {})
+    todo = sorted(set(paths) - set(blobs))
+    for path, _, raw in fetch_all(source, ((p, github[p]) for p in todo), workers):
+        blobs[path] = raw
+    return blobs
+
+
+def match_unnamed(plan, session, source, github_items, workers=16):
+    """Abbina le righe senza file di origine ai file nuovi di GitHub e aggiorna il piano.
+
+    Prima per blob sha del payload ricostruito (nessun download), poi per
+    contenuto sui file scaricati. plan["adopted"] = {path: (id, sha)};
+    ritorna i contenuti scaricati, da riusare in apply().
+    """
+    github = dict(github_items)
+    adopted = {}
+    by_sha = {}
+    for path in plan["new_in_db"]:
+        by_sha.setdefault(github[path], []).append(path)
+    for row in session.query(Response).filter(Response.id.in_(plan["unnamed_in_db"])).order_by(Response.id):
+        paths = by_sha.get(git_blob_sha(payload_for(row)))
+        if paths:
+            path = paths.pop(0)
+            adopted[path] = (row.id, github[path])
+
+    taken = {rid for rid, _ in adopted.values()}
+    remaining = [rid for rid in plan["unnamed_in_db"] if rid not in taken]
+    candidates = [p for p in plan["new_in_db"] if p not in adopted]
+    blobs = {}
+    if remaining and candidates:
+        blobs = fetch_blobs(source, github, candidates, workers)
+        unnamed = unnamed_by_content(session, remaining)
+        for path in candidates:
+            row = parse_record(path, github[path], blobs[path])
+            rid = take_match(unnamed, row) if row is not None else None
+            if rid is not None:
+                adopted[path] = (rid, github[path])
+
+    taken = {rid for rid, _ in adopted.values()}
+    plan["adopted"] = adopted
+    plan["new_in_db"] = [p for p in plan["new_in_db"] if p not in adopted]
+    plan["unnamed_in_db"] = [rid for rid in plan["unnamed_in_db"] if rid not in taken]
+    return blobs
+
+
+def apply(plan, source, github_items, session, local_dir=None, workers=16, name_unmatched=False, blobs=None):
+    github = dict(github_items)
+    if plan.get("adopted"):
+        adopt_rows(session, [(rid, path, sha) for path, (rid, sha) in sorted(plan["adopted"].items())])
+
+    to_fetch = (set(plan["new_in_db"]) | set(plan["changed_in_db"])
+                | set(plan.get("missing_local", [])) | set(plan.get("changed_local", [])))
+    blobs = fetch_blobs(source, github, to_fetch, workers, blobs)
+
+    new_rows, rejected = [], []
+    for p in plan["new_in_db"]:
+        row = parse_record(p, github[p], blobs[p])
+        if row is None:
+            rejected.append((p, github[p]))
+        else:
+            new_rows.append(row)
+    if new_rows:
+        insert_batch(session, new_rows)
+    record_skipped(session, rejected)
+
+    changed = [parse_record(p, github[p], blobs[p]) for p in plan["changed_in_db"]]
+    changed = [r for r in changed if r is not None]
+    if changed:
+        rows_by_path = {
+            r.source_path: r for r in
+            session.query(Response).filter(Response.source_path.in_([c["source_path"] for c in changed]))
+        }
+        _update_changed(session, rows_by_path, changed)
+
+    if plan["missing_on_github"]:
+        _enqueue_missing(session, plan["missing_on_github"])
+    if plan["unnamed_in_db"] and name_unmatched:
+        _name_unnamed(session, plan["unnamed_in_db"])
+
+    if local_dir:
+        for path in plan.get("missing_local", []) + plan.get("changed_local", []):
+            # responses/<event>/<file> → <local_dir>/<event>/<file>
+            target = os.path.join(local_dir, *path.split("/")[1:])
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as f:
+                f.write(blobs[path])
+
+
+def reconcile(source, local_dir=None, dry_run=False, workers=16, session_factory=SessionLocal,
+              name_unmatched=False):
+    init_db()
+    session = session_factory()
+    try:
+        github_items = source.list()
+        db_manifest  = manifest(session)
+        unnamed = [rid for (rid,) in session.query(Response.id).filter(Response.source_path.is_(None))]
+        pending = [p for (p,) in session.query(GithubOutbox.path).filter(GithubOutbox.sent_at.is_(None))]
+        local_items = LocalSource(local_dir).list() if local_dir else None
+
+        p = plan(github_items, db_manifest, unnamed, pending, local_items, skipped_files(session))
+        blobs = match_unnamed(p, session, source, github_items, workers) if unnamed else None
+        report(p)
+        if dry_run:
+            print("Dry run: nessuna modifica.")
+        else:
+            apply(p, source, github_items, session, local_dir, workers, name_unmatched, blobs)
+            print("Riallineamento completato.")
+        return p
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Riallinea GitHub, SQLite e cartella locale")
+    parser.add_argument("--github", metavar="OWNER/REPO", required=True, help="token in GITHUB_TOKEN")
+    parser.add_argument("--local", metavar="DIR", help="cartella locale da allineare a GitHub")
+    parser.add_argument("--dry-run", action="store_true", help="mostra il piano senza modificare nulla")
+    parser.add_argument("--name-unmatched", action="store_true",
+                        help="dà un file e pubblica su GitHub le righe senza file di origine non abbinate")
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    from github import Github
+    source = GithubSource(Github(os.environ["GITHUB_TOKEN"]).get_repo(args.github))
+    reconcile(source, local_dir=args.local, dry_run=args.dry_run, workers=args.workers,
+              name_unmatched=args.name_unmatched)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print("Errore durante il riallineamento:", e, file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,139 @@
+# resources.py
+# Risorse condivise per processo (st.cache_resource), create solo al primo uso.
+import os
+import sys
+from datetime import datetime
+
+import streamlit as st
+
+import events
+import metrics
+from db import init_db, SessionLocal, Response
+from events import DEFAULT_EVENT
+
+# Oggetti per evento (feed live, cubo) tenuti in memoria al massimo per tanti eventi
+MAX_EVENTS = int(os.environ.get("MAX_EVENTS", "16"))
+
+
+@st.cache_resource
+def init_db_once():
+    # create_all + upgrade dello schema una volta per processo, non a ogni rerun
+    init_db()
+    return True
+
+
+@st.cache_data(ttl=60)
+def known_events():
+    # Eventi ammessi in ?event=: configurati (EVENTS) + con risposte in DB, riletti ogni minuto
+    with SessionLocal() as session:
+        return events.known(e for (e,) in session.query(Response.event).distinct())
+
+
+@st.cache_resource
+def get_repo():
+    # PyGithub e la connessione al repo solo quando serve davvero (invio/outbox)
+    from github import Github
+    return Github(st.secrets["github_token"]).get_repo(st.secrets["repo_name"])
+
+
+@st.cache_resource
+def get_github_writer():
+    # Worker unico per processo: svuota la coda github_outbox in background,
+    # un commit per finestra di raccolta invece di uno per risposta
+    from github_writer import BatchGithubWriter
+    return BatchGithubWriter(get_repo(), SessionLocal).start()
+
+
+# Ultimo errore del worker GitHub nel processo (None se l'ultima sveglia è andata)
+_github_writer_error = None
+
+
+def github_writer_error():
+    """Ultimo errore nell'avviare il worker GitHub, per la diagnostica dell'admin."""
+    return _github_writer_error
+
+
+def wake_github_writer():
+    """Sveglia il worker GitHub (creato al primo uso nel processo).
+
+    Se GitHub non è raggiungibile le risposte restano in github_outbox e
+    partono alla prossima sveglia; l'errore va su stderr (una volta finché
+    non si risolve) e nel contatore github.writer_errors.
+    """
+    global _github_writer_error
+    try:
+        get_github_writer().wake()
+    except Exception as e:
+        metrics.incr("github.writer_errors")
+        if _github_writer_error is None:
+            print(f"[!] Worker GitHub non disponibile, le risposte restano in outbox: {e!r}", file=sys.stderr)
+        _github_writer_error = f"{datetime.utcnow():%d/%m/%Y %H:%M} UTC — {e!r}"
+    else:
+        _github_writer_error = None
+
+
+@st.cache_resource
+def get_db_writer():
+    # Scrittore SQLite unico per processo; oggi lo usa solo il replayer dello spool
+    from db_writer import DBWriter
+    return DBWriter(SessionLocal).start()
+
+
+@st.cache_resource(max_entries=MAX_EVENTS)
+def get_live_feed(event=DEFAULT_EVENT):
+    # Ultimo id visto + contatori dell'evento, condivisi da tutte le sue dashboard (modalità live)
+    from live import LiveFeed
+    return LiveFeed(SessionLocal, event=event)
+
+
+@st.cache_resource(max_entries=MAX_EVENTS)
+def get_response_cube(event=DEFAULT_EVENT):
+    # Cubo colonnare dell'evento per i filtri incrociati della dashboard, aggiornato per delta
+    from cube import ResponseCube
+    return ResponseCube(SessionLocal, event=event)
+
+
+@st.cache_resource
+def get_figure_cache():
+    # Figure Plotly pronte per (domanda, conteggi, tema), condivise tra le sessioni
+    from figure_cache import FigureCache
+    return FigureCache(int(os.environ.get("FIGURE_CACHE_SIZE", "256")))
+
+
+@st.cache_resource
+def get_wordcloud_cache():
+    # PNG della word cloud in memoria + su disco (sopravvive ai riavvii)
+    from wordcloud_cache import WordCloudCache
+    return WordCloudCache(os.environ.get("WORDCLOUD_CACHE_DIR", ".cache/wordcloud"))
+
+
+@st.cache_resource
+def get_metrics_dumper():
+    # Dump periodico delle metriche (METRICS=1 + METRICS_DUMP=file.prom|file.json)
+    import metrics
+    path = os.environ.get("METRICS_DUMP")
+    if not metrics.ENABLED or not path:
+        return None
+    return metrics.Dumper(path, float(os.environ.get("METRICS_DUMP_INTERVAL", "10"))).start()
+
+
+@st.cache_resource
+def get_asset_store():
+    # QR e loghi come data URI, calcolati una volta per processo
+    from asset_store import AssetStore
+    return AssetStore(os.environ.get("ASSET_CACHE_DIR", ".cache/assets"))
+
+
+@st.cache_resource
+def get_spool():
+    # Spool su disco: ogni risposta accettata è qui prima che in SQLite/GitHub
+    from spool import Spool
+    return Spool(os.environ.get("SPOOL_DIR", ".spool"))
+
+
+@st.cache_resource
+def get_spool_replayer():
+    # Riversa lo spool in SQLite (+ outbox GitHub) in background
+    from spool import SpoolReplayer
+    return SpoolReplayer(get_spool(), get_db_writer(), SessionLocal,
+                         on_batch=wake_github_writer).start()
@@ -0,0 +1,114 @@
+# schema.py
+# Schema dichiarativo del questionario: un solo elenco di sezioni e domande
+# da cui partono il form (survey.py), la dashboard (admin.py) e l'aggregazione.
+# Aggiungere una domanda = aggiungerla qui (+ colonna in db.Response).
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+YESNO       = "yesno"        # radio Sì/No → donut
+MULTISELECT = "multiselect"  # lista di opzioni → word cloud
+CATEGORICAL = "categorical"  # radio con più opzioni → bar chart
+FREETEXT    = "freetext"     # testo libero → termini normalizzati → word cloud
+
+YES_NO_OPTIONS = ("Sì", "No")
+
+
+@dataclass(frozen=True)
+class Question:
+    key: str
+    kind: str
+    label: str                          # testo nel form
+    options: Tuple[str, ...]
+    chart_label: Optional[str] = None   # testo in dashboard, se diverso
+    max_selections: Optional[int] = None
+    max_chars: Optional[int] = None     # solo FREETEXT
+    phrases: Tuple[str, ...] = ()       # solo FREETEXT: espressioni tenute come un termine
+
+    @property
+    def title(self):
+        return self.chart_label or self.label
+
+
+@dataclass(frozen=True)
+class Section:
+    title: str
+    questions: Tuple[Question, ...]
+    chart_title: Optional[str] = None
+
+    @property
+    def dashboard_title(self):
+        return self.chart_title or self.title
+
+
+SECTIONS = (
+    Section(
+        title="01. Adeguamento ad EU AML Package",
+        questions=(
+            Question("gap_analysis", YESNO,
+                     "1. È stata già avviata una gap analysis sull'EU AML Package?",
+                     YES_NO_OPTIONS),
+            Question("board_inform", YESNO,
+                     "2. Il Consiglio di Amministrazione è stato già informato dell’avvio dell’EU AML Package e delle imminenti novità normative in materia?",
+                     YES_NO_OPTIONS),
+            Question("budget", YESNO,
+                     "3. È stato già stanziato del budget dedicato alle attività di adeguamento all’EU AML Package?",
+                     YES_NO_OPTIONS),
+            Question("adeguamento_specifico", YESNO,
+                     "4. Avete già avviato attività di adeguamento su requisiti specifici definiti dall’EU AML Package?",
+                     YES_NO_OPTIONS),
+        ),
+    ),
+    Section(
+        title="02. Principali impatti attesi dall'EU AML Package",
+        chart_title="02. Principali impatti attesi da EU AML Package",
+        questions=(
+            Question("impacts", MULTISELECT,
+                     "1. Quali sono le principali preoccupazioni ed impatti attesi dal nuovo quadro normativo (selezionare fino a 3 opzioni)?",
+                     (
+                         "Supervisione diretta", "Tempistiche di adeguamento", "Complessità del quadro normativo",
+                         "Implementazioni informatiche", "AML Governance", "Risk assessment", "Data model",
+                         "Know your customer", "Transaction monitoring", "Targeted financial sanctions",
+                         "Paesi terzi ad alto rischio", "Requisiti sulla titolarità effettiva",
+                         "Protezione e condivisione dei dati", "Outsourcing", "Misure amministrative e sanzioni",
+                         "Nessun impatto identificato al momento",
+                     ),
+                     chart_label="1. Quali sono le principali preoccupazioni ed impatti attesi dal nuovo quadro normativo? (selezionare fino a 3 opzioni)",
+                     max_selections=3),
+        ),
+    ),
+    Section(
+        title="03. Nuova governance AML",
+        questions=(
+            Question("bm_yes_no", YESNO,
+                     "1. Si è già provveduto a nominare l’AML Board Member?",
+                     YES_NO_OPTIONS),
+            Question("bm_nominee", CATEGORICAL,
+                     "2. Quale soggetto è stato nominato (o si prevede di nominare) come AML Board Member?",
+                     (
+                         "Amministratore Delegato",
+                         "Altro membro esecutivo del Consiglio di Amministrazione",
+                         "Membro non esecutivo del Consiglio di Amministrazione (che diventa esecutivo a seguito della nomina)",
+                         "Non ancora definito",
+                     ),
+                     chart_label="2. Quale soggetto è stato nominato come AML Board Member?"),
+            Question("bm_notes", FREETEXT,
+                     "3. Note o commenti sulla nuova governance AML (facoltativo)",
+                     (),
+                     chart_label="3. Temi ricorrenti nelle note sulla governance AML",
+                     max_chars=1000,
+                     phrases=(
+                         "aml board member", "board member", "consiglio di amministrazione",
+                         "amministratore delegato", "collegio sindacale", "funzione antiriciclaggio",
+                         "titolare effettivo", "titolarità effettiva",
+                     )),
+        ),
+    ),
+)
+
+QUESTIONS     = tuple(q for section in SECTIONS for q in section.questions)
+QUESTION_KEYS = [q.key for q in QUESTIONS]
+BY_KEY        = {q.key: q for q in QUESTIONS}
+
+
+def keys_of_kind(*kinds):
+    return [q.key for q in QUESTIONS if q.kind in kinds]
@@ -0,0 +1,63 @@
+# server.py
+# Stessa app di streamlit_app.py servita come ASGI (st.App), più una route
+# di export in streaming: il file parte subito e passa al client blocco per
+# blocco, senza mai tenere in memoria tutte le righe né il file intero.
+#
+#   streamlit run server.py
+#   curl -H "Authorization: Bearer ..." -o risposte.parquet "http://localhost:8501/export/parquet"
+#   curl -H "Authorization: Bearer ..." -o risposte.csv "http://localhost:8501/export/csv?event=<id>"   # un solo evento
+#
+# La route risponde solo se in secrets.toml c'è `export_token`. Il token va
+# nell'header (Authorization: Bearer o X-Export-Token), mai nell'URL; i
+# pulsanti dell'admin usano link firmati a scadenza (export.signed_query).
+import hmac
+import os
+
+import streamlit as st
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+import events
+from db import init_db
+from export import MIMETYPES, check_signature, iter_db, stream
+
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", "5000"))
+
+
+def export_token():
+    try:
+        return st.secrets.get("export_token")
+    except FileNotFoundError:
+        return None
+
+
+def authorized(request, token, fmt, event):
+    """Token nell'header oppure link firmato e non scaduto."""
+    auth = request.headers.get("authorization", "")
+    given = auth[7:] if auth.lower().startswith("bearer ") else request.headers.get("x-export-token", "")
+    if given:
+        return hmac.compare_digest(given, token)
+    params = request.query_params
+    return check_signature(token, fmt, event, params.get("exp"), params.get("sig"))
+
+
+async def export_responses(request):
+    token = export_token()
+    fmt = request.path_params["fmt"]
+    event = request.query_params.get("event")
+    if not token or not authorized(request, token, fmt, event):
+        return PlainTextResponse("Non autorizzato", status_code=403)
+    if fmt not in MIMETYPES:
+        return PlainTextResponse(f"Formato non supportato: {fmt}", status_code=404)
+    if event is not None and not events.is_valid(event):
+        return PlainTextResponse(f"Evento non valido: {event}", status_code=400)
+    # Generatore sincrono: Starlette lo consuma in un thread del pool
+    return StreamingResponse(
+        stream(iter_db(EXPORT_CHUNK_SIZE, event=event), fmt),
+        media_type=MIMETYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="risposte.{fmt}"'},
+    )
+
+
+init_db()
+app = st.App("streamlit_app.py", routes=[Route("/export/{fmt}", export_responses)])
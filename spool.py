@@ -0,0 +1,297 @@
+# spool.py
+# Spool locale append-only (JSONL a segmenti): ogni risposta accettata finisce
+# qui per prima, su disco e con fsync, prima di SQLite e GitHub.
+# SpoolReplayer la porta poi in SQLite (+ outbox GitHub) in modo idempotente,
+# usando come chiave il nome responses/<ts>-<uuid>.json.
+# Le righe che non si riescono a salvare finiscono in dead-letter.jsonl, con
+# l'errore: non bloccano quelle che vengono dopo.
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import wait
+from datetime import datetime
+
+from sqlalchemy.exc import OperationalError
+
+import events
+import metrics
+from db import BUSY_TIMEOUT, SessionLocal, Response, GithubOutbox, git_blob_sha
+from schema import QUESTION_KEYS as FIELDS
+
+# Errori per cui si riprova tutto più tardi, senza far avanzare il checkpoint:
+# DB occupato o irraggiungibile, commit non arrivato entro write_timeout
+TRANSIENT = (OperationalError, TimeoutError)
+
+
+class Spool:
+    """Segmenti segment-<n>.jsonl in `directory`, una riga JSON per risposta.
+
+    append() scrive la riga e aspetta l'fsync. Gli fsync sono raggruppati:
+    un thread li esegue ogni `fsync_interval` secondi coprendo tutte le righe
+    scritte nel frattempo. Oltre `max_segment_bytes` si apre un nuovo segmento.
+    """
+
+    def __init__(self, directory, max_segment_bytes=16 * 1024 * 1024, fsync_interval=0.005):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.fsync_interval = fsync_interval
+        os.makedirs(directory, exist_ok=True)
+        self._cond = threading.Condition()
+        self._written = 0   # righe scritte (numero di sequenza)
+        self._synced  = 0   # righe già su disco
+        self.appended = threading.Event()
+        segments = self.segments()
+        self._segment = segments[-1] if segments else 1
+        self._file = open(self.segment_path(self._segment), "ab")
+        self._flusher = threading.Thread(target=self._flush_loop, name="spool-fsync", daemon=True)
+        self._flusher.start()
+
+    def segment_path(self, n):
+        return os.path.join(self.directory, f"segment-{n:06d}.jsonl")
+
+    def segments(self):
+        return sorted(
+            int(name[8:14]) for name in os.listdir(self.directory)
+            if name.startswith("segment-") and name.endswith(".jsonl")
+        )
+
+    @property
+    def current_segment(self):
+        return self._segment
+
+    def append(self, entry, timeout=10):
+        line = json.dumps(entry, ensure_ascii=False).encode("utf-8") + b"\n"
+        with self._cond:
+            if self._file.tell() + len(line) > self.max_segment_bytes and self._file.tell() > 0:
+                self._rotate()
+            self._file.write(line)
+            self._written += 1
+            seq = self._written
+            self._cond.notify_all()
+            if not self._cond.wait_for(lambda: self._synced >= seq, timeout):
+                raise TimeoutError("fsync dello spool non completato")
+        self.appended.set()
+
+    def _rotate(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._synced = self._written
+        self._segment += 1
+        self._file = open(self.segment_path(self._segment), "ab")
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._written > self._synced)
+            # Finestra breve: le append concorrenti finiscono nello stesso fsync
+            time.sleep(self.fsync_interval)
+            with self._cond:
+                target = self._written
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._synced = target
+                self._cond.notify_all()
+
+
+def response_from_entry(entry):
+    """Response ORM da una riga dello spool (il payload è il JSON inviato a GitHub)."""
+    record = json.loads(entry["payload"])
+    return Response(
+        event=events.from_path(entry["path"]),
+        timestamp=datetime.fromisoformat(entry["ts"]),
+        source_path=entry["path"],
+        source_sha=git_blob_sha(entry["payload"]),
+        **{key: record.get(key) for key in FIELDS},
+    )
+
+
+class SpoolReplayer:
+    """Porta le righe dello spool in SQLite (Response + github_outbox).
+
+    Il punto raggiunto (segmento, offset) è salvato in checkpoint.json; le
+    righe già presenti in DB (stesso source_path) vengono saltate, quindi
+    rileggere un tratto dopo un crash non crea doppioni. I segmenti chiusi
+    e già riversati vengono cancellati.
+
+    Se un blocco fallisce si riprova una riga alla volta: le righe rotte
+    (malformate, in conflitto) vanno nel file dead-letter, mentre un DB occupato
+    o un commit non arrivato entro `write_timeout` fanno riprovare tutto più tardi.
+    `write_timeout` copre più attese sul lock (busy_timeout) del DBWriter: il
+    gruppo e poi le singole richieste.
+    """
+
+    def __init__(self, spool, db_writer, session_factory=SessionLocal,
+                 batch_size=500, interval=1.0, on_batch=None, write_timeout=4 * BUSY_TIMEOUT):
+        self.spool = spool
+        self.db_writer = db_writer
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.interval = interval
+        self.on_batch = on_batch
+        self.checkpoint_path = os.path.join(spool.directory, "checkpoint.json")
+        self.dead_letter_path = os.path.join(spool.directory, "dead-letter.jsonl")
+        self.write_timeout = write_timeout
+        self.last_error = None
+        self._inflight = None   # ultimo commit chiesto al DBWriter
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                cp = json.load(f)
+            return cp["segment"], cp["offset"]
+        except FileNotFoundError:
+            segments = self.spool.segments()
+            return (segments[0] if segments else 1), 0
+
+    def _save_checkpoint(self, segment, offset):
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"segment": segment, "offset": offset}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.checkpoint_path)
+
+    def _read_batch(self, segment, offset):
+        """Righe complete da (segment, offset); ritorna (entries, nuovo offset)."""
+        entries = []
+        path = self.spool.segment_path(segment)
+        if not os.path.exists(path):
+            return entries, offset
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while len(entries) < self.batch_size:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    # Riga incompleta (scrittura in corso o interrotta): si riprende da qui
+                    break
+                offset += len(line)
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    # Riga troncata o corrotta: la si conserva, non la si riprova
+                    self._dead_letter({"raw": line.decode("utf-8", "replace")}, e)
+        return entries, offset
+
+    @staticmethod
+    def _objects(entry):
+        return [response_from_entry(entry), GithubOutbox(path=entry["path"], payload=entry["payload"])]
+
+    def _dead_letter(self, entry, error):
+        """Mette da parte una riga che non si riesce a salvare, con l'errore."""
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"entry": entry, "error": repr(error), "at": datetime.utcnow().isoformat()},
+                               ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        metrics.incr("spool.dead_letter")
+        path = entry.get("path") if isinstance(entry, dict) else None
+        print(f"[!] Spool: riga {path} spostata in {self.dead_letter_path}: {error!r}", file=sys.stderr)
+
+    def _commit(self, objects):
+        self._inflight = self.db_writer.submit(*objects)
+        return self._inflight.result(self.write_timeout)
+
+    def _write(self, entries):
+        if self._inflight is not None and not self._inflight.done():
+            # Un commit scaduto può essere ancora in coda: rileggere prima che
+            # finisca riscriverebbe le stesse righe (e le manderebbe nel dead-letter)
+            wait([self._inflight], self.write_timeout)
+            if not self._inflight.done():
+                raise TimeoutError("commit precedente dello spool ancora in corso")
+        session = self.session_factory()
+        try:
+            paths = [e.get("path") for e in entries if isinstance(e, dict)]
+            known = {p for (p,) in session.query(Response.source_path).filter(Response.source_path.in_(paths))}
+        finally:
+            session.close()
+        todo, objects = [], []
+        for entry in entries:
+            try:
+                if entry["path"] in known:
+                    continue
+                new = self._objects(entry)
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                # Riga malformata: non si salverà mai, inutile riprovarla
+                self._dead_letter(entry, e)
+                continue
+            known.add(entry["path"])
+            todo.append(entry)
+            objects.extend(new)
+        if not todo:
+            return 0
+        try:
+            self._commit(objects)
+            return len(todo)
+        except TRANSIENT:
+            raise
+        except Exception as e:
+            metrics.incr("spool.batch_failures")
+            print(f"[!] Spool: blocco di {len(todo)} righe fallito ({e!r}), si riprova una alla volta",
+                  file=sys.stderr)
+
+        written = 0
+        for entry in todo:
+            try:
+                # Oggetti nuovi: quelli del blocco fallito appartenevano alla transazione annullata
+                self._commit(self._objects(entry))
+                written += 1
+            except TRANSIENT:
+                # DB occupato: il checkpoint non avanza, le righe già scritte si salteranno
+                raise
+            except Exception as e:
+                self._dead_letter(entry, e)
+        return written
+
+    def replay_once(self):
+        """Riversa tutto ciò che è nello spool; ritorna le risposte nuove in DB."""
+        with self._lock:
+            segment, offset = self._load_checkpoint()
+            total = 0
+            while True:
+                entries, new_offset = self._read_batch(segment, offset)
+                if entries:
+                    total += self._write(entries)
+                    self._save_checkpoint(segment, new_offset)
+                    offset = new_offset
+                    if self.on_batch:
+                        self.on_batch()
+                    continue
+                if segment < self.spool.current_segment:
+                    # Segmento chiuso e riversato: si passa al successivo e lo si elimina
+                    self._save_checkpoint(segment + 1, 0)
+                    try:
+                        os.remove(self.spool.segment_path(segment))
+                    except FileNotFoundError:
+                        pass
+                    segment, offset = segment + 1, 0
+                    continue
+                return total
+
+    def _run(self):
+        while True:
+            self.spool.appended.wait(self.interval)
+            self.spool.appended.clear()
+            try:
+                self.replay_once()
+                if self.last_error is not None:
+                    print("Spool: riversamento ripreso", file=sys.stderr)
+                    self.last_error = None
+            except Exception as e:
+                # DB occupato o non raggiungibile: lo spool resta, si riprova.
+                # Si registra ogni errore, si logga solo quando cambia
+                metrics.incr("spool.replay_errors")
+                if repr(e) != self.last_error:
+                    print(f"[!] Spool: riversamento fallito, si riprova: {e!r}", file=sys.stderr)
+                    self.last_error = repr(e)
+                time.sleep(self.interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="spool-replayer", daemon=True)
+            self._thread.start()
+        return self
@@ -0,0 +1,84 @@
+# survey.py
+import json
+from uuid import uuid4
+from datetime import datetime
+
+import streamlit as st
+
+import events
+from resources import get_spool, get_spool_replayer
+from schema import SECTIONS, QUESTIONS, QUESTION_KEYS, MULTISELECT, FREETEXT
+
+
+# ----------------------------------------------------------------
+# Survey Page (risposte sotto, non al lato)
+# ----------------------------------------------------------------
+def _question_input(q):
+    if q.kind == MULTISELECT:
+        return st.multiselect(
+            label=f"**{q.label}**",
+            options=list(q.options),
+            max_selections=q.max_selections,
+            key=q.key
+        )
+    if q.kind == FREETEXT:
+        return st.text_area(
+            label=f"**{q.label}**",
+            max_chars=q.max_chars,
+            key=q.key
+        )
+    st.write(f"**{q.label}**")
+    return st.radio(
+        label="",
+        options=list(q.options),
+        key=q.key,
+        horizontal=False,
+        label_visibility="collapsed",
+        index=None
+    )
+
+
+def render(event=events.DEFAULT_EVENT):
+    st.title("EU AML Package")
+
+    st.markdown("<div class='form-container'>", unsafe_allow_html=True)
+    with st.form("survey"):
+        answers = {}
+        for i, section in enumerate(SECTIONS, start=1):
+            # Step indicator
+            st.progress(i / len(SECTIONS))
+
+            st.markdown("<div class='form-card'>", unsafe_allow_html=True)
+            st.write(f"## {section.title}")
+            for q in section.questions:
+                answers[q.key] = _question_input(q)
+            st.markdown("</div>", unsafe_allow_html=True)
+
+        # Submit
+        submit = st.form_submit_button("Invia")
+
+    if submit:
+        st.info("Attendere…")
+        record = {key: answers[key] for key in QUESTION_KEYS}
+        for q in QUESTIONS:
+            if q.kind == FREETEXT:
+                # Testo salvato com'è, senza spazi ai bordi: la normalizzazione è dell'indice
+                record[q.key] = (record[q.key] or "").strip() or None
+        ts = datetime.utcnow().strftime("%Y-%m-%dT%H-%M-%SZ")
+        fname = f"{events.folder(event)}/{ts}-{uuid4()}.json"
+        payload = json.dumps(record, ensure_ascii=False, indent=2)
+
+        try:
+            # Prima sullo spool locale (fsync): SQLite e GitHub arrivano in background
+            get_spool().append({
+                "path": fname,
+                "ts": datetime.utcnow().isoformat(),
+                "payload": payload,
+            })
+            st.success("Risposte inviate e registrate")
+        except Exception as e:
+            st.error(f"Errore nel salvataggio della risposta: {e}")
+        else:
+            get_spool_replayer()
+
+    st.markdown("</div>", unsafe_allow_html=True)
@@ -0,0 +1,53 @@
+# tests/conftest.py
+# Un SQLite temporaneo per tutta la sessione: db.py sceglie il file all'import,
+# quindi la variabile va impostata prima di importare qualsiasi modulo del repo.
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["SQLITE_FILENAME"] = os.path.join(tempfile.mkdtemp(prefix="survey-tests-"), "test.db")
+
+from schema import QUESTION_KEYS  # noqa: E402
+
+START = datetime(2025, 5, 20, 9, 0)
+
+
+@pytest.fixture
+def session():
+    """DB vuoto (tabelle, indici e trigger ricreati) e una sessione aperta."""
+    from db import Base, SessionLocal, engine, init_db
+    Base.metadata.drop_all(engine)
+    init_db()
+    s = SessionLocal()
+    yield s
+    s.close()
+
+
+def record(i, **overrides):
+    """Una risposta valida e deterministica (dict con le chiavi dello schema)."""
+    r = {
+        "gap_analysis": "Sì" if i % 2 else "No",
+        "board_inform": "Sì" if i % 3 else "No",
+        "budget": "Sì" if i % 4 else "No",
+        "adeguamento_specifico": "No",
+        "impacts": [["AML Governance"], ["Data model", "Outsourcing"], []][i % 3],
+        "bm_yes_no": "Sì",
+        "bm_nominee": "Amministratore Delegato" if i % 2 else "Non ancora definito",
+    }
+    r.update(overrides)
+    return r
+
+
+def payload(r):
+    """Il JSON che il form scrive su GitHub."""
+    return json.dumps({key: r.get(key) for key in QUESTION_KEYS}, ensure_ascii=False, indent=2)
+
+
+def path_for(i, folder="responses"):
+    return f"{folder}/{(START + timedelta(minutes=i)):%Y-%m-%dT%H-%M-%SZ}-{i:08d}.json"
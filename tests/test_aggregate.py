@@ -0,0 +1,59 @@
+# tests/test_aggregate.py
+# Aggregazioni SQL in un solo round-trip, confrontate con un Counter calcolato
+# riga per riga sugli stessi record.
+from collections import Counter
+from datetime import datetime
+
+import pytest
+
+from conftest import record
+from db import MULTI_FIELDS, SINGLE_FIELDS, TOTAL_KEY, Response, aggregate_counts
+
+N = 40
+
+
+@pytest.fixture
+def rows(session):
+    records = [record(i) for i in range(N)]
+    session.add_all(Response(timestamp=datetime(2025, 5, 20), **r) for r in records)
+    # Un altro evento non deve mai entrare nei conteggi di quello di default
+    session.add_all(Response(timestamp=datetime(2025, 5, 20), event="altro", **record(i)) for i in range(5))
+    session.commit()
+    return records
+
+
+def expected(records, key, **filters):
+    counts = Counter()
+    for r in records:
+        if all(r[fkey] == value for fkey, value in filters.items()):
+            counts.update(r[key] if isinstance(r[key], list) else [r[key]] if r[key] else [])
+    return counts
+
+
+def test_matches_row_by_row_counter(session, rows):
+    counts = aggregate_counts(session, with_total=True)
+    for key in SINGLE_FIELDS + MULTI_FIELDS:
+        assert counts[key] == expected(rows, key), key
+    assert counts[TOTAL_KEY][""] == N
+
+
+@pytest.mark.parametrize("filters", [{"budget": "Sì"}, {"gap_analysis": "No", "board_inform": "Sì"}])
+def test_filters_apply_to_every_question(session, rows, filters):
+    counts = aggregate_counts(session, with_total=True, **filters)
+    for key in SINGLE_FIELDS + MULTI_FIELDS:
+        assert counts[key] == expected(rows, key, **filters), key
+    assert counts[TOTAL_KEY][""] == sum(all(r[k] == v for k, v in filters.items()) for r in rows)
+
+
+def test_other_event_is_partitioned(session, rows):
+    counts = aggregate_counts(session, keys=["impacts"], with_total=True, event="altro")
+    assert counts["impacts"] == expected(rows[:5], "impacts")
+    assert counts[TOTAL_KEY][""] == 5
+
+
+def test_unnormalized_multiselect_is_refused(session, rows, monkeypatch):
+    # Solo impacts ha una tabella normalizzata: un'altra multiselect non va
+    # contata con le opzioni di impacts
+    monkeypatch.setattr("db.MULTI_FIELDS", MULTI_FIELDS + ["altra_multi"])
+    with pytest.raises(ValueError):
+        aggregate_counts(session, keys=["altra_multi"])
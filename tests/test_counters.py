@@ -0,0 +1,115 @@
+# tests/test_counters.py
+# Contatori e rollup mantenuti nella transazione di chi scrive (INSERT ORM,
+# import a blocchi, UPDATE di reconcile): devono coincidere con il ricalcolo dalle righe.
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+
+from conftest import START, path_for, payload, record
+from db import (GRANULARITIES, TOTAL_KEY, OptionCount, OptionRollup, Response, load_counts, load_rollups,
+                rebuild_counters, rebuild_rollups)
+from fake_github import FakeRepo
+from migrate import GithubSource, LocalSource, migrate
+from reconcile import reconcile
+
+
+def counters(session):
+    session.expire_all()
+    return {(ev, q, o): n for ev, q, o, n in
+            session.query(OptionCount.event, OptionCount.question, OptionCount.option, OptionCount.count)
+            if n}
+
+
+def assert_consistent(session):
+    kept = counters(session)
+    rebuild_counters(session)
+    assert kept == counters(session)
+    return kept
+
+
+def add_orm(session, indices, event="default", **overrides):
+    session.add_all(Response(timestamp=START + timedelta(minutes=7 * i), event=event, **record(i, **overrides))
+                    for i in indices)
+    session.commit()
+
+
+def write_files(folder, indices):
+    os.makedirs(folder, exist_ok=True)
+    for i in indices:
+        with open(os.path.join(folder, os.path.basename(path_for(i))), "w", encoding="utf-8") as f:
+            f.write(payload(record(i)))
+
+
+def test_orm_inserts_keep_counters_in_step(session):
+    add_orm(session, range(10))
+    add_orm(session, range(4), event="altro")
+    kept = assert_consistent(session)
+    assert kept[("default", TOTAL_KEY, "")] == 10
+    assert kept[("altro", TOTAL_KEY, "")] == 4
+
+
+def test_batched_import_keeps_counters_in_step(session, tmp_path):
+    # Contenuto diverso dai file: non vengono abbinate come righe legacy
+    add_orm(session, range(3), adeguamento_specifico="Sì")
+    write_files(tmp_path / "responses", range(100, 130))
+    imported, skipped = migrate(LocalSource(str(tmp_path / "responses")), workers=2, batch_size=7)
+    assert (imported, skipped) == (30, 0)
+    assert assert_consistent(session)[("default", TOTAL_KEY, "")] == 33
+
+
+def test_reconcile_updates_keep_counters_in_step(session):
+    for i in range(4):
+        r = record(i)
+        session.add(Response(timestamp=datetime(2025, 5, 20), source_path=path_for(i), **r))
+    session.commit()
+    repo = FakeRepo()
+    for i in range(4):
+        repo.create_file(path_for(i), "risposta", payload(record(i, budget="No", impacts=["Outsourcing"])))
+    reconcile(GithubSource(repo), workers=2)
+    kept = assert_consistent(session)
+    assert kept[("default", "budget", "No")] == 4
+    assert kept[("default", "impacts", "Outsourcing")] == 4
+    assert ("default", "impacts", "AML Governance") not in kept
+
+
+# ----------------------------------------------------------------
+# Rollup per minuto/ora: stessa regola, più la finestra di load_rollups
+# ----------------------------------------------------------------
+def rollups(session):
+    session.expire_all()
+    return {(ev, g, b, q, o): n for ev, g, b, q, o, n in session.query(
+        OptionRollup.event, OptionRollup.granularity, OptionRollup.bucket,
+        OptionRollup.question, OptionRollup.option, OptionRollup.count) if n}
+
+
+def test_rollups_match_rebuild_after_inserts_and_updates(session):
+    add_orm(session, range(20))
+    for i in range(3):
+        session.add(Response(timestamp=START + timedelta(minutes=7 * i), source_path=path_for(i),
+                             **record(i, adeguamento_specifico="Sì")))
+    session.commit()
+    repo = FakeRepo()
+    for i in range(3):
+        repo.create_file(path_for(i), "risposta", payload(record(i, budget="No")))
+    reconcile(GithubSource(repo), workers=2)
+
+    kept = rollups(session)
+    rebuild_rollups(session)
+    assert kept == rollups(session)
+    # Ogni granularità somma ai contatori
+    for granularity in GRANULARITIES:
+        assert sum(n for (ev, g, _, q, _), n in kept.items() if g == granularity and q == TOTAL_KEY) == 23
+
+
+def test_load_rollups_window_plus_base_equals_counters(session):
+    add_orm(session, range(20))
+    counts = load_counts(session)
+    since = START + timedelta(hours=1)
+    base, rows = load_rollups(session, "minute", since=since)
+    assert all(bucket >= since for bucket, _, _, _ in rows)
+    # Base (prima della finestra) + finestra = contatori
+    total = {q: Counter(c) for q, c in base.items()}
+    for _, question, option, n in rows:
+        total[question][option] += n
+    assert {q: +c for q, c in total.items() if +c} == counts
+    assert base[TOTAL_KEY][""] == sum(START + timedelta(minutes=7 * i) < since for i in range(20))
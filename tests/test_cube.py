@@ -0,0 +1,119 @@
+# tests/test_cube.py
+# Cubo colonnare: filtri su codici e bitmask confrontati con il conteggio riga per riga
+# e con le aggregazioni SQL; refresh per delta e concorrente.
+import threading
+from collections import Counter
+from datetime import datetime
+
+import pytest
+
+from aggregation import aggregate
+from conftest import record
+from cube import ResponseCube
+from db import Response, SessionLocal
+
+N = 60
+
+
+@pytest.fixture
+def rows(session):
+    records = [record(i) for i in range(N)]
+    session.add_all(Response(timestamp=datetime(2025, 5, 20), **r) for r in records)
+    session.add(Response(timestamp=datetime(2025, 5, 20), event="altro", **record(0)))
+    session.commit()
+    return records
+
+
+def expected(records, key, **filters):
+    """Conteggio di riferimento, riga per riga."""
+    def keep(r):
+        for fkey, values in filters.items():
+            values = [values] if isinstance(values, str) else values
+            got = r[fkey] if isinstance(r[fkey], list) else [r[fkey]]
+            if not set(values) & set(got):
+                return False
+        return True
+    counts = Counter()
+    for r in filter(keep, records):
+        counts.update(r[key] if isinstance(r[key], list) else [r[key]] if r[key] else [])
+    return counts
+
+
+@pytest.mark.parametrize("key, filters", [
+    ("gap_analysis", {}),
+    ("impacts", {}),
+    ("bm_nominee", {"budget": "Sì"}),
+    ("gap_analysis", {"impacts": "AML Governance"}),
+    ("budget", {"impacts": ["Data model", "AML Governance"]}),       # OR nella multiselect
+    ("impacts", {"gap_analysis": "Sì", "board_inform": "No"}),       # AND tra domande
+    ("board_inform", {"gap_analysis": ["Sì", "No"]}),                # OR nella stessa domanda
+    ("impacts", {"impacts": "Outsourcing", "budget": "No"}),
+])
+def test_counts_match_row_by_row(rows, key, filters):
+    cube = ResponseCube(SessionLocal)
+    cube.refresh()
+    assert cube.counts(key, **filters) == expected(rows, key, **filters)
+
+
+def test_aggregate_matches_sql(rows, session):
+    cube = ResponseCube(SessionLocal)
+    cube.refresh()
+    for filters in ({}, {"budget": "Sì"}, {"gap_analysis": "No", "bm_nominee": "Non ancora definito"}):
+        ours, sql = cube.aggregate(**filters), aggregate(session, **filters)
+        assert ours.total == sql.total
+        for key in ("gap_analysis", "impacts", "bm_nominee"):
+            assert ours[key].counts == sql[key].counts
+
+
+def test_only_event_rows(rows):
+    cube = ResponseCube(SessionLocal, event="altro")
+    assert cube.refresh() == 1
+    assert cube.counts("bm_yes_no") == Counter({"Sì": 1})
+
+
+def test_unknown_filter_value_matches_nothing(rows):
+    cube = ResponseCube(SessionLocal)
+    cube.refresh()
+    assert cube.counts("gap_analysis", budget="Forse") == Counter()
+    with pytest.raises(ValueError):
+        cube.mask(bm_notes="x")
+
+
+def test_values_outside_schema_are_kept(session):
+    session.add(Response(timestamp=datetime(2025, 5, 20), **record(0, bm_nominee="Vecchia opzione",
+                                                                  impacts=["Opzione ritirata"])))
+    session.commit()
+    cube = ResponseCube(SessionLocal)
+    cube.refresh()
+    assert cube.counts("bm_nominee") == Counter({"Vecchia opzione": 1})
+    assert cube.counts("gap_analysis", impacts="Opzione ritirata") == Counter({"No": 1})
+
+
+def test_refresh_appends_only_new_rows(rows, session):
+    cube = ResponseCube(SessionLocal, chunk_size=7)
+    assert cube.refresh() == N
+    assert cube.refresh() == 0
+    session.add_all(Response(timestamp=datetime(2025, 5, 21), **record(i)) for i in range(N, N + 5))
+    session.commit()
+    assert cube.refresh() == 5
+    assert len(cube) == N + 5
+    assert cube.counts("impacts") == expected([record(i) for i in range(N + 5)], "impacts")
+
+
+def test_concurrent_refresh_adds_rows_once(rows):
+    cube = ResponseCube(SessionLocal, chunk_size=5)
+    barrier = threading.Barrier(8)
+    added = []
+
+    def worker():
+        barrier.wait()
+        added.append(cube.refresh())
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sum(added) == N == len(cube)
+    assert len(set(cube._ids[:len(cube)].tolist())) == N
+    assert cube.counts("gap_analysis") == expected(rows, "gap_analysis")
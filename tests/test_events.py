@@ -0,0 +1,55 @@
+# tests/test_events.py
+# Eventi: id ammessi, path su GitHub ↔ evento e import che tiene separati
+# righe e contatori di ciascun evento.
+import os
+
+import events
+from conftest import path_for, payload, record
+from db import TOTAL_KEY, Response, load_counts
+from migrate import LocalSource, migrate
+
+
+def test_ids_are_validated():
+    assert events.is_valid("fiera-2026")
+    for bad in ["", "Fiera", "-x", "a/b", "../x", "a" * 65, None]:
+        assert not events.is_valid(bad)
+
+
+def test_known_events_are_configured_or_in_db(monkeypatch):
+    monkeypatch.setenv("EVENTS", "fiera-2026, Bad!, ,convegno")
+    assert events.configured() == {events.DEFAULT_EVENT, "fiera-2026", "convegno"}
+    known = events.known(["dal-db", "../x"])
+    assert known == {events.DEFAULT_EVENT, "fiera-2026", "convegno", "dal-db"}
+    monkeypatch.delenv("EVENTS")
+    assert events.known() == {events.DEFAULT_EVENT}
+
+
+def test_folder_and_path_round_trip():
+    assert events.folder(events.DEFAULT_EVENT) == "responses"
+    for event in [events.DEFAULT_EVENT, "fiera-2026"]:
+        assert events.from_path(f"{events.folder(event)}/2025-05-20T09-00-00Z-x.json") == event
+    # Sottocartelle non valide o annidate restano nel default
+    assert events.from_path("responses/Bad!/x.json") == events.DEFAULT_EVENT
+    assert events.from_path("responses/a/b/x.json") == events.DEFAULT_EVENT
+    assert events.url_params(events.DEFAULT_EVENT) == ""
+    assert events.url_params("fiera-2026") == "&event=fiera-2026"
+
+
+def test_import_partitions_rows_and_counters(session, tmp_path):
+    root = tmp_path / "responses"
+    os.makedirs(root / "fiera-2026")
+    os.makedirs(root / "Bad!")
+    for i in range(6):
+        sub = "fiera-2026" if i % 3 == 0 else ""
+        with open(root / sub / os.path.basename(path_for(i)), "w", encoding="utf-8") as f:
+            f.write(payload(record(i)))
+    # Cartella con un id non valido: ignorata dall'import
+    with open(root / "Bad!" / os.path.basename(path_for(9)), "w", encoding="utf-8") as f:
+        f.write(payload(record(9)))
+
+    assert migrate(LocalSource(str(root)), workers=2) == (6, 0)
+    rows = {r.source_path: r.event for r in session.query(Response)}
+    assert sorted(rows.values()).count("fiera-2026") == 2
+    assert all(event == events.from_path(path) for path, event in rows.items())
+    assert load_counts(session, "fiera-2026")[TOTAL_KEY][""] == 2
+    assert load_counts(session)[TOTAL_KEY][""] == 4
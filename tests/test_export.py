@@ -0,0 +1,147 @@
+# tests/test_export.py
+# Export a blocchi: stessi dati dal DB e dalla cartella JSON, un blocco alla
+# volta, e file CSV/Parquet in streaming identici a quelli scritti su disco.
+import csv
+import io
+import os
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from conftest import path_for, payload, record
+from db import Response
+from export import COLUMNS, export, iter_db, iter_json_dir, stream
+
+N = 25
+
+
+@pytest.fixture
+def rows(session):
+    session.add_all(Response(timestamp=datetime(2025, 5, 20), source_path=path_for(i), **record(i)) for i in range(N))
+    session.add(Response(timestamp=datetime(2025, 5, 20), event="altro", **record(0)))
+    session.commit()
+
+
+def test_iter_db_yields_bounded_chunks(rows):
+    chunks = list(iter_db(chunk_size=10))
+    assert [len(c) for c in chunks] == [10, 10, 6]
+    assert all(set(row) == set(COLUMNS) for c in chunks for row in c)
+    only = [row for c in iter_db(chunk_size=10, event="altro") for row in c]
+    assert len(only) == 1 and only[0]["event"] == "altro"
+
+
+def test_iter_json_dir_reads_event_subfolders(tmp_path):
+    os.makedirs(tmp_path / "altro")
+    for i in range(N):
+        sub = "altro" if i % 5 == 0 else ""
+        with open(tmp_path / sub / os.path.basename(path_for(i)), "w", encoding="utf-8") as f:
+            f.write(payload(record(i)))
+    (tmp_path / "rotto.json").write_text("{", encoding="utf-8")
+
+    chunks = list(iter_json_dir(str(tmp_path), chunk_size=7, workers=2))
+    found = [row for c in chunks for row in c]
+    assert all(len(c) <= 7 for c in chunks)
+    assert len(found) == N
+    assert sum(row["event"] == "altro" for row in found) == 5
+    assert all(row["timestamp"] is not None for row in found)
+
+
+def test_streamed_csv_matches_file(rows, tmp_path):
+    out = str(tmp_path / "risposte.csv")
+    assert export(iter_db(chunk_size=10), out) == N + 1
+    parts = list(stream(iter_db(chunk_size=10), "csv"))
+    # Header + un pezzo per blocco
+    assert len(parts) == 4
+    data = b"".join(parts)
+    with open(out, "rb") as f:
+        assert data == f.read()
+    read = list(csv.DictReader(io.StringIO(data.decode("utf-8"))))
+    assert len(read) == N + 1
+    assert read[1]["impacts"] == "Data model;Outsourcing"
+
+
+def test_streamed_parquet_has_one_row_group_per_chunk(rows):
+    data = b"".join(stream(iter_db(chunk_size=10), "parquet"))
+    parquet = pq.ParquetFile(pa.BufferReader(data))
+    assert parquet.num_row_groups == 3
+    table = parquet.read()
+    assert table.num_rows == N + 1
+    assert table.column_names == COLUMNS
+
+
+def test_stream_rejects_unknown_format():
+    with pytest.raises(ValueError):
+        stream(iter([]), "xlsx")
+
+
+# ----------------------------------------------------------------
+# Route /export di server.py: header o link firmato, mai il token nell'URL
+# ----------------------------------------------------------------
+TOKEN = "segreto"
+
+
+def request(fmt, query="", headers=()):
+    from starlette.requests import Request
+    return Request({
+        "type": "http", "method": "GET", "path": f"/export/{fmt}", "path_params": {"fmt": fmt},
+        "query_string": query.encode(), "headers": [(k.lower().encode(), v.encode()) for k, v in headers],
+    })
+
+
+def call(fmt, query="", headers=()):
+    import asyncio
+
+    import server
+
+    async def run():
+        response = await server.export_responses(request(fmt, query, headers))
+        body = b""
+        if hasattr(response, "body_iterator"):
+            async for part in response.body_iterator:
+                body += part
+        else:
+            body = response.body
+        return response.status_code, body
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def token(monkeypatch):
+    import server
+    monkeypatch.setattr(server, "export_token", lambda: TOKEN)
+    return TOKEN
+
+
+def test_signed_link_is_bound_to_format_event_and_expiry():
+    from urllib.parse import parse_qs
+    from export import check_signature, signed_query
+
+    q = {k: v[0] for k, v in parse_qs(signed_query(TOKEN, "csv", "altro")).items()}
+    assert check_signature(TOKEN, "csv", "altro", q["exp"], q["sig"])
+    assert not check_signature(TOKEN, "parquet", "altro", q["exp"], q["sig"])
+    assert not check_signature(TOKEN, "csv", None, q["exp"], q["sig"])
+    assert not check_signature("altro-token", "csv", "altro", q["exp"], q["sig"])
+    assert not check_signature(TOKEN, "csv", "altro", str(int(q["exp"]) + 1), q["sig"])
+    expired = {k: v[0] for k, v in parse_qs(signed_query(TOKEN, "csv", ttl=-1)).items()}
+    assert not check_signature(TOKEN, "csv", None, expired["exp"], expired["sig"])
+
+
+def test_route_accepts_header_or_signed_link(rows, token):
+    from export import signed_query
+
+    status, body = call("csv", headers=[("Authorization", f"Bearer {token}")])
+    assert status == 200 and body.count(b"\n") == N + 2
+    status, body = call("csv", signed_query(token, "csv", "altro"))
+    assert status == 200 and body.count(b"\n") == 2
+    assert call("csv", headers=[("X-Export-Token", "sbagliato")])[0] == 403
+    # Firma per csv non vale per parquet, né per un altro evento
+    assert call("parquet", signed_query(token, "csv"))[0] == 403
+    assert call("csv", signed_query(token, "csv", "altro").replace("altro", "default"))[0] == 403
+
+
+def test_route_is_closed_without_token(rows, monkeypatch):
+    import server
+    monkeypatch.setattr(server, "export_token", lambda: None)
+    assert call("csv", headers=[("Authorization", "Bearer ")])[0] == 403
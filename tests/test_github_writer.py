@@ -0,0 +1,118 @@
+# tests/test_github_writer.py
+# Worker GitHub contro fake_github.FakeRepo: coda outbox, commit raggruppati,
+# conflitti, tentativi.
+from github import GithubException
+
+from conftest import path_for, payload, record
+from db import GithubOutbox, SessionLocal
+from fake_github import FakeRepo
+from github_writer import BatchGithubWriter, GithubWriter, commit_files
+
+
+def enqueue(session, n):
+    items = [(path_for(i), payload(record(i))) for i in range(n)]
+    session.add_all(GithubOutbox(path=p, payload=c) for p, c in items)
+    session.commit()
+    return items
+
+
+def outbox(session):
+    session.expire_all()
+    return session.query(GithubOutbox).order_by(GithubOutbox.id).all()
+
+
+def test_file_writer_sends_each_pending_file(session):
+    items = enqueue(session, 3)
+    repo = FakeRepo()
+    writer = GithubWriter(repo, SessionLocal, backoff=0)
+    assert writer.drain_once() == 3
+    assert repo.commits == 3
+    assert {p: repo.files[p].decoded_content.decode() for p, _ in items} == dict(items)
+    assert all(item.sent_at is not None and item.attempts == 1 for item in outbox(session))
+    assert writer.drain_once() == 0
+
+
+def test_file_writer_retries_conflicts(session):
+    enqueue(session, 4)
+    repo = FakeRepo(conflict_rate=0.5, seed=3)
+    assert GithubWriter(repo, SessionLocal, max_tries=20, backoff=0).drain_once() == 4
+    assert repo.conflicts > 0 and len(repo.files) == 4
+
+
+def test_file_writer_marks_existing_file_as_sent(session):
+    # Invio precedente riuscito ma non registrato: create_file risponde 422
+    (path, content), = enqueue(session, 1)
+    repo = FakeRepo()
+    repo.create_file(path, "gia' inviato", content)
+    writer = GithubWriter(repo, SessionLocal, backoff=0)
+    assert writer.drain_once() == 0
+    item, = outbox(session)
+    assert item.sent_at is not None and item.last_error is None
+    assert writer.pending_count() == 0
+
+
+def test_file_writer_records_error_and_retries_later(session):
+    enqueue(session, 1)
+
+    class Down(FakeRepo):
+        def create_file(self, *args, **kwargs):
+            raise GithubException(500, {"message": "boom"})
+
+    assert GithubWriter(Down(), SessionLocal, max_tries=1, backoff=0).drain_once() == 0
+    item, = outbox(session)
+    assert item.sent_at is None and item.last_error.startswith("500")
+    assert GithubWriter(FakeRepo(), SessionLocal, backoff=0).drain_once() == 1
+
+
+def test_batch_writer_sends_pending_files_in_one_commit(session):
+    items = enqueue(session, 5)
+    repo = FakeRepo()
+    writer = BatchGithubWriter(repo, SessionLocal, backoff=0)
+    assert writer.drain_once() == 5
+    assert repo.commits == 1
+    assert {p: repo.files[p].decoded_content.decode() for p, _ in items} == dict(items)
+    assert all(item.sent_at is not None and item.attempts == 1 for item in outbox(session))
+    assert writer.drain_once() == 0
+    assert repo.commits == 1
+
+
+def test_batch_writer_respects_batch_size(session):
+    enqueue(session, 5)
+    repo = FakeRepo()
+    writer = BatchGithubWriter(repo, SessionLocal, batch_size=2, backoff=0)
+    assert [writer.drain_once() for _ in range(4)] == [2, 2, 1, 0]
+    assert repo.commits == 3
+    assert writer.pending_count() == 0
+
+
+def test_commit_files_retries_on_conflict():
+    repo = FakeRepo(conflict_rate=0.5, seed=3)
+    for i in range(10):
+        commit_files(repo, [(path_for(i), "{}")], max_tries=20, backoff=0)
+    assert repo.conflicts > 0
+    assert len(repo.files) == 10
+
+
+def test_batch_writer_keeps_rows_pending_after_repeated_conflicts(session):
+    enqueue(session, 3)
+    repo = FakeRepo(conflict_rate=1.0)
+    writer = BatchGithubWriter(repo, SessionLocal, max_tries=2, backoff=0)
+    assert writer.drain_once() == 0
+    assert repo.conflicts == 2
+    items = outbox(session)
+    assert all(i.sent_at is None and i.attempts == 1 and i.last_error.startswith("409") for i in items)
+
+    # Al giro successivo il branch è libero: partono tutte, errore azzerato
+    repo.conflict_rate = 0.0
+    assert writer.drain_once() == 3
+    items = outbox(session)
+    assert all(i.sent_at is not None and i.attempts == 2 and i.last_error is None for i in items)
+    assert len(repo.files) == 3
+
+
+def test_batch_writer_failure_leaves_branch_untouched(session):
+    enqueue(session, 2)
+    repo = FakeRepo(conflict_rate=1.0)
+    head = repo.head
+    BatchGithubWriter(repo, SessionLocal, max_tries=3, backoff=0).drain_once()
+    assert repo.head == head and repo.files == {}
@@ -0,0 +1,54 @@
+# tests/test_impacts.py
+# response_impacts segue responses.impacts con i trigger (INSERT ORM e SQL a
+# mano, UPDATE, DELETE) e si ricostruisce su un DB che ha già delle risposte.
+from datetime import datetime
+
+from sqlalchemy import text
+
+from conftest import record
+from db import Response, ResponseImpact, backfill_impacts, engine, init_db
+
+
+def impacts(session):
+    session.expire_all()
+    return sorted(session.query(ResponseImpact.response_id, ResponseImpact.impact))
+
+
+def expected(session):
+    return sorted((r.id, impact) for r in session.query(Response) for impact in r.impacts or [])
+
+
+def test_triggers_follow_insert_update_delete(session):
+    session.add_all(Response(timestamp=datetime(2025, 5, 20), **record(i)) for i in range(6))
+    session.commit()
+    # Anche l'SQL a mano (come l'import a blocchi) passa dai trigger
+    session.execute(text("INSERT INTO responses (event, impacts) VALUES ('default', '[\"Outsourcing\"]')"))
+    session.execute(text("INSERT INTO responses (event, impacts) VALUES ('default', NULL)"))
+    session.commit()
+    assert impacts(session) == expected(session) != []
+
+    first = session.query(Response).order_by(Response.id).first()
+    first.impacts = ["Data model"]
+    session.commit()
+    assert impacts(session) == expected(session)
+
+    session.delete(first)
+    session.commit()
+    assert first.id not in {rid for rid, _ in impacts(session)}
+    assert impacts(session) == expected(session)
+
+
+def test_backfill_on_existing_db(session):
+    session.add_all(Response(timestamp=datetime(2025, 5, 20), **record(i)) for i in range(9))
+    session.commit()
+    want = expected(session)
+    # DB precedente alla tabella: niente trigger, niente righe normalizzate
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE response_impacts"))
+        for name in ("insert", "update", "delete"):
+            conn.execute(text(f"DROP TRIGGER trg_response_impacts_{name}"))
+    init_db()
+    assert impacts(session) == want
+    # Idempotente: un secondo giro non aggiunge nulla
+    assert backfill_impacts(session) == 0
+    assert impacts(session) == want
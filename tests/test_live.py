@@ -0,0 +1,45 @@
+# tests/test_live.py
+# Snapshot condiviso della dashboard live: si rilegge per le righe nuove e per
+# gli UPDATE di reconcile (versione dei contatori), mai da fermo.
+from datetime import datetime
+
+from conftest import path_for, payload, record
+from db import Response, git_blob_sha, load_version
+from fake_github import FakeRepo
+from live import LiveFeed
+from migrate import GithubSource
+from reconcile import reconcile
+
+
+def add_row(session, i, **overrides):
+    r = record(i, **overrides)
+    session.add(Response(timestamp=datetime(2025, 5, 20), source_path=path_for(i),
+                         source_sha=git_blob_sha(payload(r)), **r))
+    session.commit()
+
+
+def test_poll_refreshes_on_new_rows_only(session):
+    add_row(session, 0)
+    feed = LiveFeed(min_interval=0)
+    first = feed.poll()
+    assert first.counts.total == 1
+    assert feed.poll() is first
+    add_row(session, 1)
+    assert feed.poll().counts.total == 2
+
+
+def test_poll_sees_reconcile_updates(session):
+    add_row(session, 0)
+    feed = LiveFeed(min_interval=0)
+    before = feed.poll()
+    assert before.counts["budget"].counts["No"] == 1
+
+    # Stesso file su GitHub ma con budget cambiato: UPDATE, nessuna riga nuova
+    repo = FakeRepo()
+    repo.create_file(path_for(0), "risposta", payload(record(0, budget="Sì")))
+    reconcile(GithubSource(repo), workers=2)
+
+    after = feed.poll()
+    assert after.watermark == before.watermark
+    assert after.version == load_version(session) > before.version
+    assert dict(after.counts["budget"].items()) == {"Sì": 1}
@@ -0,0 +1,154 @@
+# tests/test_reconcile.py
+# Riallineamento DB ↔ repo GitHub (FakeRepo): piano sui listing e riparazioni,
+# comprese le righe legacy senza file di origine.
+import threading
+import time
+from datetime import datetime
+
+from conftest import path_for, payload, record
+from db import (TOTAL_KEY, GithubOutbox, Response, SkippedFile, aggregate_counts, git_blob_sha,
+                load_counts)
+from fake_github import FakeRepo
+from migrate import FETCH_WINDOW, GithubSource, fetch_all
+from reconcile import plan, reconcile
+
+
+def github_repo(indices, changes=None):
+    """FakeRepo con i file delle risposte `indices` (changes: {i: campi diversi})."""
+    repo = FakeRepo()
+    for i in indices:
+        repo.create_file(path_for(i), "risposta", payload(record(i, **(changes or {}).get(i, {}))))
+    return repo
+
+
+def add_rows(session, indices, named=True, **overrides):
+    for i in indices:
+        r = record(i, **overrides)
+        session.add(Response(timestamp=datetime(2025, 5, 20), **r,
+                             source_path=path_for(i) if named else None,
+                             source_sha=git_blob_sha(payload(r)) if named else None))
+    session.commit()
+
+
+def total(session):
+    session.expire_all()
+    return load_counts(session)[TOTAL_KEY][""]
+
+
+def test_plan_classifies_listings():
+    github = [("responses/a.json", "1"), ("responses/b.json", "2"), ("responses/c.json", "3"),
+              ("responses/bad.json", "9")]
+    db = {"responses/a.json": ("1", 1), "responses/b.json": ("old", 2), "responses/d.json": ("4", 4),
+          "responses/e.json": ("5", 5)}
+    p = plan(github, db, unnamed_ids=[7], pending_paths=["responses/e.json"],
+             local_items=[("responses/a.json", "1"), ("responses/c.json", "x"), ("responses/z.json", "0")],
+             skipped={"responses/bad.json": "9"})
+    assert p["new_in_db"] == ["responses/c.json"]
+    assert p["changed_in_db"] == ["responses/b.json"]
+    assert p["missing_on_github"] == ["responses/d.json"]
+    assert p["pending_outbox"] == ["responses/e.json"]
+    assert p["unnamed_in_db"] == [7]
+    assert p["missing_local"] == ["responses/b.json", "responses/bad.json"]
+    assert p["changed_local"] == ["responses/c.json"]
+    assert p["only_local"] == ["responses/z.json"]
+
+
+def test_plan_retries_skipped_file_when_it_changes():
+    p = plan([("responses/bad.json", "new")], {}, [], skipped={"responses/bad.json": "old"})
+    assert p["new_in_db"] == ["responses/bad.json"]
+
+
+def test_reconcile_imports_updates_and_requeues(session):
+    add_rows(session, [0, 1, 5])
+    repo = github_repo(range(4), changes={1: {"budget": "No", "gap_analysis": "No"}})
+    p = reconcile(GithubSource(repo), workers=2)
+    assert p["new_in_db"] == [path_for(2), path_for(3)]
+    assert p["changed_in_db"] == [path_for(1)]
+    assert p["missing_on_github"] == [path_for(5)]
+
+    session.expire_all()
+    assert session.query(Response).count() == 5 == total(session)
+    changed = session.query(Response).filter_by(source_path=path_for(1)).one()
+    assert (changed.budget, changed.source_sha) == ("No", repo.files[path_for(1)].sha)
+    # Contatori incrementali = ricalcolo dalle righe
+    assert load_counts(session)["gap_analysis"] == aggregate_counts(session)["gap_analysis"]
+    assert load_counts(session)["gap_analysis"]["No"] == 3   # righe 0, 1 (aggiornata) e 2
+    assert [o.path for o in session.query(GithubOutbox)] == [path_for(5)]
+
+    # Seconda passata: niente da fare
+    p = reconcile(GithubSource(repo), workers=2)
+    assert p["new_in_db"] == p["changed_in_db"] == []
+    assert session.query(Response).count() == 5
+
+
+def test_reconcile_adopts_legacy_rows_instead_of_duplicating(session):
+    # Righe importate prima di source_path: stesso contenuto dei file su GitHub
+    add_rows(session, [0, 1, 2, 4], named=False)
+    add_rows(session, [6], named=False, adeguamento_specifico="Sì")   # nessun file uguale
+    repo = github_repo([0, 1, 2, 3])
+    # File 4: stesso contenuto ma JSON scritto diversamente, si abbina scaricandolo
+    repo.create_file(path_for(4), "risposta", payload(record(4)).replace("\n  ", "\n"))
+
+    p = reconcile(GithubSource(repo), workers=2)
+    assert sorted(p["adopted"]) == [path_for(0), path_for(1), path_for(2), path_for(4)]
+    assert p["new_in_db"] == [path_for(3)]
+    session.expire_all()
+    rows = {r.source_path: r for r in session.query(Response)}
+    assert set(rows) == {path_for(i) for i in (0, 1, 2, 3, 4)} | {None}
+    assert rows[path_for(0)].source_sha == repo.files[path_for(0)].sha
+    assert len(rows) == 6 == total(session)
+    # La riga senza file resta lì, non pubblicata
+    assert session.query(GithubOutbox).count() == 0
+
+    p = reconcile(GithubSource(repo), workers=2)
+    assert p["new_in_db"] == [] and p["unnamed_in_db"] == [rows[None].id]
+    assert session.query(Response).count() == 6
+
+
+def test_reconcile_names_unmatched_rows_only_on_request(session):
+    add_rows(session, [7], named=False)
+    repo = github_repo([])
+    reconcile(GithubSource(repo), workers=2)
+    assert session.query(GithubOutbox).count() == 0
+    reconcile(GithubSource(repo), workers=2, name_unmatched=True)
+    session.expire_all()
+    row = session.query(Response).one()
+    assert row.source_path.startswith("responses/") and row.source_sha == git_blob_sha(
+        session.query(GithubOutbox).one().payload)
+
+
+def test_reconcile_remembers_invalid_files(session):
+    repo = github_repo([0])
+    repo.create_file("responses/rotto.json", "risposta", "{non json")
+    p = reconcile(GithubSource(repo), workers=2)
+    assert p["new_in_db"] == [path_for(0), "responses/rotto.json"]
+    session.expire_all()
+    assert [s.path for s in session.query(SkippedFile)] == ["responses/rotto.json"]
+    assert reconcile(GithubSource(repo), workers=2)["new_in_db"] == []
+
+
+class CountingSource:
+    """Sorgente finta che conta i fetch partiti."""
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, path, sha):
+        with self._lock:
+            self.calls += 1
+        return f"{path}:{sha}".encode()
+
+
+def test_fetch_all_keeps_a_bounded_window_in_order():
+    source = CountingSource()
+    items = [(f"responses/{i}.json", str(i)) for i in range(1000)]
+    fetched = fetch_all(source, iter(items), workers=2)
+    first = next(fetched)
+    time.sleep(0.05)
+    # Chi consuma è fermo: partono al più la finestra più il rimpiazzo del primo
+    assert source.calls <= 2 * FETCH_WINDOW + 1
+    rest = list(fetched)
+    assert [(p, s) for p, s, _ in [first] + rest] == items
+    assert rest[-1][2] == b"responses/999.json:999"
+    assert source.calls == len(items)
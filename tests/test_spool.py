@@ -0,0 +1,140 @@
+# tests/test_spool.py
+# Spool → SQLite: rileggere lo stesso tratto non crea doppioni, le righe rotte
+# finiscono nel dead-letter senza bloccare le altre.
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+
+import pytest
+
+from conftest import path_for, payload, record
+from db import BUSY_TIMEOUT, TOTAL_KEY, GithubOutbox, Response, SessionLocal, load_counts
+from db_writer import DBWriter
+from spool import Spool, SpoolReplayer
+
+
+@pytest.fixture
+def writer():
+    return DBWriter(SessionLocal).start()
+
+
+def entry(i, **overrides):
+    return {"path": path_for(i), "ts": datetime(2025, 5, 20, 9, i).isoformat(),
+            "payload": payload(record(i)), **overrides}
+
+
+def counts(session):
+    session.expire_all()
+    return (session.query(Response).count(), session.query(GithubOutbox).count(),
+            load_counts(session)[TOTAL_KEY][""])
+
+
+def test_replay_writes_responses_and_outbox(session, writer, tmp_path):
+    spool = Spool(str(tmp_path))
+    for i in range(5):
+        spool.append(entry(i))
+    assert SpoolReplayer(spool, writer).replay_once() == 5
+    rows = session.query(Response).order_by(Response.id).all()
+    assert [r.source_path for r in rows] == [path_for(i) for i in range(5)]
+    assert rows[1].impacts == record(1)["impacts"]
+    assert {o.path for o in session.query(GithubOutbox)} == {path_for(i) for i in range(5)}
+
+
+def test_replay_is_idempotent(session, writer, tmp_path):
+    spool = Spool(str(tmp_path))
+    for i in range(5):
+        spool.append(entry(i))
+    replayer = SpoolReplayer(spool, writer)
+    replayer.replay_once()
+    before = counts(session)
+
+    # Stesso replayer: checkpoint in fondo, niente da fare
+    assert replayer.replay_once() == 0
+    # Crash prima del checkpoint: si rilegge tutto, le righe note si saltano
+    os.remove(replayer.checkpoint_path)
+    assert SpoolReplayer(spool, writer).replay_once() == 0
+    assert counts(session) == before
+    assert before == (5, 5, 5)
+
+
+def test_replay_resumes_after_checkpoint(session, writer, tmp_path):
+    spool = Spool(str(tmp_path))
+    spool.append(entry(0))
+    replayer = SpoolReplayer(spool, writer)
+    assert replayer.replay_once() == 1
+    spool.append(entry(1))
+    spool.append(entry(0))   # stesso file inviato due volte
+    assert replayer.replay_once() == 1
+    assert session.query(Response).count() == 2
+
+
+def test_broken_entries_go_to_dead_letter(session, writer, tmp_path):
+    session.add(GithubOutbox(path=path_for(2), payload="{}"))   # conflitto sul path dell'outbox
+    session.commit()
+    spool = Spool(str(tmp_path))
+    spool.append(entry(0))
+    spool.append(entry(1, payload="{non json"))
+    spool.append(entry(2))
+    spool.append({"ts": "2025-05-20T09:00:00"})                 # senza path
+    spool.append(entry(3))
+    replayer = SpoolReplayer(spool, writer)
+    assert replayer.replay_once() == 2
+    session.expire_all()
+    assert sorted(p for (p,) in session.query(Response.source_path)) == [path_for(0), path_for(3)]
+
+    with open(replayer.dead_letter_path, encoding="utf-8") as f:
+        dead = [json.loads(line) for line in f]
+    assert [d["entry"].get("path") for d in dead] == [path_for(1), None, path_for(2)]
+    assert "IntegrityError" in dead[2]["error"]
+    # Il checkpoint è andato oltre: le righe rotte non si riprovano
+    assert replayer.replay_once() == 0
+    with open(replayer.dead_letter_path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 3
+
+
+class SlowWriter:
+    """DBWriter che consegna ogni richiesta con `delay` secondi di ritardo (lock conteso)."""
+
+    def __init__(self, writer, delay):
+        self.writer = writer
+        self.delay = delay
+
+    def submit(self, *objects):
+        future = Future()
+
+        def later():
+            time.sleep(self.delay)
+            inner = self.writer.submit(*objects)
+            inner.add_done_callback(lambda f: future.set_exception(f.exception()) if f.exception()
+                                    else future.set_result(f.result()))
+
+        threading.Thread(target=later, daemon=True).start()
+        return future
+
+
+def test_slow_commit_is_retried_not_dead_lettered(session, writer, tmp_path):
+    spool = Spool(str(tmp_path))
+    for i in range(3):
+        spool.append(entry(i))
+    replayer = SpoolReplayer(spool, SlowWriter(writer, delay=0.3), write_timeout=0.05)
+    with pytest.raises(TimeoutError):
+        replayer.replay_once()
+    # Checkpoint fermo, niente dead-letter
+    assert replayer._load_checkpoint() == (1, 0)
+    assert not os.path.exists(replayer.dead_letter_path)
+
+    # Il commit scaduto arriva: al giro dopo le righe sono già in DB e si saltano
+    replayer.write_timeout = 5
+    assert replayer.replay_once() == 0
+    session.expire_all()
+    assert session.query(Response).count() == 3
+    assert session.query(GithubOutbox).count() == 3
+    assert not os.path.exists(replayer.dead_letter_path)
+    assert replayer._load_checkpoint() != (1, 0)
+
+
+def test_default_write_timeout_outlasts_busy_timeout(writer, tmp_path):
+    assert SpoolReplayer(Spool(str(tmp_path)), writer).write_timeout > BUSY_TIMEOUT
@@ -0,0 +1,98 @@
+# tests/test_terms.py
+# Indice dei termini di bm_notes: term_counts e response_terms seguono insert,
+# bulk insert e aggiornamenti; le viste filtrate contano da response_terms.
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import text
+
+from aggregation import aggregate
+from conftest import path_for, record
+from cube import ResponseCube
+from db import (Response, ResponseTerm, SessionLocal, TermCount, filtered_terms, init_db,
+                load_terms, rebuild_terms)
+from migrate import insert_batch
+from reconcile import _update_changed
+from schema import BY_KEY
+from textnorm import tokenizer_for
+
+NOTES = ["Il Board Member è l'Amministratore Delegato", "DI STEFANO SRL ", "Di Stefano srl",
+         "board member esterno", None, "Attivita' di gap analysis", ""]
+
+
+def expected(records, **filters):
+    tokenizer = tokenizer_for(BY_KEY["bm_notes"])
+    counts = Counter()
+    for r in records:
+        if all(r[k] == v for k, v in filters.items()):
+            counts.update(tokenizer.terms(r["bm_notes"]))
+    return counts
+
+
+def add(session, n, start=0):
+    records = [record(i, bm_notes=NOTES[i % len(NOTES)]) for i in range(start, start + n)]
+    session.add_all(Response(timestamp=datetime(2025, 5, 20), source_path=path_for(i), **r)
+                    for i, r in zip(range(start, start + n), records))
+    session.commit()
+    return records
+
+
+def test_orm_insert_updates_both_indexes(session):
+    records = add(session, 14)
+    assert load_terms(session)["bm_notes"] == expected(records)
+    assert load_terms(session)["bm_notes"]["stefano"] == 4
+    per_response = session.query(ResponseTerm).filter_by(term="board member").count()
+    assert per_response == expected(records)["board member"]
+
+
+def test_bulk_insert_updates_both_indexes(session):
+    records = [dict(record(i, bm_notes=NOTES[i % len(NOTES)]), source_path=path_for(i),
+                    timestamp=datetime(2025, 5, 20), event="default") for i in range(14)]
+    insert_batch(session, records)
+    assert load_terms(session)["bm_notes"] == expected(records)
+    assert filtered_terms(session, budget="No")["bm_notes"] == expected(records, budget="No")
+
+
+def test_filtered_terms_match_tokenizing_the_rows(session):
+    records = add(session, 21)
+    for filters in ({}, {"budget": "Sì"}, {"gap_analysis": "No", "board_inform": "Sì"}):
+        assert filtered_terms(session, **filters)["bm_notes"] == expected(records, **filters)
+        assert aggregate(session, **filters)["bm_notes"].counts == expected(records, **filters)
+
+
+def test_cube_text_counts_match_index(session):
+    records = add(session, 21)
+    cube = ResponseCube(SessionLocal)
+    cube.refresh()
+    assert cube.counts("bm_notes", budget="Sì") == expected(records, budget="Sì")
+
+
+def test_update_moves_terms(session):
+    add(session, 3)
+    resp = session.query(Response).filter_by(source_path=path_for(1)).one()
+    note = "Funzione antiriciclaggio"
+    _update_changed(session, {path_for(1): resp}, [{"source_path": path_for(1), "bm_notes": note}])
+    session.expire_all()
+    rows = [record(0, bm_notes=NOTES[0]), record(1, bm_notes=note), record(2, bm_notes=NOTES[2])]
+    assert load_terms(session)["bm_notes"] == expected(rows)
+    assert {t for (t,) in session.query(ResponseTerm.term).filter_by(response_id=resp.id)} == {
+        "funzione antiriciclaggio"}
+
+
+def test_delete_removes_postings(session):
+    add(session, 3)
+    session.execute(text("DELETE FROM responses WHERE source_path = :p"), {"p": path_for(0)})
+    session.commit()
+    assert filtered_terms(session)["bm_notes"] == expected([record(i, bm_notes=NOTES[i]) for i in (1, 2)])
+
+
+def test_indexes_are_rebuilt_when_missing(session):
+    records = add(session, 14)
+    session.execute(text("DROP TABLE response_terms"))
+    session.execute(text("DROP TABLE term_counts"))
+    session.commit()
+    init_db()
+    assert load_terms(session)["bm_notes"] == expected(records)
+    assert filtered_terms(session)["bm_notes"] == expected(records)
+    rebuild_terms(session)
+    assert sum(session.query(TermCount.count).filter_by(term="stefano").one()) == 4
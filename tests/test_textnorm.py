@@ -0,0 +1,56 @@
+# tests/test_textnorm.py
+from textnorm import Tokenizer
+
+
+def test_variants_normalize_to_same_terms():
+    tok = Tokenizer()
+    assert tok.terms("Di Stefano srl") == tok.terms("DI STEFANO SRL ") == ("stefano", "srl")
+
+
+def test_typographic_apostrophes_and_elisions():
+    tok = Tokenizer()
+    assert tok.terms("dell’azienda") == tok.terms("dell'azienda") == ("azienda",)
+
+
+def test_apostrophe_accent_becomes_accented_letter():
+    tok = Tokenizer()
+    assert tok.normalize("Attivita' in corso") == "attività in corso"
+    assert tok.terms("attivita'") == tok.terms("attività")
+
+
+def test_fold_accents_is_optional():
+    assert Tokenizer().terms("attività") == ("attività",)
+    assert Tokenizer(fold_accents=True).terms("attività") == ("attivita",)
+
+
+def test_stopwords_short_words_and_numbers_are_dropped():
+    assert Tokenizer().terms("Il budget è di 2025 e x") == ("budget",)
+
+
+def test_phrases_are_merged_longest_first():
+    tok = Tokenizer(phrases=("board member", "aml board member"))
+    assert tok.terms("Nomina dell'AML Board Member") == ("nomina", "aml board member")
+    assert tok.terms("un board member esterno") == ("board member", "esterno")
+
+
+def test_phrase_keeps_its_stopwords():
+    tok = Tokenizer(phrases=("consiglio di amministrazione",))
+    assert tok.terms("Il Consiglio di Amministrazione") == ("consiglio di amministrazione",)
+
+
+def test_terms_are_distinct_tokens_keep_repetitions():
+    tok = Tokenizer()
+    assert tok.tokens("rischio rischio paese") == ("rischio", "rischio", "paese")
+    assert tok.terms("rischio rischio paese") == ("rischio", "paese")
+
+
+def test_empty_text():
+    tok = Tokenizer()
+    assert tok.terms(None) == () and tok.terms("   ") == ()
+
+
+def test_tokens_are_cached_per_text():
+    tok = Tokenizer(cache_size=4)
+    tok.tokens("gap analysis")
+    tok.tokens("gap analysis")
+    assert tok.tokens.cache_info().hits == 1
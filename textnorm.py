@@ -0,0 +1,100 @@
+# textnorm.py
+# Normalizzazione e tokenizzazione delle risposte a testo libero, per l'indice
+# dei termini (db.term_counts) e la word cloud delle domande FREETEXT.
+#
+#   "Di Stefano srl"  /  "DI STEFANO SRL "  →  ("stefano", "srl")
+#
+# Pipeline: Unicode NFKC + casefold, apostrofi tipografici → ', accenti
+# scritti con l'apostrofo (attivita' → attività), spazi compressi; poi token
+# alfanumerici, unione delle frasi note ("board member" → un solo termine),
+# stopword italiane, parole troppo corte e numeri scartati.
+import functools
+import re
+import unicodedata
+
+STOPWORDS = frozenset("""
+a ad agli ai al all alla alle allo anche ancora avere aveva avevano c che chi ci coi col come con contro
+cui da dagli dai dal dall dalla dalle dallo degli dei del dell della delle dello dentro di dopo dove e ed
+era erano essere gli ha hanno ho i il in io l la le lei li lo loro lui ma me mi mia mie miei mio ne negli
+nei nel nell nella nelle nello noi non nostra nostre nostri nostro o ogni per perché perchè però più poi
+quale quali quando quanto quella quelle quelli quello questa queste questi questo qui se sei senza si
+sia siamo siete sono sotto su sua sue sugli sui sul sull sulla sulle sullo suo suoi te ti tra tu tua tue
+tuo tuoi tutti tutto un una uno vi voi già cosa fra stato stata stati state è
+""".split())
+
+# Apostrofi tipografici → apostrofo semplice (gli spazi speciali li toglie NFKC)
+_PUNCT = str.maketrans({"’": "'", "‘": "'", "´": "'", "`": "'"})
+_ACCENTED = {"a": "à", "e": "è", "i": "ì", "o": "ò", "u": "ù"}
+_APOSTROPHE_ACCENT = re.compile(r"([aeiou])'(?=\W|$)")
+_ELISION = re.compile(r"(?<=\w)'(?=\w)")
+_SPACES = re.compile(r"\s+")
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+def _fold_accents(text):
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+class Tokenizer:
+    """Testo → termini normalizzati; i risultati sono in cache per testo.
+
+    phrases: espressioni da tenere come un solo termine ("board member");
+    fold_accents=True toglie anche gli accenti (attività → attivita).
+    """
+
+    def __init__(self, stopwords=STOPWORDS, phrases=(), fold_accents=False, min_length=2,
+                 cache_size=8192):
+        self.fold_accents = fold_accents
+        self.min_length = min_length
+        self.stopwords = frozenset(self.normalize(w) for w in stopwords)
+        # Frasi come tuple di token, indicizzate per primo token, le più lunghe prima
+        self._phrases = {}
+        for phrase in sorted({tuple(self._split(p)) for p in phrases}, key=len, reverse=True):
+            if len(phrase) > 1:
+                self._phrases.setdefault(phrase[0], []).append(phrase)
+        self.tokens = functools.lru_cache(maxsize=cache_size)(self._tokens)
+
+    def normalize(self, text):
+        """Minuscole, apostrofi e accenti uniformi, spazi compressi."""
+        text = unicodedata.normalize("NFKC", text or "").casefold().translate(_PUNCT)
+        text = _APOSTROPHE_ACCENT.sub(lambda m: _ACCENTED[m.group(1)], text)
+        if self.fold_accents:
+            text = _fold_accents(text)
+        return _SPACES.sub(" ", text).strip()
+
+    def _split(self, text):
+        # Elisioni (l'azienda, dell'ente) separate: l'articolo finisce tra le stopword
+        return _TOKEN.findall(_ELISION.sub(" ", self.normalize(text)))
+
+    def _merge_phrases(self, words):
+        if not self._phrases:
+            return words
+        merged, i = [], 0
+        while i < len(words):
+            for phrase in self._phrases.get(words[i], ()):
+                if tuple(words[i:i + len(phrase)]) == phrase:
+                    merged.append(" ".join(phrase))
+                    i += len(phrase)
+                    break
+            else:
+                merged.append(words[i])
+                i += 1
+        return merged
+
+    def _keep(self, token):
+        return (len(token) >= self.min_length and token not in self.stopwords
+                and not token.isdigit())
+
+    def _tokens(self, text):
+        """Tupla dei termini nell'ordine del testo (con ripetizioni)."""
+        return tuple(t for t in self._merge_phrases(self._split(text)) if " " in t or self._keep(t))
+
+    def terms(self, text):
+        """Termini distinti della risposta: ognuno conta una volta per risposta."""
+        return tuple(dict.fromkeys(self.tokens(text)))
+
+
+@functools.lru_cache(maxsize=None)
+def tokenizer_for(question):
+    """Tokenizer di una domanda FREETEXT (frasi dallo schema), uno per processo."""
+    return Tokenizer(phrases=question.phrases)
@@ -0,0 +1,14 @@
+# theme.py
+
+# ----------------------------------------------------------------
+# Brand palette
+# ----------------------------------------------------------------
+PALETTE = [
+    "#00338D",  # primary
+    "#1E49E2",  # secondary
+    "#0C233C",  # tertiary
+    "#ACEAFF",  # accent light
+    "#00B8F5",  # accent
+    "#7210EA",  # highlight
+    "#FD349C",  # pink
+]
@@ -0,0 +1,151 @@
+# wordcloud_cache.py
+# Cache dei PNG della word cloud, indicizzata da frequenze + parametri di render.
+# Stesse frequenze → stessa immagine (colori e layout deterministici) → nessun nuovo render.
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from theme import PALETTE
+
+WORDCLOUD_PARAMS = {
+    "width": 1600,
+    "height": 800,
+    "scale": 4,
+    "background_color": "white",
+    "prefer_horizontal": 0.1,
+    "collocations": False,
+    "font_path": "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "max_words": 100,
+}
+# Anteprima: layout su una tela 4 volte più piccola, ~20x più veloce del render finale
+PREVIEW_PARAMS = {"width": 400, "height": 200, "scale": 2}
+
+
+def palette_color_func(seed=0):
+    """Colore fisso per parola (stesso seed → stessi colori a ogni render)."""
+    def color_func(word, *args, **kwargs):
+        return random.Random(f"{seed}:{word}").choice(PALETTE)
+    return color_func
+
+
+def cache_key(freqs, params, seed=0):
+    """Hash stabile di frequenze + parametri (l'ordine delle chiavi non conta)."""
+    blob = json.dumps(
+        {"freqs": sorted(freqs.items()), "params": params, "seed": seed, "palette": PALETTE},
+        ensure_ascii=False, sort_keys=True,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+@metrics.timed("wordcloud.render")
+def render_png(freqs, params, seed=0):
+    from wordcloud import WordCloud
+
+    wc = WordCloud(color_func=palette_color_func(seed), random_state=seed, **params)
+    wc.generate_from_frequencies(freqs)
+    buf = io.BytesIO()
+    wc.to_image().save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class WordCloudCache:
+    """PNG in memoria (LRU) con copia su disco (LRU per data di accesso).
+
+    render() con preview=True: se l'immagine finale non c'è ancora ritorna
+    subito un'anteprima a bassa risoluzione e prepara quella finale in
+    background; al rerun successivo la trova in cache.
+    """
+
+    def __init__(self, cache_dir=None, max_items=16, max_disk_items=128):
+        self.cache_dir = cache_dir
+        self.max_items = max_items
+        self.max_disk_items = max_disk_items
+        self._mem  = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wordcloud")
+        self._inflight = {}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    # --- storage -----------------------------------------------------
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.png")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key)
+                return self._mem[key]
+        if self.cache_dir and os.path.exists(self._path(key)):
+            with open(self._path(key), "rb") as f:
+                png = f.read()
+            os.utime(self._path(key))
+            self._remember(key, png)
+            return png
+        return None
+
+    def _remember(self, key, png):
+        with self._lock:
+            self._mem[key] = png
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_items:
+                self._mem.popitem(last=False)
+
+    def put(self, key, png):
+        self._remember(key, png)
+        if self.cache_dir:
+            tmp = self._path(key) + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(png)
+            os.replace(tmp, self._path(key))
+            self._evict_disk()
+
+    def _evict_disk(self):
+        files = [os.path.join(self.cache_dir, n) for n in os.listdir(self.cache_dir) if n.endswith(".png")]
+        if len(files) > self.max_disk_items:
+            files.sort(key=os.path.getmtime)
+            for path in files[:len(files) - self.max_disk_items]:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    # --- render ------------------------------------------------------
+    def _render_and_store(self, key, freqs, params, seed):
+        try:
+            png = render_png(freqs, params, seed)
+            self.put(key, png)
+            return png
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def render(self, freqs, params=WORDCLOUD_PARAMS, seed=0, preview=False):
+        """Ritorna (png, finale). finale=False solo per le anteprime."""
+        freqs = dict(freqs)
+        key = cache_key(freqs, params, seed)
+        png = self.get(key)
+        if png is not None:
+            return png, True
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._pool.submit(self._render_and_store, key, freqs, params, seed)
+                self._inflight[key] = future
+        if not preview:
+            return future.result(), True
+
+        preview_params = dict(params, **PREVIEW_PARAMS)
+        preview_key = cache_key(freqs, preview_params, seed)
+        png = self.get(preview_key)
+        if png is None:
+            png = render_png(freqs, preview_params, seed)
+            self._remember(preview_key, png)
+        return png, False